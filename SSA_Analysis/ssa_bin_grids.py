@@ -0,0 +1,265 @@
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Title: Sea Salt Aerosol Bin Grids
+# Author: agent
+# Date Updated: 17 October 2026
+# Description: This script keeps a registry of the bin grids (bin_number, bin_lower, bin_middle,
+# # bin_upper) of the samples, so that each distinct grid is kept once and each sample only needs
+# # a small grid ID. Almost every sample has the canonical mini-GNI grid, bins 4 to 99 with dry
+# # radius 0.8 to 19.8 um in 0.2 um steps, which is always grid 0. Interning the grids of a data
+# # frame is one pass over its samples, and the samples whose grid is not the canonical one can
+# # then be found from their grid IDs. Distributions are moved from one grid to another by
+# # conservative rebinning: each source bin is split among the target bins it overlaps, assuming
+# # the particles are spread evenly in radius across the bin, so the number concentration (or the
+# # salt mass, whose share of a bin is the integral of r^3 dr over the overlap) in the overlapping
+# # range is kept. The overlap weights form a sparse source x target matrix that is calculated
+# # once per pair of grids and kept in the registry, and many samples are rebinned at once with
+# # one matrix product.
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+
+# import packages
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# the columns that make up a bin grid
+grid_columns = ['bin_number', 'bin_lower', 'bin_middle', 'bin_upper']
+# kinds of rebinning weights (see overlap_weights)
+rebin_kinds = ('number', 'mass', 'mean', 'cumulative')
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: make_canonical_grid
+# Parameters: first_bin, last_bin
+# Description: This returns the canonical mini-GNI grid as a dictionary of column -> array: bin k
+# # has a middle dry radius of 0.2*k um and is 0.2 um wide. The edges are calculated from integer
+# # tenths so that they equal the values read from the histogram files exactly.
+# =================================================================================================
+def make_canonical_grid(first_bin=4, last_bin=99):
+    bin_number = np.arange(first_bin, last_bin + 1)
+    return {'bin_number': bin_number,
+            'bin_lower': (2*bin_number - 1)/10,
+            'bin_middle': (2*bin_number)/10,
+            'bin_upper': (2*bin_number + 1)/10}
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: make_grid_registry
+# Parameters: canonical
+# Description: This creates a registry as a dictionary. canonical (a grid as a dictionary of column
+# # -> values) is interned first, as grid 0; it defaults to make_canonical_grid(). The registry
+# # also keeps the rebinning weights of each pair of grids once they are calculated.
+# =================================================================================================
+def make_grid_registry(canonical=None):
+    registry = {'grids': [], 'index': {}, 'canonical_id': 0, 'weights': {}}
+    if canonical is None:
+        canonical = make_canonical_grid()
+    intern_grid(registry, *[canonical[column] for column in grid_columns])
+    return registry
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: grid_key
+# Parameters: bin_number, bin_lower, bin_middle, bin_upper
+# Description: This returns the key of a grid: the bytes of its four columns as float64, so equal
+# # grids have equal keys whether they are lists or arrays.
+# =================================================================================================
+def grid_key(bin_number, bin_lower, bin_middle, bin_upper):
+    return tuple(np.asarray(values, dtype=np.float64).tobytes() for values in (bin_number, bin_lower, bin_middle, bin_upper))
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: intern_grid
+# Parameters: registry, bin_number, bin_lower, bin_middle, bin_upper
+# Description: This returns the ID of a grid, adding it to the registry if it is new. The grid is
+# # kept as read-only copies.
+# =================================================================================================
+def intern_grid(registry, bin_number, bin_lower, bin_middle, bin_upper):
+    key = grid_key(bin_number, bin_lower, bin_middle, bin_upper)
+    grid_id = registry['index'].get(key)
+    if grid_id is None:
+        grid = {'bin_number': np.array(bin_number, dtype=np.int64),
+                'bin_lower': np.array(bin_lower, dtype=np.float64),
+                'bin_middle': np.array(bin_middle, dtype=np.float64),
+                'bin_upper': np.array(bin_upper, dtype=np.float64)}
+        for values in grid.values():
+            values.flags.writeable = False
+        grid_id = len(registry['grids'])
+        registry['grids'].append(grid)
+        registry['index'][key] = grid_id
+    return grid_id
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: get_grid
+# Parameters: registry, grid_id
+# Description: This returns grid grid_id as a dictionary of column -> array.
+# =================================================================================================
+def get_grid(registry, grid_id):
+    return registry['grids'][grid_id]
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: intern_df_grids
+# Parameters: registry, df
+# Description: This interns the grid of every sample of df (a data frame with the grid columns as
+# # lists) in one pass and returns the grid ID of each sample as an array.
+# =================================================================================================
+def intern_df_grids(registry, df):
+    grid_ids = [intern_grid(registry, *row) for row in zip(*[df[column] for column in grid_columns])]
+    return np.array(grid_ids, dtype=np.int32)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: noncanonical_samples
+# Parameters: registry, grid_ids, id_numbers
+# Description: This returns a data frame of the samples whose grid is not the canonical one, with
+# # their ID number (or position if id_numbers is None), grid ID, number of bins, and smallest and
+# # largest bin_middle, e.g. to print before processing.
+# =================================================================================================
+def noncanonical_samples(registry, grid_ids, id_numbers=None):
+    grid_ids = np.asarray(grid_ids)
+    positions = np.flatnonzero(grid_ids != registry['canonical_id'])
+    if id_numbers is None:
+        id_numbers = np.arange(len(grid_ids))
+    id_numbers = np.asarray(id_numbers)
+    grids = [get_grid(registry, grid_id) for grid_id in grid_ids[positions].tolist()]
+    return pd.DataFrame({'id_number': id_numbers[positions],
+                         'grid_id': grid_ids[positions],
+                         'n_bins': [len(grid['bin_middle']) for grid in grids],
+                         'min_middle': [grid['bin_middle'].min() if len(grid['bin_middle']) > 0 else np.nan for grid in grids],
+                         'max_middle': [grid['bin_middle'].max() if len(grid['bin_middle']) > 0 else np.nan for grid in grids]})
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: grids_to_lists
+# Parameters: registry, grid_ids
+# Description: This returns the grids grid_ids (all grids if None) as dictionaries of column ->
+# # list, e.g. to save them as JSON.
+# =================================================================================================
+def grids_to_lists(registry, grid_ids=None):
+    if grid_ids is None:
+        grid_ids = range(len(registry['grids']))
+    return [{column: get_grid(registry, grid_id)[column].tolist() for column in grid_columns} for grid_id in grid_ids]
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: overlap_weights
+# Parameters: source_lower, source_upper, target_lower, target_upper, kind
+# Description: This returns the sparse rebinning matrix (source bins x target bins) from a grid with
+# # bin edges source_lower and source_upper to one with target_lower and target_upper (both sorted
+# # and not overlapping, in the same units). The particles of a source bin are taken to be spread
+# # evenly in radius across it. kind is one of rebin_kinds:
+# # # 'number': the fraction of the source bin's particles that fall in the target bin, so number
+# # # # concentrations keep their total over the range the grids share.
+# # # 'mass': the fraction of the source bin's mass that falls in the target bin, e.g. for
+# # # # bin_salt. The mass of particles spread evenly in radius goes as the integral of r^3 dr, so
+# # # # the weight is (end^4 - begin^4)/(upper^4 - lower^4) for the overlap begin to end of the
+# # # # source bin lower to upper.
+# # # 'mean': the fraction of the target bin covered by the source bin, out of the part of it that
+# # # # the source grid covers, for values that are not added up (e.g. collision efficiency).
+# # # 'cumulative': the fraction of the source bin's particles larger than the target bin's lower
+# # # # edge, so a number concentration gives the cumulative concentration of the target grid
+# # # # (including particles above the target grid, like cumu_conc).
+# =================================================================================================
+def overlap_weights(source_lower, source_upper, target_lower, target_upper, kind='number'):
+    if kind not in rebin_kinds:
+        raise ValueError('unknown rebinning kind ' + repr(kind) + '; kinds: ' + ', '.join(rebin_kinds))
+    source_lower = np.asarray(source_lower, dtype=np.float64)
+    source_upper = np.asarray(source_upper, dtype=np.float64)
+    target_lower = np.asarray(target_lower, dtype=np.float64)
+    target_upper = np.asarray(target_upper, dtype=np.float64)
+    # the target bins each source bin reaches: from the first one whose upper edge is above the
+    # # source bin's lower edge (or the first bin for cumulative) up to the last one whose lower
+    # # edge is below the source bin's upper edge
+    if kind == 'cumulative':
+        first = np.zeros(len(source_lower), dtype=np.int64)
+    else:
+        first = np.searchsorted(target_upper, source_lower, side='right')
+    last = np.searchsorted(target_lower, source_upper, side='left')
+    counts = np.maximum(last - first, 0)
+    rows = np.repeat(np.arange(len(source_lower)), counts)
+    starts = np.cumsum(counts) - counts
+    columns = first[rows] + np.arange(counts.sum()) - starts[rows]
+    lower = source_lower[rows]
+    upper = source_upper[rows]
+    if kind == 'cumulative':
+        begin = np.maximum(lower, target_lower[columns])
+        end = upper
+    else:
+        begin = np.maximum(lower, target_lower[columns])
+        end = np.minimum(upper, target_upper[columns])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if kind == 'mass':
+            weights = (end**4 - begin**4)/(upper**4 - lower**4)
+        elif kind == 'mean':
+            covered = np.bincount(columns, weights=end - begin, minlength=len(target_lower))
+            weights = (end - begin)/covered[columns]
+        else:
+            weights = (end - begin)/(upper - lower)
+    keep = (end > begin) & np.isfinite(weights)
+    return sparse.csr_matrix((weights[keep], (rows[keep], columns[keep])), shape=(len(source_lower), len(target_lower)))
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: get_rebin_weights
+# Parameters: registry, source_id, target_id, kind
+# Description: This returns the rebinning matrix of kind (see overlap_weights) from grid source_id to
+# # grid target_id, calculating it the first time it is asked for and keeping it in the registry.
+# =================================================================================================
+def get_rebin_weights(registry, source_id, target_id, kind='number'):
+    key = (source_id, target_id, kind)
+    if key not in registry['weights']:
+        source = get_grid(registry, source_id)
+        target = get_grid(registry, target_id)
+        registry['weights'][key] = overlap_weights(source['bin_lower'], source['bin_upper'], target['bin_lower'], target['bin_upper'], kind=kind)
+    return registry['weights'][key]
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: rebin_matrix
+# Parameters: values, weights
+# Description: This rebins values (samples x source bins) with weights (a matrix from
+# # overlap_weights) and returns a samples x target bins array.
+# =================================================================================================
+def rebin_matrix(values, weights):
+    values = np.asarray(values, dtype=np.float64)
+    return np.asarray(weights.T.dot(values.T)).T
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: rebin_rows
+# Parameters: registry, rows, grid_ids, target_id, kind
+# Description: This rebins the distribution of every sample, rows[i] on grid grid_ids[i], onto grid
+# # target_id and returns a samples x target bins array. The samples on each source grid are
+# # rebinned together with one matrix product. With kind 'mean', target bins that no source bin
+# # covers are NaN instead of 0.
+# =================================================================================================
+def rebin_rows(registry, rows, grid_ids, target_id, kind='number'):
+    grid_ids = np.asarray(grid_ids)
+    n_target = len(get_grid(registry, target_id)['bin_lower'])
+    rebinned = np.zeros((len(grid_ids), n_target))
+    for grid_id in np.unique(grid_ids).tolist():
+        members = np.flatnonzero(grid_ids == grid_id)
+        weights = get_rebin_weights(registry, grid_id, target_id, kind)
+        rebinned[members] = rebin_matrix([rows[i] for i in members.tolist()], weights)
+        if kind == 'mean':
+            uncovered = np.asarray(weights.sum(axis=0)).ravel() == 0
+            rebinned[np.ix_(members, np.flatnonzero(uncovered))] = np.nan
+    return rebinned
+
@@ -0,0 +1,160 @@
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Title: Sea Salt Aerosol Collision Efficiency Store
+# Author: agent
+# Date Updated: 17 October 2026
+# Description: This script keeps the collision efficiency of every bin of every sample in dense
+# # arrays (one row per sample, one array per number of bins) so that the processing stages can
+# # share it instead of each recalculating it. Each row is keyed by a hash of the inputs that collision efficiency depends
+# # on: pressure, temperature, relative humidity, wind speed, the bin sizes, and the impaction
+# # model. A row is only recalculated when one of those inputs changes. The store can be saved to
+# # and loaded from disk so it lasts across runs.
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+
+# import packages
+import hashlib
+import numpy as np
+import os
+
+import impaction_models as imp
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: make_ce_store
+# Parameters: store_path
+# Description: This creates an empty store as a dictionary. The rows are kept in one table per
+# # number of bins (an index of key -> row and a matrix), so samples on grids of different widths
+# # (e.g. mini-GNI and VOCALS) can share the store. If store_path is given and a store was saved
+# # there, it is loaded. A store saved with a single matrix for all samples is not read, so it is
+# # started over.
+# =================================================================================================
+def make_ce_store(store_path=None):
+    store = {'tables': {}, 'used': set(), 'store_path': store_path}
+    if store_path is not None and os.path.exists(store_path):
+        with np.load(store_path) as saved:
+            for name in saved.files:
+                if name.startswith('keys_'):
+                    n_bins = name[len('keys_'):]
+                    store['tables'][int(n_bins)] = {'index': {key: i for i, key in enumerate(saved[name].tolist())},
+                                                    'matrix': saved['matrix_' + n_bins]}
+    return store
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: sample_ce_key
+# Parameters: pressure, temperature, rh, wind, bin_middle, ce_model, bin_lower, bin_upper,
+# # ce_quadrature
+# Description: This returns the key of one sample: a hash of its inputs in the units of the data
+# # frame (hPa, degrees Celsius, percent, m/s, microns), the model name, and the quadrature order.
+# # The bin edges are only part of the key when ce_quadrature is used.
+# =================================================================================================
+def sample_ce_key(pressure, temperature, rh, wind, bin_middle, ce_model=None, bin_lower=None, bin_upper=None, ce_quadrature=0):
+    if ce_model is None:
+        ce_model = imp.default_model
+    key = hashlib.sha1()
+    key.update(np.array([pressure, temperature, rh, wind], dtype=np.float64).tobytes())
+    key.update(np.asarray(bin_middle, dtype=np.float64).tobytes())
+    key.update(ce_model.encode())
+    if ce_quadrature:
+        key.update(np.asarray(bin_lower, dtype=np.float64).tobytes())
+        key.update(np.asarray(bin_upper, dtype=np.float64).tobytes())
+        key.update(('quadrature' + str(ce_quadrature)).encode())
+    return key.hexdigest()
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: calculate_ce_matrix
+# Parameters: df, wind_column, ce_model, ce_quadrature
+# Description: This calculates the collision efficiency matrix (samples x bins) for every sample in
+# # df in one array call, without a store. The units are converted the same way remove_low_ce does
+# # (hPa to Pascals, Celsius to Kelvin, percent to fraction, microns to meters). With ce_quadrature
+# # 0 the collision efficiency is taken at bin_middle; otherwise it is averaged from bin_lower to
+# # bin_upper with ce_quadrature-point Gauss-Legendre quadrature (see imp.get_bin_average).
+# =================================================================================================
+def calculate_ce_matrix(df, wind_column='windspeed', ce_model=None, ce_quadrature=0):
+    n_bins = set(len(item) for item in df['bin_middle'])
+    if len(n_bins) > 1:
+        raise ValueError('samples have different numbers of bins: ' + str(sorted(n_bins)))
+    pressure = df['pressure'].to_numpy(dtype=float)[:, None]*100
+    temperature = df['temperature'].to_numpy(dtype=float)[:, None]+273.15
+    rh = df['rh'].to_numpy(dtype=float)[:, None]/100
+    wind = df[wind_column].to_numpy(dtype=float)[:, None]
+    if ce_quadrature:
+        bin_lower = np.array(df['bin_lower'].tolist(), dtype=float)/1000000
+        bin_upper = np.array(df['bin_upper'].tolist(), dtype=float)/1000000
+        return imp.get_bin_average(pressure, temperature, wind, rh, bin_lower, bin_upper, order=ce_quadrature, name=ce_model)
+    bin_middle = np.array(df['bin_middle'].tolist(), dtype=float)/1000000
+    model = imp.get_model(ce_model)
+    return model(pressure, temperature, wind, rh, bin_middle)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: get_ce_matrix
+# Parameters: store, df, wind_column, ce_model, ce_quadrature
+# Description: This returns the collision efficiency matrix (samples x bins) for the samples in df,
+# # using the wind speed in wind_column. Rows already in the store are reused; the rest are
+# # calculated together with calculate_ce_matrix and added to the table of their number of bins.
+# =================================================================================================
+def get_ce_matrix(store, df, wind_column='windspeed', ce_model=None, ce_quadrature=0):
+    n_bins = set(len(item) for item in df['bin_middle'])
+    if len(n_bins) > 1:
+        raise ValueError('samples have different numbers of bins: ' + str(sorted(n_bins)))
+    if ce_quadrature:
+        edges = zip(df['bin_lower'], df['bin_upper'])
+    else:
+        edges = ((None, None) for i in range(len(df)))
+    keys = [sample_ce_key(p, t, h, w, b, ce_model, lower, upper, ce_quadrature)
+            for p, t, h, w, b, (lower, upper) in zip(df['pressure'], df['temperature'], df['rh'], df[wind_column], df['bin_middle'], edges)]
+    if not keys:
+        return np.empty((0, 0))
+    store['used'].update(keys)
+    table = store['tables'].setdefault(n_bins.pop(), {'index': {}, 'matrix': None})
+    # calculate the rows that are not in the store yet (each new key only once)
+    new_keys = {}
+    for i, key in enumerate(keys):
+        if key not in table['index'] and key not in new_keys:
+            new_keys[key] = i
+    if new_keys:
+        new_matrix = calculate_ce_matrix(df.iloc[list(new_keys.values())], wind_column=wind_column, ce_model=ce_model, ce_quadrature=ce_quadrature)
+        start = 0 if table['matrix'] is None else len(table['matrix'])
+        if table['matrix'] is None:
+            table['matrix'] = new_matrix
+        else:
+            table['matrix'] = np.concatenate([table['matrix'], new_matrix])
+        for j, key in enumerate(new_keys):
+            table['index'][key] = start + j
+    return table['matrix'][[table['index'][key] for key in keys]]
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: save_ce_store
+# Parameters: store, store_path, prune
+# Description: This saves the store to store_path (defaults to the path the store was made with).
+# # With prune, rows that were not used since the store was made are dropped first, so samples
+# # whose inputs changed do not leave old rows behind.
+# =================================================================================================
+def save_ce_store(store, store_path=None, prune=True):
+    if store_path is None:
+        store_path = store['store_path']
+    # the keys and matrix of each table are saved as keys_<number of bins> and matrix_<number of bins>
+    arrays = {}
+    for n_bins, table in store['tables'].items():
+        keys = list(table['index'])
+        if prune:
+            keys = [key for key in keys if key in store['used']]
+        if not keys:
+            continue
+        arrays['keys_' + str(n_bins)] = np.array(keys, dtype=str)
+        arrays['matrix_' + str(n_bins)] = table['matrix'][[table['index'][key] for key in keys]]
+    # write to a temporary file first so a crash does not leave a broken store
+    temporary_path = store_path + '.tmp.npz'
+    np.savez(temporary_path, **arrays)
+    os.replace(temporary_path, store_path)
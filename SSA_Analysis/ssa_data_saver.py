@@ -28,67 +28,86 @@ from scipy import stats
 # import functions
 # # see the scripts for these functions to find information on what each function does
 import ssa_reader_functions as rdr
+import ssa_monte_carlo as mc
+import ssa_ce_store as cst
+import ssa_ingest_functions as ing
+import ssa_sample_set as sss
+import ssa_bin_grids as grd
+import ssa_table_store as tbl
 import ranzwong as rw
+import ranzwong_cache as rwc
 
 # define directories
+# # the histogram and environment directories can also be zip or tar (gz or xz) archives, or hold
+# # them, and the files are read from the archives without extracting them
 miniGNI_dir = 'C:/Users/ntril/Dropbox/mini-GNI'
 batch_dir = miniGNI_dir + '/ssa_histo_files'
 batch1_dir = batch_dir + '/Batch1'
 batch1_env_dir = miniGNI_dir + '/python_scripts/data/batch1_env_files'
 data_dir = miniGNI_dir + '/python_scripts/data'
 vocals_dir = batch_dir + '/VOCALS'
+# the mini-GNI flight folders, which hold the sli_env file of each slide (see miniGNI_functions)
+flight_dir = miniGNI_dir + '/miniGNI_data'
 
 # directories for environmental data (buoy, tide, wind)
 buoy_dir = data_dir + '/buoy098_data.csv'
 tide_dir = data_dir + '/tide_data.csv'
 wind_dir = data_dir + '/wind_station_data.csv'
 
-# read in the SSA data into a data frame
-ssaDF = rdr.retrieve_info(data_directory=batch_dir, file_name='sli_histo_')
-
-# this section gets variables to put into the data frame
-# the function retrieve_value finds the data by looking for matching text
-sample_altitude = 'Slide exposure average GPS altitude \(m\)'
-sample_pressure = 'Slide exposure average pressure \(hpa\)'
-sample_temperature = 'Slide exposure average temperature \(C\)'
-sample_RH = 'Slide exposure average rel\. hum\. \(\%\)'
-sample_windspeed = 'Slide exposure average wind speed \(m/s\)'
-# get the variables
-ssaDF['pressure'] = rdr.retrieve_value(sample_pressure, data_directory=batch_dir, file_name='sli_histo_')
-ssaDF['altitude'] = rdr.retrieve_value(sample_altitude, data_directory=batch_dir, file_name='sli_histo_')
-ssaDF['temperature'] = rdr.retrieve_value(sample_temperature, data_directory=batch_dir, file_name='sli_histo_')
-ssaDF['rh'] = rdr.retrieve_value(sample_RH, data_directory=batch_dir, file_name='sli_histo_')
-ssaDF['windspeed'] = rdr.retrieve_value(sample_windspeed, data_directory=batch_dir, file_name='sli_histo_')
-
-# read in the Batch 1 info into the data frame
-batchDF = rdr.retrieve_Batch1_info()
-ssaDF = pd.concat([batchDF, ssaDF], ignore_index=True)
+# Number of processes used to parse the histogram files. 1 parses them in this process. On Windows
+# # jobs > 1 also needs this script to be run under if __name__ == '__main__'.
+jobs = 1
+
+# Manifest of the histogram and sli_env files already parsed. Files that have not changed since
+# # the last run are not parsed again. Set it to None to parse every file.
+manifest = ing.make_manifest(manifest_path=data_dir + '/ingest_manifest.pkl')
+
+# Every distinct bin grid is kept once in a grid registry (see ssa_bin_grids), along with the
+# # weights used to rebin distributions from one grid to another.
+grid_registry = grd.make_grid_registry()
+
+# Read every histogram file in batch_dir in one pass: the miniGNI (sli_histo_), VOCALS (sli_his_),
+# # and Batch 1 (sea_salt_spectrum) files are told apart by their first lines, and each is read
+# # with the header fields of its dialect (see ing.register_dialect). The Batch 1 spectra are
+# # joined with the sli_env files in batch1_env_dir and rebinned onto the mini-GNI grid.
+dialect_frames = rdr.retrieve_dialect_info(batch_dir, jobs=jobs, manifest=manifest, registry=grid_registry)
+ssaDF = dialect_frames['miniGNI']
+batchDF = dialect_frames['Batch1']
+vocalsDF = dialect_frames['VOCALS']
+
+# For reprocessing very large sets of histogram files, the samples can be streamed one at a time
+# # and processed in batches instead, writing each batch to CSV as it finishes, e.g.:
+#sample_fields = ing.dialects['miniGNI']['header_fields']
+#samples = ing.iterate_samples(batch_dir, 'sli_histo_', header_fields=sample_fields, start_date=dt.date(2019, 1, 1), id_prefix='19')
+#ing.process_batches(ing.batch_samples(samples, batch_size=256, header_fields=sample_fields), [rdr.remove_low_ce, lambda df: rdr.add_cutoff_conc(df, cutoff=3.9)], data_dir + '/ssaDF_stream.csv')
+
+# The same slide can be read more than once (e.g. from batch_dir and from Batch1, or from an
+# # archive and its extracted copy). Only one copy of each sample ID is kept, taken from the first
+# # source in source_priority, and the samples that had more than one copy are printed. Slides
+# # saved under more than one sample ID are printed too (kind 'copy'), but are not dropped.
+source_priority = ['miniGNI', 'Batch1']
+frames, duplicateDF = ing.resolve_duplicates({'Batch1': batchDF, 'miniGNI': ssaDF}, source_priority=source_priority)
+if len(duplicateDF) > 0:
+    print(duplicateDF.to_string(index=False))
+ssaDF = pd.concat([frames['Batch1'], frames['miniGNI']], ignore_index=True)
+
+# The samples whose grid is not the canonical 0.8 to 19.8 um mini-GNI grid are printed and then
+# # rebinned onto it (see rdr.rebin_samples), so that every sample can be processed together.
+grid_ids = grd.intern_df_grids(grid_registry, ssaDF)
+noncanonicalDF = grd.noncanonical_samples(grid_registry, grid_ids, ssaDF['id_number'])
+if len(noncanonicalDF) > 0:
+    print(noncanonicalDF.to_string(index=False))
+    ssaDF = rdr.rebin_samples(ssaDF, registry=grid_registry)
 
 # convert temperature to Kelvin
 ssaDF['temperature'] += 273.15
 
-# read in VOCALS data
-vocalsDF = rdr.retrieve_info(data_directory=vocals_dir, file_name='sli_his_')
-# VOCALS variable names
-vocals_altitude = 'Slide exposure GPS altitude \(m\)'
-vocals_pressure = 'Slide exposure pressure     \(hpa\)'
-vocals_temperature = 'Slide exposure temperature  \(degC\)'
-vocals_RH = 'Slide exposure rel\. hum\.    \(\%\)'
-vocals_windspeed = 'Slide exposure wind speed   \(m/s\)'
-vocals_mug = 'Log-normal geometric mean radius \(micron\)'
-vocals_std = 'Log-normal geometric st\.dev\.'
-vocals_chi = 'Reduced chi-square'
-# read in those variables
-vocalsDF['pressure'] = rdr.retrieve_value(vocals_pressure, data_directory=vocals_dir, file_name='sli_his_')
-vocalsDF['altitude'] = rdr.retrieve_value(vocals_altitude, data_directory=vocals_dir, file_name='sli_his_')
-vocalsDF['temperature'] = rdr.retrieve_value(vocals_temperature, data_directory=vocals_dir, file_name='sli_his_')
-vocalsDF['rh'] = rdr.retrieve_value(vocals_RH, data_directory=vocals_dir, file_name='sli_his_')
-vocalsDF['surface_wind'] = rdr.retrieve_value(vocals_windspeed, data_directory=vocals_dir, file_name='sli_his_')
 vocalsDF['windspeed'] = vocalsDF['surface_wind'] + 250 # so that collision efficiency is 100% b/c sampling done on aircraft
 vocalsDF['temperature'] += 273.15
-vocalsDF['gni_mug'] = rdr.retrieve_value(vocals_mug, data_directory=vocals_dir, file_name='sli_his_')
-vocalsDF['gni_std'] = rdr.retrieve_value(vocals_std, data_directory=vocals_dir, file_name='sli_his_')
-vocalsDF['gni_chi'] = rdr.retrieve_value(vocals_chi, data_directory=vocals_dir, file_name='sli_his_')
+
+# save the manifest for the next run
+if manifest is not None:
+    ing.save_manifest(manifest)
 
 # =================================================================================================
 # drop some samples that were bad
@@ -120,33 +139,91 @@ ssaDF = rdr.add_wave_data(ssaDF, buoy_dir = buoy_dir)
 ssaDF = rdr.add_tide_data(ssaDF, tide_dir = tide_dir)
 ssaDF = rdr.add_wind_data(ssaDF, wind_dir = wind_dir)
 
+# Collision efficiency model, chosen by name from impaction_models (e.g. 'israel_rosner_cylinder').
+ce_model = 'ranz_wong_ribbon'
+
+# Number of Gauss-Legendre points used to average collision efficiency across the width of each
+# # bin (bin_lower to bin_upper). 0 takes collision efficiency at bin_middle only, as before; set
+# # it to e.g. 5 to average over each bin.
+ce_quadrature = 0
+
+# Collision efficiency cache. It is off by default. To turn it on, uncomment the line below; the
+# # cache is then loaded from and saved to data_dir so later runs skip most of the calculation.
+ce_cache = None
+#ce_cache = rwc.make_ce_cache(cache_path=data_dir + '/ce_cache.pkl')
+
+# Collision efficiency matrix shared by remove_low_ce, add_wind_sensitivity, and fit_lognormal. It
+# # is saved in data_dir, and on the next run only samples whose pressure, temperature, relative
+# # humidity, or wind speed changed are recalculated. Set it to None to calculate collision
+# # efficiency in each stage instead (which, with ce_quadrature = 0, is needed to use ce_cache).
+ce_store = cst.make_ce_store(store_path=data_dir + '/ce_store.npz')
+
+# The processing stages below work on a sample set (see ssa_sample_set): the bin columns are kept
+# # as arrays with the bin grid stored once, and each stage works on all samples at once. It is
+# # turned back into a data frame after the lognormal fit. Set use_sample_set to False to process
+# # the data frame of lists row by row instead. If the samples are not all on the same bin grid,
+# # they cannot be made into a sample set, and the data frame is processed instead.
+use_sample_set = True
+if use_sample_set:
+    try:
+        ssaDF = sss.make_sample_set(ssaDF, registry=grid_registry)
+    except ValueError as err:
+        print('Processing the data frame instead of a sample set: ' + str(err))
+        use_sample_set = False
+
 # remove low CE data and add cutoff data
-ssaDF = rdr.remove_low_ce(ssaDF)
+ssaDF = rdr.remove_low_ce(ssaDF, ce_cache=ce_cache, ce_model=ce_model, ce_store=ce_store, ce_quadrature=ce_quadrature)
 ssaDF = rdr.add_cutoff_conc(ssaDF, cutoff=3.9)
+# radius where each sample reaches 40% collision efficiency (column 'ce40_radius'); passing
+# # cutoff='ce40_radius' to add_cutoff_conc cuts each sample at its own radius instead of 3.9 um
+ssaDF = rdr.add_ce_cutoff(ssaDF, efficiency=0.4)
 #vocalsDF = rdr.remove_low_ce(vocalsDF)
 #vocalsDF = rdr.add_cutoff_conc(vocalsDF, cutoff=3.9)
 #vocalsDF = vocalsDF[vocalsDF.cutoff_total_conc > 150]
 #vocalsDF.reset_index(inplace=True, drop=True)
 
 # add wind sensitivity data
-ssaDF = rdr.add_wind_sensitivity(ssaDF, fractional_change=0.35)
+ssaDF = rdr.add_wind_sensitivity(ssaDF, fractional_change=0.35, ce_cache=ce_cache, ce_model=ce_model, ce_store=ce_store, ce_quadrature=ce_quadrature)
+if ce_cache is not None:
+    print(rwc.ce_cache_info(ce_cache))
+    rwc.save_ce_cache(ce_cache)
 ssaDF = rdr.add_low_wind_cutoff_conc(ssaDF, cutoff=4.9)
 
+# add Monte Carlo percentiles of the real concentrations (slow for many realizations; jobs > 1
+# # spreads the work over several processes). This and add_vocals need a data frame, so with
+# # use_sample_set run them after sss.sample_set_to_df below. The Monte Carlo draws the wind speed
+# # of each sample between its minimum and maximum over the exposure, which are taken from the
+# # sli_env files of the mini-GNI slides in flight_dir (the Batch 1 samples get them from
+# # batch1_env_dir).
+#ssaDF = rdr.add_env_wind_range(ssaDF, env_dir=flight_dir, jobs=jobs)
+#ssaDF = mc.add_monte_carlo_conc(ssaDF, n_realizations=1000, wind_fraction=0.35, rh_error=5.0, temperature_error=0.5, seed=0, jobs=1, ce_model=ce_model, ce_quadrature=ce_quadrature)
+
 # create synthetic data combining VOCALS and SSA data
 #synthDF = ssaDF.copy(deep=True)
-#synthDF = rdr.add_vocals(vdf=vocalsDF, sdf=synthDF)
+#synthDF = rdr.add_vocals(vdf=vocalsDF, sdf=synthDF, registry=grid_registry)
 
 # add lognormal fit data
-ssaDF = rdr.fit_lognormal(ssaDF)
+ssaDF = rdr.fit_lognormal(ssaDF, ce_store=ce_store, ce_model=ce_model, ce_quadrature=ce_quadrature)
 #vocalsDF = rdr.fit_lognormal(vocalsDF)
-#synthDF = rdr.fit_synth_lognormal(synthDF)
-
-# save the data frame to CSV
-ssaDF.to_csv(data_dir + '/ssaDF.csv', index=False)
-#vocalsDF.to_csv(data_dir + '/vocalsDF.csv', index=False)
-#synthDF.to_csv(data_dir + '/synthDF.csv', index=False)
+#synthDF = rdr.fit_synth_lognormal(synthDF, ce_store=ce_store, ce_model=ce_model, ce_quadrature=ce_quadrature)
+if use_sample_set:
+    ssaDF = sss.sample_set_to_df(ssaDF)
+
+# save the collision efficiency matrix for the next run
+if ce_store is not None:
+    cst.save_ce_store(ce_store)
+
+# Save the data frame as a table (see ssa_table_store): the single values go to metadata.csv and
+# # each bin column to its own array file, so nothing is lost to text and loading is fast. With
+# # save_csv the old CSV (lists as text) is written too.
+save_csv = True
+tbl.save_table(ssaDF, data_dir + '/ssaDF', csv_path=data_dir + '/ssaDF.csv' if save_csv else None)
+#tbl.save_table(vocalsDF, data_dir + '/vocalsDF', csv_path=data_dir + '/vocalsDF.csv' if save_csv else None)
+#tbl.save_table(synthDF, data_dir + '/synthDF', csv_path=data_dir + '/synthDF.csv' if save_csv else None)
 
 # NOTE: ssaDF.csv must be altered manually to include surface wind speed!!!
 # Personally, I edit ssaDF.csv to include surface wind speed and then save it as a new CSV file
 # titled "ssaDF_final.csv" to avoid confusion and so that the CSV file containing the 
 # surface wind data does not get updated automatically when running this script.
+# The edited CSV can then be turned into a table once, so the plotter does not have to parse it:
+#tbl.csv_to_table(data_dir + '/ssaDF_final.csv', data_dir + '/ssaDF_final')
@@ -0,0 +1,869 @@
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Title: Sea Salt Aerosol Ingest Functions
+# Author: agent
+# Date Updated: 17 October 2026
+# Description: This script reads GNI histogram files in a single pass. Every file is opened once and
+# # scanned with precompiled patterns for the size distribution, the exposure times, the duration,
+# # the Ranz-Wong radius, and any requested header fields (e.g. pressure or wind speed). Each file
+# # becomes one record (a dictionary keyed by column name), so the values of a sample always stay
+# # together no matter what order the files are found in. The records are then turned into the
+# # same data frame that retrieve_info has always returned. Files can be parsed in parallel over a
+# # pool of processes, and a manifest of the files already parsed lets later runs parse only the
+# # files that are new or changed. Files can also be read straight out of zip and tar (gz or xz)
+# # archives without extracting them. For very large sets of files, the samples can instead be
+# # streamed one at a time and processed in batches of bounded size. The kinds of histogram file
+# # (miniGNI, VOCALS, and Batch 1) are registered as dialects, and the dialect of each file is
+# # detected from its first lines, so a directory holding all of them is read in one pass.
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+
+# import packages
+import datetime as dt
+import hashlib
+import io
+import math
+import numpy as np
+import os
+import pandas as pd
+import pickle
+import re
+import tarfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import sli_env_codec as sec
+
+# precompiled patterns for the lines every histogram file has
+# # a bin table line: bin number, lower, middle, and upper bin radius, a flag, and concentration
+# # (e.g. 1.5E+05). The pattern only finds the lines; the numbers are read by read_bin_table.
+bin_pattern = re.compile(r'\s+\d+\s+\d+\.\d+\s+\d+\.\d+\s+\d+\.\d+\s+\d\s+\d\.\d+E\+\d+')
+# columns of the bin table to read: bin number, lower, middle, upper, concentration
+bin_columns = (0, 1, 2, 3, 5)
+begin_pattern = re.compile(r'Slide begin exposure\s+\(hhmmss\.s\)\s+=\s+(\d+)\.\d')
+end_pattern = re.compile(r'Slide end exposure\s+\(hhmmss\.s\)\s+=\s+(\d+)\.\d')
+duration_pattern = re.compile(r'Slide exposure duration \(s\)\s+=\s+(\d+)')
+rv_pattern = re.compile(r'Ranz-Vong 50\% coll-eff radius \(m\)\s+=\s+(\d+)\.(\d+)')
+# patterns for the Batch 1 sea_salt_spectrum files
+# # a bin table line: bin number, lower, middle, and upper bin radius, two unused columns,
+# # concentration, and cumulative concentration
+spectrum_bin_pattern = re.compile(r'\s+\d+\s+\d+\.\d+\s+\d+\.\d+\s+\d+\.\d+\s+\d\.\d+E\+\d+\s+\d\.\d+E\+\d+\s+\d\.\d+E\+\d+\s+\d\.\d+E\+\d+')
+# columns of the bin table to read: bin number, lower, middle, upper, concentration, cumulative
+# # concentration
+spectrum_bin_columns = (0, 1, 2, 3, 6, 7)
+spectrum_rv_pattern = re.compile(r' cumulative: ranz_wong_50_percent=\s+(\d)\.(\d+)E\-(\d+)')
+# header fields of each histogram dialect (column name -> label, see compile_header_fields)
+# # miniGNI sli_histo_ files
+miniGNI_fields = {'pressure': r'Slide exposure average pressure \(hpa\)',
+                  'altitude': r'Slide exposure average GPS altitude \(m\)',
+                  'temperature': r'Slide exposure average temperature \(C\)',
+                  'rh': r'Slide exposure average rel\. hum\. \(\%\)',
+                  'windspeed': r'Slide exposure average wind speed \(m/s\)'}
+# # VOCALS sli_his_ files
+vocals_fields = {'pressure': r'Slide exposure pressure     \(hpa\)',
+                 'altitude': r'Slide exposure GPS altitude \(m\)',
+                 'temperature': r'Slide exposure temperature  \(degC\)',
+                 'rh': r'Slide exposure rel\. hum\.    \(\%\)',
+                 'surface_wind': r'Slide exposure wind speed   \(m/s\)',
+                 'gni_mug': r'Log-normal geometric mean radius \(micron\)',
+                 'gni_std': r'Log-normal geometric st\.dev\.',
+                 'gni_chi': r'Reduced chi-square'}
+
+# registry of histogram dialects: name -> {'file_name', 'signature', 'parser', 'parser_args',
+# # 'header_fields'} (see register_dialect)
+dialects = {}
+# number of lines at the start of a file that are searched for a dialect's signature
+sniff_lines = 100
+
+# version of the records the parsers return; it is part of each manifest section's key, so it is
+# # raised whenever the records change and files read by an older version are parsed again
+record_version = 2
+
+# archives that files can be read from without extracting them
+archive_suffixes = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.xz', '.txz')
+
+# columns of the data frame in the order retrieve_info has always returned them
+info_columns = ['id_number', 'date', 'timedate', 'end_time', 'duration', 'rv_radius', 'bin_number',
+                'bin_lower', 'bin_middle', 'bin_upper', 'bin_conc', 'cumu_conc', 'total_conc',
+                'bin_salt', 'total_salt']
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: compile_header_fields
+# Parameters: header_fields
+# Description: This turns a dictionary of column name -> label (the same regular expression text
+# # that retrieve_value takes, e.g. 'Slide exposure average pressure \(hpa\)') into a dictionary of
+# # column name -> compiled pattern for the line "label = number".
+# =================================================================================================
+def compile_header_fields(header_fields):
+    if header_fields is None:
+        return {}
+    return {name: re.compile(label + r'\s+=\s+(\d+)\.(\d+)') for name, label in header_fields.items()}
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: is_archive
+# Parameters: path
+# Description: This returns True if path is a zip or tar archive (by its file extension).
+# =================================================================================================
+def is_archive(path):
+    return path.lower().endswith(archive_suffixes)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: find_histogram_files
+# Parameters: data_directory, file_name
+# Description: This walks through data_directory and returns the paths of all files whose names
+# # start with file_name, in the order os.walk finds them. Archives found along the way are
+# # returned too, since they may hold such files (see read_source). data_directory can also be an
+# # archive itself.
+# =================================================================================================
+def find_histogram_files(data_directory, file_name):
+    if is_archive(data_directory) and os.path.isfile(data_directory):
+        return [data_directory]
+    file_list = []
+    for subdir, dirs, files in os.walk(data_directory):
+        for file in files:
+            if file.startswith(file_name) or is_archive(file):
+                file_list.append(subdir + os.sep + file)
+    return file_list
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: member_lines
+# Parameters: data
+# Description: This splits the bytes of an archive member into lines the same way open(file, 'rt')
+# # would.
+# =================================================================================================
+def member_lines(data):
+    return io.TextIOWrapper(io.BytesIO(data)).readlines()
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: read_source
+# Parameters: source, file_name
+# Description: This yields (file, lines) for every file in source whose name starts with
+# # file_name, where file is the name of the file (without its directory) and lines is the list of
+# # its lines. A plain file gives itself. A zip or tar archive is streamed member by member without
+# # being extracted, so only one member is held in memory at a time.
+# =================================================================================================
+def read_source(source, file_name):
+    if not is_archive(source):
+        with open(source, 'rt') as myfile:
+            yield os.path.basename(source), myfile.readlines()
+    elif source.lower().endswith('.zip'):
+        with zipfile.ZipFile(source) as archive:
+            for member in archive.infolist():
+                file = member.filename.rsplit('/', 1)[-1]
+                if not member.is_dir() and file.startswith(file_name):
+                    yield file, member_lines(archive.read(member))
+    else:
+        # 'r|*' reads the tar (plain, gz, or xz) as a stream from start to end
+        with tarfile.open(source, 'r|*') as archive:
+            for member in archive:
+                file = member.name.rsplit('/', 1)[-1]
+                if member.isfile() and file.startswith(file_name):
+                    yield file, member_lines(archive.extractfile(member).read())
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: read_bin_table
+# Parameters: lines, start, pattern, columns
+# Description: This finds the end of the bin table that starts at lines[start] (the first line
+# # after start that does not match pattern) and reads the whole block at once with np.loadtxt.
+# # It returns the index of the line after the block and an array with one column for each of
+# # columns. Numbers in scientific notation (e.g. 1.5E+05) are read directly.
+# =================================================================================================
+def read_bin_table(lines, start, pattern, columns):
+    end = start + 1
+    while end < len(lines) and pattern.search(lines[end]):
+        end += 1
+    table = np.loadtxt(lines[start:end], usecols=columns, ndmin=2)
+    return end, table
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: parse_histogram_lines
+# Parameters: lines, id_str, header_patterns
+# Description: This reads the lines of one histogram file and returns its record. id_str is the
+# # sample ID number, which also gives the sample date. header_patterns comes from
+# # compile_header_fields. Values that are not found in the file are left as NaN (or None for the
+# # times) so that a missing line can not shift another sample's data.
+# =================================================================================================
+def parse_histogram_lines(lines, id_str, header_patterns):
+    date_str = id_str.split('a',1)[0]
+    record = {'id_number': id_str,
+              'date': dt.datetime.strptime(date_str, '%y%m%d').date(),
+              'timedate': None,
+              'end_time': None,
+              'duration': np.nan,
+              'rv_radius': np.nan,
+              'bin_number': [],
+              'bin_lower': [],
+              'bin_middle': [],
+              'bin_upper': [],
+              'bin_conc': []}
+    for name in header_patterns:
+        record[name] = np.nan
+    lines = list(lines)
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if bin_pattern.search(line): # start of the size distribution table
+            i, table = read_bin_table(lines, i, bin_pattern, bin_columns)
+            record['bin_number'] += table[:, 0].astype(int).tolist()
+            record['bin_lower'] += table[:, 1].tolist()
+            record['bin_middle'] += table[:, 2].tolist()
+            record['bin_upper'] += table[:, 3].tolist()
+            record['bin_conc'] += table[:, 4].tolist()
+            continue
+        i += 1
+        # every other line we want is "label = value"
+        if '=' not in line:
+            continue
+        match = begin_pattern.search(line)
+        if match:
+            record['timedate'] = dt.datetime.strptime(date_str + ' ' + match.group(1), '%y%m%d %H%M%S')
+            continue
+        match = end_pattern.search(line)
+        if match:
+            record['end_time'] = dt.datetime.strptime(date_str + ' ' + match.group(1), '%y%m%d %H%M%S')
+            continue
+        match = duration_pattern.search(line)
+        if match: # duration in minutes
+            record['duration'] = float(match.group(1))/60.0
+            continue
+        match = rv_pattern.search(line)
+        if match: # Ranz-Wong 50% radius, converted from meters to micrometers
+            record['rv_radius'] = 1000000*float(match.group(1) + '.' + match.group(2))
+            continue
+        for name, pattern in header_patterns.items():
+            # only the first match of each field is kept
+            if np.isnan(record[name]):
+                match = pattern.search(line)
+                if match:
+                    record[name] = float(match.group(1) + '.' + match.group(2))
+    return finish_record(record)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: finish_record
+# Parameters: record
+# Description: This fills in the columns of a record that are calculated from its size
+# # distribution, the same way retrieve_info always has: distributions that stop at 19.4 um are
+# # extended to 19.8 um with zero concentration, and the salt mass, cumulative concentration, and
+# # totals are added.
+# =================================================================================================
+def finish_record(record):
+    if len(record['bin_middle']) > 0 and max(record['bin_middle']) < 19.8:
+        record['bin_number'] += [98, 99]
+        record['bin_lower'] += [19.5, 19.7]
+        record['bin_middle'] += [19.6, 19.8]
+        record['bin_upper'] += [19.7, 19.9]
+        record['bin_conc'] += [0.0, 0.0]
+    # salt mass in ug from (4/3)pi*r^3 with the bin middle radius in microns and NaCl density
+    # # 2170 kg*m-3
+    record['bin_salt'] = [(4*math.pi*((r/1000000)**3)/3)*2170*1000000000*n for r, n in zip(record['bin_middle'], record['bin_conc'])]
+    record['total_salt'] = sum(record['bin_salt'])
+    # cumulative concentration: concentration of all SSA larger than each bin
+    record['cumu_conc'] = np.cumsum(record['bin_conc'][::-1])[::-1].tolist()
+    record['total_conc'] = sum(record['bin_conc'])
+    return record
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: parse_histogram_file
+# Parameters: file, lines, file_name, header_patterns
+# Description: This returns the record of one histogram file, given its name and its lines (see
+# # read_source). The sample ID number is the part of the file name after file_name.
+# # header_patterns comes from compile_header_fields.
+# =================================================================================================
+def parse_histogram_file(file, lines, file_name, header_patterns=None):
+    id_str = file.split(file_name,1)[1]
+    return parse_histogram_lines(lines, id_str, header_patterns or {})
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: parse_spectrum_file
+# Parameters: file, lines, file_name, header_patterns
+# Description: This returns the record of one Batch 1 sea_salt_spectrum file, given its name and
+# # its lines (see read_source). Every bin of the file is kept (retrieve_Batch1_info rebins them
+# # onto the histogram file grid), and the cumulative concentration is taken from the file. The
+# # Ranz-Wong radius is only read if the last bin has a middle radius from 0.8 to 19.8 um, the
+# # same way retrieve_Batch1_info always has read it. The sample ID number is the part of
+# # the file name after file_name. The record has no times or environmental values; those are in
+# # the Batch 1 sli_env files, so header_patterns is not used. It is only there so that this is
+# # called the same way as parse_histogram_file (see register_dialect).
+# =================================================================================================
+def parse_spectrum_file(file, lines, file_name='sea_salt_spectrum_', header_patterns=None):
+    record = {'id_number': file[len(file_name):],
+              'rv_radius': np.nan,
+              'bin_number': [],
+              'bin_lower': [],
+              'bin_middle': [],
+              'bin_upper': [],
+              'bin_conc': [],
+              'cumu_conc': []}
+    ignore = False
+    i = 0
+    while i < len(lines):
+        if spectrum_bin_pattern.search(lines[i]): # start of the size distribution table
+            i, table = read_bin_table(lines, i, spectrum_bin_pattern, spectrum_bin_columns)
+            record['bin_number'] += table[:, 0].astype(int).tolist()
+            record['bin_lower'] += table[:, 1].tolist()
+            record['bin_middle'] += table[:, 2].tolist()
+            record['bin_upper'] += table[:, 3].tolist()
+            record['bin_conc'] += table[:, 4].tolist()
+            record['cumu_conc'] += table[:, 5].tolist()
+            # the Ranz-Wong line only counts if the last bin read is from 0.8 to 19.8 um
+            ignore = not (0.8 <= table[-1, 2] <= 19.80)
+            continue
+        if not ignore:
+            match = spectrum_rv_pattern.search(lines[i])
+            if match: # Ranz-Wong 50% radius, converted from meters to micrometers
+                record['rv_radius'] = 1000000*float(match.group(1) + '.' + match.group(2))*(10**(-1*float(match.group(3))))
+        i += 1
+    # salt mass of each bin and totals
+    record['bin_salt'] = [(4*math.pi*((r/1000000)**3)/3)*2170*1000000000*n for r, n in zip(record['bin_middle'], record['bin_conc'])]
+    record['total_salt'] = sum(record['bin_salt'])
+    record['total_conc'] = sum(record['bin_conc'])
+    return record
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: parse_env_file
+# Parameters: file, lines
+# Description: This returns the record of one sli_env file (Batch 1 or mini-GNI), given its name and
+# # its lines (see read_source). The record holds the sample date, begin and end time, duration,
+# # wind speed and its minimum and maximum over the exposure, relative humidity (percent),
+# # temperature (degrees Celsius), altitude, and pressure (hPa). The file is decoded by
+# # sec.decode_env_lines. Values that are not found are left as NaN (or None for the times).
+# =================================================================================================
+def parse_env_file(file, lines):
+    date_str = file[8:-2] # the date is in the file name
+    env = {label: values[0] for label, values in sec.decode_env_lines([lines]).items()}
+    record = {'id_number': file[8:],
+              'date': dt.datetime.strptime(date_str, '%y%m%d').date(),
+              'timedate': None,
+              'end_time': None,
+              'duration': np.nan,
+              'windspeed': env['wind_speed_bar'],
+              'windspeed_min': env['wind_speed_min'],
+              'windspeed_max': env['wind_speed_max'],
+              'rh': 100*env['rel_hum_bar'], # fraction to percent
+              'temperature': env['t_bar'] - 273.15, # Kelvin to Celsius
+              'altitude': int(env['z_bar']) if np.isfinite(env['z_bar']) else np.nan,
+              'pressure': env['p_bar']/100} # Pascals to hPa
+    for column, label in (('timedate', 'hhmmss_begin'), ('end_time', 'hhmmss_end')):
+        if np.isfinite(env[label]):
+            record[column] = dt.datetime.strptime(date_str + ' ' + '{:06d}'.format(int(env[label])), '%y%m%d %H%M%S')
+    # duration in minutes from the begin and end time
+    if record['timedate'] is not None and record['end_time'] is not None:
+        record['duration'] = (record['end_time'] - record['timedate']).total_seconds()/60.0
+    return record
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: parse_chunk
+# Parameters: parser, sources, file_name, parser_args
+# Description: This runs parser(file, lines, *parser_args) on every file in sources whose name
+# # starts with file_name (see read_source) and returns one list of records for each source. It is
+# # the unit of work that parse_in_chunks hands to each process.
+# =================================================================================================
+def parse_chunk(parser, sources, file_name, parser_args=()):
+    return [[parser(file, lines, *parser_args) for file, lines in read_source(source, file_name)] for source in sources]
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: parse_in_chunks
+# Parameters: parser, sources, file_name, parser_args, jobs, chunk_size
+# Description: This runs parse_chunk over all of sources and returns one list of records for each
+# # source, in the same order as sources. The sources are split into chunks of chunk_size, and
+# # with jobs > 1 the chunks are spread over a pool of jobs processes (jobs = None uses every
+# # core). jobs = 1 parses everything in this process. Note that on Windows a script that uses
+# # jobs > 1 must do so under if __name__ == '__main__'.
+# =================================================================================================
+def parse_in_chunks(parser, sources, file_name, parser_args=(), jobs=1, chunk_size=64):
+    chunks = [sources[start:start+chunk_size] for start in range(0, len(sources), chunk_size)]
+    if jobs == 1 or len(chunks) <= 1:
+        results = [parse_chunk(parser, chunk, file_name, parser_args) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(parse_chunk, parser, chunk, file_name, parser_args) for chunk in chunks]
+            results = [future.result() for future in futures]
+    return [source_records for result in results for source_records in result]
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: parse_files
+# Parameters: parser, sources, file_name, parser_args, jobs, chunk_size
+# Description: This parses every file in sources with parse_in_chunks and returns all the records
+# # sorted by sample ID number, so the result is the same for any number of jobs.
+# =================================================================================================
+def parse_files(parser, sources, file_name, parser_args=(), jobs=1, chunk_size=64):
+    records = [record for source_records in parse_in_chunks(parser, sources, file_name, parser_args, jobs=jobs, chunk_size=chunk_size) for record in source_records]
+    records.sort(key=lambda record: record['id_number'])
+    return records
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: make_manifest
+# Parameters: manifest_path
+# Description: This creates an empty ingestion manifest as a dictionary, or loads the one saved at
+# # manifest_path. The manifest has one section per kind of file read (see parse_files_cached),
+# # and each section holds, for every file or archive, its size, modification time, content hash,
+# # and the records parsed from it.
+# =================================================================================================
+def make_manifest(manifest_path=None):
+    manifest = {'sections': {}, 'manifest_path': manifest_path, 'parsed': 0, 'reused': 0}
+    if manifest_path is not None and os.path.exists(manifest_path):
+        with open(manifest_path, 'rb') as manifest_file:
+            manifest['sections'] = pickle.load(manifest_file)
+    return manifest
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: file_hash
+# Parameters: filepath
+# Description: This returns the sha1 hash of the contents of a file.
+# =================================================================================================
+def file_hash(filepath):
+    with open(filepath, 'rb') as myfile:
+        return hashlib.sha1(myfile.read()).hexdigest()
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: parse_files_cached
+# Parameters: manifest, parser, sources, file_name, parser_args, jobs, chunk_size, data_directory
+# Description: This returns the same records as parse_files, but only parses the sources (files or
+# # archives) that are not in the manifest yet or have changed. A source whose size and
+# # modification time are the same as in the manifest is not opened at all. A source whose size or
+# # modification time changed is hashed, and only parsed again if its contents changed. Sources in
+# # the manifest section that are no longer in sources (deleted files) are dropped from it; if
+# # sources were found in data_directory, only the ones under data_directory are dropped, so
+# # reading another directory with the same parser keeps its sources. The section is chosen by the
+# # parser, file_name, and parser_args, so changing e.g. the header fields parses everything again.
+# =================================================================================================
+def parse_files_cached(manifest, parser, sources, file_name, parser_args=(), jobs=1, chunk_size=64, data_directory=None):
+    if manifest is None:
+        return parse_files(parser, sources, file_name, parser_args, jobs=jobs, chunk_size=chunk_size)
+    section_key = parser.__name__ + repr((file_name,) + tuple(parser_args)) + ' v' + str(record_version)
+    old_section = manifest['sections'].get(section_key, {})
+    section = {}
+    # keep the sources of other directories
+    if data_directory is not None:
+        root = os.path.abspath(data_directory)
+        for source, entry in old_section.items():
+            path = os.path.abspath(source)
+            if path != root and not path.startswith(os.path.join(root, '')):
+                section[source] = entry
+    to_parse = []
+    for source in sources:
+        stat = os.stat(source)
+        entry = old_section.get(source)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            section[source] = entry
+            continue
+        content_hash = file_hash(source)
+        if entry is not None and entry['sha1'] == content_hash:
+            # touched but not changed
+            entry.update(size=stat.st_size, mtime=stat.st_mtime_ns)
+            section[source] = entry
+            continue
+        section[source] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha1': content_hash, 'records': None}
+        to_parse.append(source)
+    # parse the new and changed sources and put their records in the manifest
+    new_records = parse_in_chunks(parser, to_parse, file_name, parser_args, jobs=jobs, chunk_size=chunk_size)
+    for source, source_records in zip(to_parse, new_records):
+        section[source]['records'] = source_records
+    manifest['sections'][section_key] = section
+    manifest['parsed'] += len(to_parse)
+    manifest['reused'] += len(sources) - len(to_parse)
+    records = [record for source in sources for record in section[source]['records']]
+    records.sort(key=lambda record: record['id_number'])
+    return records
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: save_manifest
+# Parameters: manifest, manifest_path
+# Description: This saves the manifest to manifest_path (defaults to the path the manifest was made
+# # with), through a temporary file so a crash does not leave a broken manifest.
+# =================================================================================================
+def save_manifest(manifest, manifest_path=None):
+    if manifest_path is None:
+        manifest_path = manifest['manifest_path']
+    temporary_path = manifest_path + '.tmp'
+    with open(temporary_path, 'wb') as manifest_file:
+        pickle.dump(manifest['sections'], manifest_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, manifest_path)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: index_records
+# Parameters: records
+# Description: This returns a dictionary of sample ID number -> record, so a sample can be looked
+# # up directly instead of by its position in a list.
+# =================================================================================================
+def index_records(records):
+    return {record['id_number']: record for record in records}
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: join_records
+# Parameters: records, other_records, other_columns
+# Description: This joins other_records onto records by sample ID number. Every record in records
+# # gets the other_columns of the record in other_records with the same sample ID (NaN if there is
+# # none). It returns the joined records in the order of records, the sample IDs in records that
+# # have no match, and the sample IDs in other_records that have no match.
+# =================================================================================================
+def join_records(records, other_records, other_columns):
+    other_index = index_records(other_records)
+    joined = []
+    unmatched = []
+    for record in records:
+        other = other_index.get(record['id_number'])
+        if other is None:
+            unmatched.append(record['id_number'])
+            other = {}
+        joined_record = dict(record)
+        for column in other_columns:
+            joined_record[column] = other.get(column, np.nan)
+        joined.append(joined_record)
+    ids = index_records(records)
+    other_unmatched = [id_str for id_str in other_index if id_str not in ids]
+    return joined, unmatched, other_unmatched
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: sample_hash
+# Parameters: bin_middle, bin_conc
+# Description: This returns a hash of the size distribution of one sample. Two copies of the same
+# # slide give the same hash wherever they were read from.
+# =================================================================================================
+def sample_hash(bin_middle, bin_conc):
+    key = hashlib.sha1()
+    key.update(np.asarray(bin_middle, dtype=np.float64).tobytes())
+    key.update(np.asarray(bin_conc, dtype=np.float64).tobytes())
+    return key.hexdigest()
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: resolve_duplicates
+# Parameters: frames, source_priority
+# Description: This finds samples that were read more than once, from one source or from several.
+# # frames is a dictionary of source name -> data frame (e.g. {'miniGNI': ssaDF, 'Batch1':
+# # batchDF}). Every sample is put in one index of sample ID -> copies, with the hash of each
+# # copy's size distribution (see sample_hash). A sample ID with several copies is a 'duplicate'
+# # if all the copies are the same and a 'conflict' if they are not. Either way only one copy is
+# # kept: the one from the first source in source_priority (a list of source names, by default
+# # the order of frames), or the first one found within a source. The kept copies are also put in
+# # an index of hash -> sample IDs, so the same slide saved under different sample IDs is found
+# # too (kind 'copy'); those are reported but not dropped, since which ID is right can not be told.
+# # Samples with no particles all have the same size distribution, so they are not compared by
+# # hash. It returns the dictionary of data frames without the dropped copies and a data frame
+# # reporting every sample ID that had more than one copy and every group of sample IDs with the
+# # same contents (listed in matching_ids).
+# =================================================================================================
+def resolve_duplicates(frames, source_priority=None):
+    if source_priority is None:
+        source_priority = list(frames)
+    # sources that are not in source_priority come last
+    rank = {source: i for i, source in enumerate(source_priority)}
+    index = {}
+    for source, df in frames.items():
+        for position, (id_str, bin_middle, bin_conc) in enumerate(zip(df['id_number'], df['bin_middle'], df['bin_conc'])):
+            copy = (rank.get(source, len(rank)), source, position, sample_hash(bin_middle, bin_conc))
+            index.setdefault(id_str, []).append(copy)
+    keep = {source: [] for source in frames}
+    report = []
+    hash_index = {}
+    for id_str, copies in index.items():
+        copies.sort(key=lambda copy: copy[0])
+        kept = copies[0]
+        keep[kept[1]].append(kept[2])
+        if len(copies) > 1:
+            report.append({'id_number': id_str,
+                           'kind': 'duplicate' if len(set(copy[3] for copy in copies)) == 1 else 'conflict',
+                           'kept_source': kept[1],
+                           'dropped_sources': [copy[1] for copy in copies[1:]],
+                           'matching_ids': []})
+        if np.any(np.asarray(frames[kept[1]]['bin_conc'].iloc[kept[2]], dtype=np.float64) != 0):
+            hash_index.setdefault(kept[3], []).append((kept[0], id_str, kept[1]))
+    for matches in hash_index.values():
+        if len(matches) > 1:
+            matches.sort()
+            report.append({'id_number': matches[0][1],
+                           'kind': 'copy',
+                           'kept_source': matches[0][2],
+                           'dropped_sources': [],
+                           'matching_ids': [match[1] for match in matches[1:]]})
+    resolved = {source: df.iloc[sorted(keep[source])].reset_index(drop=True) for source, df in frames.items()}
+    return resolved, pd.DataFrame(report, columns=['id_number', 'kind', 'kept_source', 'dropped_sources', 'matching_ids'])
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: records_to_df
+# Parameters: records, header_fields
+# Description: This turns a list of records into a data frame with one row per sample. The columns
+# # are info_columns followed by the header fields.
+# =================================================================================================
+def records_to_df(records, header_fields=None):
+    columns = info_columns + list(header_fields or {})
+    infoDF = pd.DataFrame()
+    for column in columns:
+        infoDF[column] = pd.Series([record[column] for record in records])
+    return infoDF
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: read_histogram_files
+# Parameters: data_directory, file_name, header_fields, jobs, chunk_size, manifest
+# Description: This reads every histogram file in data_directory whose name starts with file_name,
+# # each exactly once, and returns the data frame of records_to_df sorted by sample ID number.
+# # data_directory can be a directory or a zip or tar archive, and archives inside data_directory
+# # are read as well (see find_histogram_files). header_fields is a dictionary of column name -> label of extra header values to read (see
+# # compile_header_fields). jobs and chunk_size are passed on to parse_files. If manifest (made
+# # with make_manifest) is given, only new or changed files are parsed.
+# =================================================================================================
+def read_histogram_files(data_directory, file_name, header_fields=None, jobs=1, chunk_size=64, manifest=None):
+    header_patterns = compile_header_fields(header_fields)
+    filepaths = find_histogram_files(data_directory, file_name)
+    records = parse_files_cached(manifest, parse_histogram_file, filepaths, file_name, (file_name, header_patterns), jobs=jobs, chunk_size=chunk_size, data_directory=data_directory)
+    return records_to_df(records, header_fields)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: read_spectrum_files
+# Parameters: data_directory, jobs, chunk_size, manifest
+# Description: This reads every Batch 1 sea_salt_spectrum file in data_directory and returns their
+# # records sorted by sample ID number. jobs, chunk_size, and manifest are the same as in
+# # read_histogram_files.
+# =================================================================================================
+def read_spectrum_files(data_directory, jobs=1, chunk_size=64, manifest=None):
+    filepaths = find_histogram_files(data_directory, 'sea_salt_spectrum')
+    return parse_files_cached(manifest, parse_spectrum_file, filepaths, 'sea_salt_spectrum', jobs=jobs, chunk_size=chunk_size, data_directory=data_directory)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: read_env_files
+# Parameters: data_directory, jobs, chunk_size, manifest
+# Description: This reads every Batch 1 sli_env file in data_directory and returns their records
+# # sorted by sample ID number. jobs, chunk_size, and manifest are the same as in
+# # read_histogram_files.
+# =================================================================================================
+def read_env_files(data_directory, jobs=1, chunk_size=64, manifest=None):
+    filepaths = find_histogram_files(data_directory, 'sli_env')
+    return parse_files_cached(manifest, parse_env_file, filepaths, 'sli_env', jobs=jobs, chunk_size=chunk_size, data_directory=data_directory)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: register_dialect
+# Parameters: name, file_name, signature, parser, header_fields
+# Description: This adds a histogram dialect (a kind of histogram file) to the registry under
+# # name. Files of the dialect have names starting with file_name, and signature is a regular
+# # expression found in the first sniff_lines lines of every such file and in no other dialect's
+# # files. parser is parse_histogram_file or a function called the same way, parser(file, lines,
+# # file_name, header_patterns), where header_patterns comes from header_fields. A new version of
+# # the GNI software only needs a new dialect here. Dialects should be registered when a module is
+# # imported, so that the processes used with jobs > 1 know them too.
+# =================================================================================================
+def register_dialect(name, file_name, signature, parser=None, header_fields=None):
+    if parser is None:
+        parser = parse_histogram_file
+    dialects[name] = {'file_name': file_name,
+                      'signature': re.compile(signature),
+                      'parser': parser,
+                      'parser_args': (file_name, compile_header_fields(header_fields)),
+                      'header_fields': dict(header_fields or {})}
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: sniff_dialect
+# Parameters: file, lines, names
+# Description: This returns the name of the dialect of a file, given its name and its lines, out of
+# # the dialects in names (all registered dialects if None). The first dialect whose signature is
+# # in the first sniff_lines lines wins. If no signature is found, the dialect is chosen by the
+# # start of the file name, and None is returned if that does not match either.
+# =================================================================================================
+def sniff_dialect(file, lines, names=None):
+    if names is None:
+        names = list(dialects)
+    head = ''.join(lines[:sniff_lines])
+    for name in names:
+        if dialects[name]['signature'].search(head):
+            return name
+    for name in names:
+        if file.startswith(dialects[name]['file_name']):
+            return name
+    return None
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: parse_dialect_file
+# Parameters: file, lines, dialect_key
+# Description: This returns the record of one histogram file of any registered dialect, parsed by
+# # that dialect's parser, with the dialect's name in the record under 'dialect'. dialect_key comes
+# # from make_dialect_key. A file whose contents match one dialect but whose name starts with
+# # another's file_name (e.g. a VOCALS file saved as sli_histo_) keeps its sample ID number.
+# =================================================================================================
+def parse_dialect_file(file, lines, dialect_key):
+    names = [key[0] for key in dialect_key]
+    name = sniff_dialect(file, lines, names)
+    dialect = dialects[name]
+    if not file.startswith(dialect['file_name']):
+        prefix = next(dialects[other]['file_name'] for other in names if file.startswith(dialects[other]['file_name']))
+        file = dialect['file_name'] + file[len(prefix):]
+    record = dialect['parser'](file, lines, *dialect['parser_args'])
+    record['dialect'] = name
+    return record
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: make_dialect_key
+# Parameters: names
+# Description: This returns a tuple describing the dialects in names (file name, signature, and
+# # header fields of each), so that the manifest parses the files again when a dialect changes.
+# =================================================================================================
+def make_dialect_key(names):
+    return tuple((name, dialects[name]['file_name'], dialects[name]['signature'].pattern, tuple(dialects[name]['header_fields'].items())) for name in names)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: read_dialect_files
+# Parameters: data_directory, names, jobs, chunk_size, manifest
+# Description: This reads every histogram file of the dialects in names (all registered dialects
+# # if None) found in data_directory in a single pass, detecting the dialect of each file with
+# # sniff_dialect, and returns a dictionary of dialect name -> records sorted by sample ID number.
+# # data_directory, jobs, chunk_size, and manifest are the same as in read_histogram_files.
+# =================================================================================================
+def read_dialect_files(data_directory, names=None, jobs=1, chunk_size=64, manifest=None):
+    if names is None:
+        names = list(dialects)
+    file_name = tuple(dialects[name]['file_name'] for name in names)
+    filepaths = find_histogram_files(data_directory, file_name)
+    records = parse_files_cached(manifest, parse_dialect_file, filepaths, file_name, (make_dialect_key(names),), jobs=jobs, chunk_size=chunk_size, data_directory=data_directory)
+    dialect_records = {name: [] for name in names}
+    for record in records:
+        dialect_records[record['dialect']].append(record)
+    return dialect_records
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: sample_wanted
+# Parameters: id_str, start_date, end_date, id_prefix
+# Description: This returns True if the sample ID number id_str passes the filters: its date
+# # (from the ID) is between start_date and end_date (datetime.date, either can be None) and it
+# # starts with id_prefix (a string or a tuple of strings, or None).
+# =================================================================================================
+def sample_wanted(id_str, start_date=None, end_date=None, id_prefix=None):
+    if id_prefix is not None and not id_str.startswith(id_prefix):
+        return False
+    if start_date is not None or end_date is not None:
+        date = dt.datetime.strptime(id_str.split('a',1)[0], '%y%m%d').date()
+        if start_date is not None and date < start_date:
+            return False
+        if end_date is not None and date > end_date:
+            return False
+    return True
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: iterate_samples
+# Parameters: data_directory, file_name, header_fields, start_date, end_date, id_prefix
+# Description: This is a generator that yields the record of one histogram file at a time, in the
+# # order the files are found (not sorted), so only one sample is held in memory. The filters are
+# # described in sample_wanted, and they are checked on the file name before the file is parsed.
+# # data_directory and header_fields are the same as in read_histogram_files. Several campaigns
+# # can be streamed one after another with itertools.chain.
+# =================================================================================================
+def iterate_samples(data_directory, file_name, header_fields=None, start_date=None, end_date=None, id_prefix=None):
+    header_patterns = compile_header_fields(header_fields)
+    for source in find_histogram_files(data_directory, file_name):
+        for file, lines in read_source(source, file_name):
+            if sample_wanted(file.split(file_name,1)[1], start_date, end_date, id_prefix):
+                yield parse_histogram_file(file, lines, file_name, header_patterns)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: batch_samples
+# Parameters: samples, batch_size, header_fields
+# Description: This is a generator that collects the records from samples (e.g. iterate_samples)
+# # into data frames of at most batch_size samples (see records_to_df) and yields them one at a
+# # time.
+# =================================================================================================
+def batch_samples(samples, batch_size=256, header_fields=None):
+    batch = []
+    for record in samples:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield records_to_df(batch, header_fields)
+            batch = []
+    if batch:
+        yield records_to_df(batch, header_fields)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: process_batches
+# Parameters: batches, stages, csv_path
+# Description: This runs every data frame from batches (e.g. batch_samples) through stages, a list
+# # of functions that each take and return a data frame (e.g. rdr.remove_low_ce), and appends the
+# # result to the CSV file at csv_path, which is started over with a header. Only one batch is in
+# # memory at a time. It returns the number of samples written.
+# =================================================================================================
+def process_batches(batches, stages, csv_path):
+    n_samples = 0
+    first = True
+    for df in batches:
+        for stage in stages:
+            df = stage(df)
+        df.to_csv(csv_path, mode='w' if first else 'a', header=first, index=False)
+        first = False
+        n_samples += len(df)
+    return n_samples
+
+# =================================================================================================
+# DIALECTS
+# =================================================================================================
+
+# the signatures are whole header field lines, so a file of one dialect can not match another's
+register_dialect('miniGNI', 'sli_histo_', r'Slide exposure average pressure \(hpa\)\s+=', header_fields=miniGNI_fields)
+register_dialect('VOCALS', 'sli_his_', r'Slide exposure pressure\s+\(hpa\)\s+=', header_fields=vocals_fields)
+register_dialect('Batch1', 'sea_salt_spectrum_', spectrum_bin_pattern.pattern, parser=parse_spectrum_file)
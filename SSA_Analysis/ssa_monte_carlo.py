@@ -0,0 +1,140 @@
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Title: Sea Salt Aerosol Monte Carlo
+# Author: agent
+# Date Updated: 17 October 2026
+# Description: This script estimates the uncertainty of the real bin concentrations by Monte Carlo.
+# # For each sample it draws many realizations of the aloft wind speed, relative humidity, and
+# # temperature, recalculates collision efficiency and concentration for each realization, and
+# # returns percentiles of the results. Samples are processed in chunks so that memory use stays
+# # bounded, and the chunks can be spread across a process pool.
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+
+# import packages
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+import impaction_models as imp
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: simulate_chunk
+# Parameters: inputs, n_realizations, wind_fraction, rh_error, temperature_error, percentiles, seed,
+# # ce_model, ce_quadrature
+# Description: This runs the Monte Carlo for one chunk of samples. inputs is a dictionary of arrays
+# # for the chunk (see run_monte_carlo). Collision efficiency and concentration are calculated as
+# # arrays of shape (realizations, samples, bins), and their percentiles over the realizations are
+# # returned. seed is a numpy SeedSequence so each chunk gets its own random numbers. Collision
+# # efficiency is calculated with ce_model and ce_quadrature the same way as in
+# # cst.calculate_ce_matrix, so it is comparable with the bin_ce of the samples.
+# =================================================================================================
+def simulate_chunk(inputs, n_realizations, wind_fraction, rh_error, temperature_error, percentiles, seed, ce_model=None, ce_quadrature=0):
+    rng = np.random.default_rng(seed)
+    n_samples = len(inputs['wind'])
+    shape = (n_realizations, n_samples, 1)
+    # draw the wind speed: uniform between the minimum and maximum wind speed where they are
+    # # known, otherwise normal with a standard deviation of wind_fraction of the mean
+    wind = inputs['wind'][None, :, None]
+    wind_min = inputs['wind_min'][None, :, None]
+    wind_max = inputs['wind_max'][None, :, None]
+    has_range = np.isfinite(wind_min) & np.isfinite(wind_max)
+    wind_uniform = wind_min + (wind_max - wind_min)*rng.random(shape)
+    wind_normal = wind*(1 + wind_fraction*rng.standard_normal(shape))
+    wind_draw = np.where(has_range, wind_uniform, wind_normal)
+    # wind speed has to stay positive
+    wind_draw = np.maximum(wind_draw, 1e-3)
+    # draw relative humidity (kept between 0 and 100 percent) and temperature
+    rh_draw = np.clip(inputs['rh'][None, :, None] + rh_error*rng.standard_normal(shape), 0, 100)
+    temp_draw = inputs['temperature'][None, :, None] + temperature_error*rng.standard_normal(shape)
+    # calculate collision efficiency for every realization, sample, and bin in one call
+    # # (converting to Pascals, Kelvin, fraction, and meters like remove_low_ce does)
+    pres = inputs['pressure'][None, :, None]*100
+    temp = temp_draw+273.15
+    rh = rh_draw/100
+    if ce_quadrature:
+        ce = imp.get_bin_average(pres, temp, wind_draw, rh, inputs['bin_lower'][None, :, :]/1000000, inputs['bin_upper'][None, :, :]/1000000, order=ce_quadrature, name=ce_model)
+    else:
+        model = imp.get_model(ce_model)
+        ce = model(pres, temp, wind_draw, rh, inputs['bin_middle'][None, :, :]/1000000)
+    # rescale the concentration the same way add_wind_sensitivity does:
+    # # New Concentration = Old Concentration * Old Wind * Old CE / (New Wind * New CE)
+    conc = inputs['bin_conc'][None, :, :]
+    old_ce = inputs['bin_ce'][None, :, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        new_conc = np.where(ce >= 0.4, conc*old_ce*wind/(ce*wind_draw), 0.0)
+    total_conc = new_conc.sum(axis=2)
+    return (np.percentile(ce, percentiles, axis=0),
+            np.percentile(new_conc, percentiles, axis=0),
+            np.percentile(total_conc, percentiles, axis=0))
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: run_monte_carlo
+# Parameters: df, n_realizations, wind_fraction, rh_error, temperature_error, percentiles,
+# # chunk_size, seed, jobs, ce_model, ce_quadrature
+# Description: This runs the Monte Carlo for every sample in df, which must have been through
+# # remove_low_ce with the same ce_model and ce_quadrature (its bin_ce is the collision efficiency
+# # the concentrations are rescaled from). If df has windspeed_min and windspeed_max columns, the wind speed of a sample is
+# # drawn uniformly between them; otherwise it is drawn from a normal distribution with standard
+# # deviation wind_fraction times windspeed. Relative humidity (percent) and temperature (degrees)
+# # are drawn from normal distributions with standard deviations rh_error and temperature_error.
+# # chunk_size samples are simulated at a time, and jobs sets the number of processes (1 runs
+# # everything in this process). The random numbers of each chunk come from seed, so the results
+# # are the same for any number of jobs. It returns a dictionary of percentile arrays: 'ce' and
+# # 'conc' with shape (percentiles, samples, bins) and 'total_conc' with shape (percentiles,
+# # samples).
+# =================================================================================================
+def run_monte_carlo(df, n_realizations=1000, wind_fraction=0.35, rh_error=5.0, temperature_error=0.5, percentiles=(5, 50, 95), chunk_size=32, seed=0, jobs=1, ce_model=None, ce_quadrature=0):
+    # every sample needs the same number of bins to be stacked into arrays
+    n_bins = set(len(item) for item in df['bin_middle'])
+    if len(n_bins) > 1:
+        raise ValueError('samples have different numbers of bins: ' + str(sorted(n_bins)))
+    n_samples = len(df)
+    nan_column = np.full(n_samples, np.nan)
+    inputs = {'pressure': df['pressure'].to_numpy(dtype=float),
+              'temperature': df['temperature'].to_numpy(dtype=float),
+              'rh': df['rh'].to_numpy(dtype=float),
+              'wind': df['windspeed'].to_numpy(dtype=float),
+              'wind_min': df['windspeed_min'].to_numpy(dtype=float) if 'windspeed_min' in df else nan_column,
+              'wind_max': df['windspeed_max'].to_numpy(dtype=float) if 'windspeed_max' in df else nan_column,
+              'bin_lower': np.array(df['bin_lower'].tolist(), dtype=float),
+              'bin_middle': np.array(df['bin_middle'].tolist(), dtype=float),
+              'bin_upper': np.array(df['bin_upper'].tolist(), dtype=float),
+              'bin_conc': np.array(df['bin_conc'].tolist(), dtype=float),
+              'bin_ce': np.array(df['bin_ce'].tolist(), dtype=float)}
+    # split the samples into chunks, each with its own random seed
+    starts = list(range(0, n_samples, chunk_size))
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    chunks = [{key: value[start:start+chunk_size] for key, value in inputs.items()} for start in starts]
+    settings = (n_realizations, wind_fraction, rh_error, temperature_error, list(percentiles))
+    if jobs == 1:
+        results = [simulate_chunk(chunk, *settings, chunk_seed, ce_model, ce_quadrature) for chunk, chunk_seed in zip(chunks, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(simulate_chunk, chunk, *settings, chunk_seed, ce_model, ce_quadrature) for chunk, chunk_seed in zip(chunks, seeds)]
+            results = [future.result() for future in futures]
+    return {'ce': np.concatenate([result[0] for result in results], axis=1),
+            'conc': np.concatenate([result[1] for result in results], axis=1),
+            'total_conc': np.concatenate([result[2] for result in results], axis=1)}
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: add_monte_carlo_conc
+# Parameters: df, percentiles, **kwargs
+# Description: This runs run_monte_carlo and adds its concentration percentiles to the data frame,
+# # e.g. 'mc_conc_p5' (list of bin concentrations) and 'mc_total_conc_p5' for the 5th percentile.
+# # Other keyword arguments are passed on to run_monte_carlo.
+# =================================================================================================
+def add_monte_carlo_conc(df, percentiles=(5, 50, 95), **kwargs):
+    result = run_monte_carlo(df, percentiles=percentiles, **kwargs)
+    for i, p in enumerate(percentiles):
+        label = 'p' + str(p)
+        df['mc_conc_' + label] = result['conc'][i].tolist()
+        df['mc_total_conc_' + label] = result['total_conc'][i]
+    return df
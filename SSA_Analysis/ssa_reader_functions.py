@@ -20,7 +20,14 @@ import numpy as np
 import os
 import pandas as pd
 import re
+import warnings
 import ranzwong as rw
+import ranzwong_cache as rwc
+import impaction_models as imp
+import ssa_ce_store as cst
+import ssa_ingest_functions as ing
+import ssa_sample_set as sss
+import ssa_bin_grids as grd
 from lmfit.models import ExpressionModel
 from scipy import stats
 
@@ -29,6 +36,7 @@ miniGNI_dir = 'C:/Users/ntril/Dropbox/mini-GNI'
 batch_dir = miniGNI_dir + '/ssa_histo_files'
 batch1_dir = batch_dir + '/Batch1'
 batch1_env_dir = miniGNI_dir + '/python_scripts/data/batch1_env_files'
+flight_dir = miniGNI_dir + '/miniGNI_data'
 data_dir = miniGNI_dir + '/python_scripts/data'
 
 # directories for environmental data (buoy, tide, wind)
@@ -40,320 +48,182 @@ wind_dir = data_dir + '/wind_station_data.csv'
 # =================================================================================================
 # =================================================================================================
 # Function Title: retrieve_info
-# Parameters: None
+# Parameters: data_directory, file_name, header_fields, jobs, manifest
 # Description: This pulls sample date, sample ID number, and concentration data from text files. It
 # # does so by walking through files in the data directory, finding the histogram files, and then
-# # searching through the histogram files to find the correct data. It then appends the data for
-# # each sample to a list. Each list becomes a column in a data frame where each row represents
-# # one of the samples.
-# =================================================================================================
-def retrieve_info(data_directory, file_name):
-    # All of these lists will eventually become columns in a data frame, and each row in the 
-    # # data frame is one sample. 
-    id_list = [] # sample ID number
-    date_list = [] # sample date
-    begin_list = [] # sample beginning time
-    end_list = [] # sample ending time
-    duration_list = [] # sample duration
-    rv_list = [] # sample Ranz-Wong 50% collision efficiency cutoff size
-    bin_num_list = [] # sample label of each bin
-    lower_bin_list = [] # sample lower size of each bin
-    mid_bin_list = [] # sample middle point of each bin
-    upper_bin_list = [] # sample upper size of each bin
-    conc_list = [] # sample concentration for each bin
-    cumu_conc_list = [] # sample cumulative concentration for each bin
-    salt_bin_list = [] # sample salt mass for each bin
-    salt_list = [] # total salt mass of each sample
-    for subdir, dirs, files in os.walk(data_directory): # walking through the files in data_directory
-        for file in files:
-            if file.startswith(file_name): # finding the histogram files
-                filepath = subdir + os.sep + file # getting the filepath
-                myfile = open(filepath, 'rt') # opening the file using the filepath
-                id_str = file.split(file_name,1)[1] # pulling the sample ID number from the file name
-                #id_str = file[10:] # pulling the sample ID number from the file name
-                id_list.append(id_str)
-                # pulling the sample date
-                # # The if-statement is there because the sample ID is created by combining
-                # # the date and the sample number, and if there are more than 9 samples
-                # # taken in one day, the sample ID will be one digit longer.
-                #if len(id_str) > 8:
-                #    date_str = file[10:-3]
-                #else:
-                #    date_str = file[10:-2]
-                date_str = id_str.split('a',1)[0]
-                date_list.append(dt.datetime.strptime(date_str, '%y%m%d').date())
-                # getting the size and and mass distributions for each sample
-                # # I have to create vectors here because EACH sample has a size distribution.
-                # # This means that for each row in the data frame, the columns for size 
-                # # distribution are lists of lists.
-                bin_num_vector = []
-                lower_bin_vector = []
-                mid_bin_vector = []
-                upper_bin_vector = []
-                conc_vector = []
-                cumu_conc_vector = []
-                salt_bin_vector = []
-                for line in myfile: # walking through each line of the file to find matches
-                    match = re.search('\s+(\d+)\s+(\d+)\.(\d+)\s+(\d+)\.(\d+)\s+(\d+)\.(\d+)\s+\d\s+(\d)\.(\d+)E\+(\d+)', line)
-                    if match: # this match gets the size distribution
-                        # All this stuff means that the first number in the match is the Bin Number. The second and third
-                        # # numbers in the match are the left and right side of a decimal number (e.g. 4.5). And so on.
-                        bin_num_vector.append(int(match.group(1)))
-                        lower_bin_vector.append(float(match.group(2) + '.' + match.group(3)))
-                        mid_bin_vector.append(float(match.group(4) + '.' + match.group(5)))
-                        upper_bin_vector.append(float(match.group(6) + '.' + match.group(7)))
-                        # The concentration in these histogram files are in exponential notation (e.g. 1.5e5).
-                        base = float(match.group(8) + '.' + match.group(9)) # gets the base of the exponential
-                        exp = float(match.group(10)) # gets the exponent
-                        conc_num = base * (10**exp) # calculates the number from the base and exponent
-                        conc_vector.append(conc_num)
-                    match_begin = re.search('Slide begin exposure\s+\(hhmmss\.s\)\s+=\s+(\d+)\.\d', line)
-                    if match_begin: # this match gets the starting time of each sample
-                        time_begin = dt.datetime.strptime(date_str + ' ' + match_begin.group(1), '%y%m%d %H%M%S')
-                        begin_list.append(time_begin)
-                    match_end = re.search('Slide end exposure\s+\(hhmmss\.s\)\s+=\s+(\d+)\.\d', line)
-                    if match_end: # this match gets the ending time of each sample
-                        time_end = dt.datetime.strptime(date_str + ' ' + match_end.group(1), '%y%m%d %H%M%S')
-                        end_list.append(time_end)
-                    match_duration = re.search('Slide exposure duration \(s\)\s+=\s+(\d+)', line)
-                    if match_duration: # this match gets the duration of each sample
-                        duration_list.append(float(match_duration.group(1))/60.0)
-                    match_RV = re.search('Ranz-Vong 50\% coll-eff radius \(m\)\s+=\s+(\d+)\.(\d+)', line)
-                    if match_RV: # this match gets the Ranz-Wong 50% collision efficiency radius of each sample
-                        # it is multiplied by 1000000 to convert from meters to micrometers
-                        rv_radius = 1000000*float(match_RV.group(1) + '.' + match_RV.group(2))
-                        rv_list.append(rv_radius)
-                # Some data files only give up to 19.4 um (middle bin) instead of 19.8 um. This
-                # # is problematic because we want the data files to be consistent for analysis
-                # # purposes. Therefore, lower_bin, middle_bin, upper_bin, and concentration
-                # # are extended to 19.8 um (concentration set to 0 for the extended values).
-                if max(mid_bin_vector) < 19.8:
-                    bin_num_vector.append(98)
-                    bin_num_vector.append(99)
-                    lower_bin_vector.append(19.5)
-                    lower_bin_vector.append(19.7)
-                    mid_bin_vector.append(19.6)
-                    mid_bin_vector.append(19.8)
-                    upper_bin_vector.append(19.7)
-                    upper_bin_vector.append(19.9)
-                    conc_vector.append(0.0)
-                    conc_vector.append(0.0)
-                # This calculates the salt mass in ug from the radius using (4/3)pi*r^3.
-                # # The total salt mass for each bin is calculcated, and then the total salt mass
-                # # for the entire sample is calculcated. The radius used is the midpoint of each 
-                # # bin in microns. NaCl density is 2170 kg*m-3.
-                for r, n in zip(mid_bin_vector, conc_vector):
-                    salt_bin_vector.append((4*math.pi*((r/1000000)**3)/3)*2170*1000000000*n)
-                salt_bin_list.append(salt_bin_vector) # salt mass of each bin for each sample
-                salt_list.append(sum(salt_bin_vector)) # total salt mass for each sample
-                # The following few lines calculates the cumulative concentration for each sample.
-                # # The cumulative concentration can be thought of as "the total concentration of
-                # # all SSA with dry radius larger than X." For example, for a size range of 2-16
-                # # microns radius, the value at 5 microns is the number concentration of all
-                # # SSA particles with 5-16 microns radius.
-                conc_series = pd.Series(conc_vector)
-                cumu_conc_series = conc_series[::-1].cumsum()[::-1] # cumulative concentration
-                cumu_conc_vector = cumu_conc_series.tolist()
-                cumu_conc_list.append(cumu_conc_vector)
-                # Now I am just appending the vectors I filled above into the lists.
-                bin_num_list.append(bin_num_vector)
-                lower_bin_list.append(lower_bin_vector)
-                mid_bin_list.append(mid_bin_vector)
-                upper_bin_list.append(upper_bin_vector)
-                conc_list.append(conc_vector)
-    total_conc_list = list(map(sum, conc_list)) # total concentration of each sample
-    infoDF = pd.DataFrame() # creating the data frame
-    # Here I define the variable names for each column and put the lists into the columns
-    # # of a data frame "infoDF" which is then returned as the output of this function.
-    infoDF['id_number'] = pd.Series(id_list)
-    infoDF['date'] = pd.Series(date_list)
-    infoDF['timedate'] = pd.Series(begin_list)
-    infoDF['end_time'] = pd.Series(end_list)
-    infoDF['duration'] = pd.Series(duration_list)
-    infoDF['rv_radius'] = pd.Series(rv_list)
-    infoDF['bin_number'] = pd.Series(bin_num_list)
-    infoDF['bin_lower'] = pd.Series(lower_bin_list)
-    infoDF['bin_middle'] = pd.Series(mid_bin_list)
-    infoDF['bin_upper'] = pd.Series(upper_bin_list)
-    infoDF['bin_conc'] = pd.Series(conc_list)
-    infoDF['cumu_conc'] = pd.Series(cumu_conc_list)
-    infoDF['total_conc'] = pd.Series(total_conc_list)
-    infoDF['bin_salt'] = pd.Series(salt_bin_list)
-    infoDF['total_salt'] = pd.Series(salt_list)
-    return infoDF
+# # searching through the histogram files to find the correct data. Each list becomes a column in
+# # a data frame where each row represents one of the samples. Every file is read only once (see
+# # ssa_ingest_functions). header_fields is an optional dictionary of column name -> label, where
+# # label is the same text retrieve_value takes; each of those values is read in the same pass and
+# # added as a column, e.g. {'pressure': 'Slide exposure average pressure \(hpa\)'}. The files are
+# # parsed by a pool of jobs processes (1 parses them in this process), and the samples are sorted
+# # by sample ID number. If manifest (made with ing.make_manifest) is given, only files that are
+# # new or changed since the manifest was saved are parsed. data_directory can also be a zip or tar
+# # archive, which is read without being extracted.
+# =================================================================================================
+def retrieve_info(data_directory, file_name, header_fields=None, jobs=1, manifest=None):
+    return ing.read_histogram_files(data_directory, file_name, header_fields=header_fields, jobs=jobs, manifest=manifest)
 
 # =================================================================================================
 # =================================================================================================
 # =================================================================================================
 # Function Title: retrieve_Batch1_info
-# Parameters: None
+# Parameters: jobs, manifest, spectrum_records, registry
 # Description: This pulls sample date, sample ID number, and concentration data from text files. It
 # # does so by walking through files in the data directory, finding the histogram files, and then
 # # searching through the histogram files to find the correct data. This is different from
 # # retrieve_info because the Batch 1 files have a different format. The Batch 1 files do not have
 # # all the information the other histogram files have, so we must also walk through a directory
-# # of environmental data files to obtain certain variables.
-# =================================================================================================
-def retrieve_Batch1_info():
-    # These lists will eventually become the columns in a data frame.
-    id_list = [] # sample id number
-    rv_list = [] # sample ranz wong 50% collision efficiency cut off radius
-    bin_num_list = [] # sample number of each bin
-    lower_bin_list = [] # sample lower size of each bin 
-    mid_bin_list = [] # sample middle point of each bin
-    upper_bin_list = [] # sample upper size of each bin
-    conc_list = [] # sample concentration of each bin
-    total_conc_list = [] # sample total concentration
-    cumu_conc_list = [] # sample cumulative concentration of each bin
-    salt_bin_list = [] # sample salt mass of each bin
-    salt_list = [] # sample total salt mass
-    ignore = False # I define this here outside of the for-loop that I will use it in.
-    for subdir, dirs, files in os.walk(batch1_dir): # walking through the batch1_dir directory
-        for file in files:
-            if file.startswith('sea_salt_spectrum'): # finding files called "sea_salt_spectrum"
-                ignore = False # I set this to the default value of False.
-                filepath = subdir + os.sep + file # get the file path
-                id_list.append(file[18:]) # pull the sample ID from the file name
-                myfile = open(filepath, 'rt') # open the file
-                # getting the size and and mass distributions for each sample
-                # # I have to create vectors here because EACH sample has a size distribution.
-                # # This means that for each row in the data frame, the columns for size 
-                # # distribution are lists of lists.
-                bin_num_vector = []
-                lower_bin_vector = []
-                mid_bin_vector = []
-                upper_bin_vector = []
-                conc_vector = []
-                cumu_conc_vector = []
-                salt_bin_vector = []
-                for line in myfile: # go through each line of the file
-                    match = re.search('\s+(\d+)\s+(\d+)\.(\d+)\s+(\d+)\.(\d+)\s+(\d+)\.(\d+)\s+\d\.\d+E\+\d+\s+\d\.\d+E\+\d+\s+(\d)\.(\d+)E\+(\d+)\s+(\d)\.(\d+)E\+(\d+)', line)
-                    if match: # this match gets the size distribution
-                        # Here is where the "ignore" variable comes into play. What is happening
-                        # # here is that I want the results from here to match the format of the
-                        # # results I pull from the histogram files using the function
-                        # # retrieve_info(). Those histogram files only concern the size
-                        # # distribution from 0.8 to 19.8 microns. I therefore instruct this
-                        # # function to ignore a line if the bin mid point is less than 0.8 or
-                        # # greater than 19.8 microns. The concentrations at those sizes should
-                        # # be 0 anyway due to either too low collision efficiency for the 
-                        # # small sizes (<0.8) or due to simply almost none being in the
-                        # # atmosphere for large sizes (>19.8). 
-                        mid_bin_num = float(match.group(4) + '.' + match.group(5))
-                        if mid_bin_num > 19.80 or mid_bin_num < 0.8 :
-                            ignore = True
-                        else:
-                            ignore = False
-                        if ignore == False:
-                            # This means that the first number is the bin number. The second and
-                            # # third numbers are the lower size limit of each bin. And so on.
-                            bin_num_vector.append(int(match.group(1)))
-                            lower_bin_vector.append(float(match.group(2) + '.' + match.group(3)))
-                            mid_bin_num = float(match.group(4) + '.' + match.group(5))
-                            mid_bin_vector.append(mid_bin_num)
-                            upper_bin_vector.append(float(match.group(6) + '.' + match.group(7)))
-                            # The concentration and cumulative concentrations are listed in 
-                            # # exponential notation. I therefore have to calculate it using the
-                            # # base and exponent I read from the file.
-                            base1 = float(match.group(8) + '.' + match.group(9))
-                            exp1 = float(match.group(10))
-                            base2 = float(match.group(11) + '.' + match.group(12))
-                            exp2 = float(match.group(13))
-                            conc_vector.append(base1*(10**exp1))
-                            cumu_conc_vector.append(base2*(10**exp2))
-                    if ignore == False:
-                        match_RV = re.search(' cumulative: ranz_wong_50_percent=\s+(\d)\.(\d+)E\-(\d+)', line)
-                        if match_RV: # this match gets the ranz wong 50% collision efficiency cutoff
-                            rv_base = float(match_RV.group(1) + '.' + match_RV.group(2))
-                            rv_exp = float(match_RV.group(3))
-                            # convert from meters to micrometers
-                            rv_list.append(1000000*rv_base*(10**(-1*rv_exp)))
-                # calculate the salt mass for each bin
-                for r, n in zip(mid_bin_vector, conc_vector):
-                    salt_bin_vector.append((4*math.pi*((r/1000000)**3)/3)*2170*1000000000*n)
-                # Now I am just appending the vectors I filled above into the lists
-                salt_bin_list.append(salt_bin_vector)
-                salt_list.append(sum(salt_bin_vector))
-                cumu_conc_list.append(cumu_conc_vector)
-                bin_num_list.append(bin_num_vector)
-                lower_bin_list.append(lower_bin_vector)
-                mid_bin_list.append(mid_bin_vector)
-                upper_bin_list.append(upper_bin_vector)
-                conc_list.append(conc_vector)
-    # getting the total concentration
-    total_conc_list = list(map(sum, conc_list))
-    # Now I go to environmental files to get the following variables.
-    date_list = [] # sample date
-    begin_list = [] # sample beginning time
-    end_list = [] # sample ending time
-    duration_list = [] # sample duration
-    wind_list = [] # sample wind speed
-    rh_list = [] # sample relative humidity
-    temp_list = [] # sample temperature
-    alt_list = [] # sample altitude
-    pressure_list = [] # sample pressure
-    # walking through the environmental files
-    for subdir, dirs, files in os.walk(batch1_env_dir):
-        for file in files:
-            # finding files that start with "sli_ev" and checks that the sample ID in the file
-            # # name matches one of the sample IDs that we collected earlier in this function.
-            if file.startswith('sli_env') and file[8:] in id_list:
-                date_str = file[8:-2] # pull the date from the file name
-                date_list.append(dt.datetime.strptime(date_str, '%y%m%d').date())
-                filepath = subdir + os.sep + file # get the file path
-                myfile = open(filepath, 'rt') # open the file
-                for line in myfile: # go through each line in the file
-                    match_wind = re.search('\s+(\d+)\.(\d+)\s+wind_speed_bar', line)
-                    if match_wind: # this match gets the wind speed
-                        wind_list.append(float(match_wind.group(1) + '.' + match_wind.group(2)))
-                    match_alt = re.search('\s+(\d+)\.\s+z_bar', line)
-                    if match_alt: # this match gets the altitude
-                        alt_list.append(int(match_alt.group(1)))
-                    match_RH = re.search('\s+(\d)\.(\d+)\s+rel_hum_bar', line)
-                    if match_RH: # this match gets the relative humidity
-                        rh_list.append(100*float(match_RH.group(1) + '.' + match_RH.group(2)))
-                    match_P = re.search('\s+(\d+)\.\s+p_bar', line)
-                    if match_P: # this match gets the pressure
-                        pressure_list.append(float(match_P.group(1))/100)
-                    match_T = re.search('\s+(\d+)\.(\d+)\s+t_bar', line)
-                    if match_T: # this match gets the temperature
-                        temp_list.append(float(match_T.group(1) + '.' + match_T.group(2)) - 273.15)
-                    match_begin = re.search('\s+(\d+)\.\d\s+hhmmss_begin', line)
-                    if match_begin: # this match gets the beginning time
-                        t_begin = dt.datetime.strptime(date_str + ' ' + match_begin.group(1), '%y%m%d %H%M%S')
-                        begin_list.append(t_begin)
-                    match_end = re.search('\s+(\d+)\.\d\s+hhmmss_end', line)
-                    if match_end: # this match gets the ending time
-                        t_end = dt.datetime.strptime(date_str + ' ' + match_end.group(1), '%y%m%d %H%M%S')
-                        end_list.append(t_end)
-                # this calculates the duration by subtracting ending time from beginning time
-                t_diff = (t_end - t_begin).total_seconds()/60.0
-                duration_list.append(t_diff)
-    # now create the data frame
-    infoDF = pd.DataFrame()
-    # the columns of the data frame are the lists created
-    infoDF['id_number'] = pd.Series(id_list)
-    infoDF['date'] = pd.Series(date_list)
-    infoDF['timedate'] = pd.Series(begin_list)
-    infoDF['end_time'] = pd.Series(end_list)
-    infoDF['duration'] = pd.Series(duration_list)
-    infoDF['rv_radius'] = pd.Series(rv_list)
-    infoDF['bin_number'] = pd.Series(bin_num_list)
-    infoDF['bin_lower'] = pd.Series(lower_bin_list)
-    infoDF['bin_middle'] = pd.Series(mid_bin_list)
-    infoDF['bin_upper'] = pd.Series(upper_bin_list)
-    infoDF['bin_conc'] = pd.Series(conc_list)
-    infoDF['cumu_conc'] = pd.Series(cumu_conc_list)
-    infoDF['total_conc'] = pd.Series(total_conc_list)
-    infoDF['bin_salt'] = pd.Series(salt_bin_list)
-    infoDF['total_salt'] = pd.Series(salt_list)
-    infoDF['pressure'] = pd.Series(pressure_list)
-    infoDF['altitude'] = pd.Series(alt_list)
-    infoDF['temperature'] = pd.Series(temp_list)
-    infoDF['rh'] = pd.Series(rh_list)
-    infoDF['windspeed'] = pd.Series(wind_list)
+# # of environmental data files to obtain certain variables. The two kinds of files are joined by
+# # sample ID number, and the IDs that only have one kind of file are printed (those samples get
+# # NaN for the missing variables). The files are parsed by a pool of jobs processes (1 parses
+# # them in this process), and manifest is the same as in retrieve_info. If the sea_salt_spectrum
+# # files were already read (e.g. by retrieve_dialect_info), their records can be given as
+# # spectrum_records so they are not read again. The spectra do not have the same bins as the
+# # histogram files, so they are rebinned onto the canonical grid of registry (see
+# # rebin_spectra).
+# =================================================================================================
+def retrieve_Batch1_info(jobs=1, manifest=None, spectrum_records=None, registry=None):
+    # read the sea_salt_spectrum files and the environmental files (see ssa_ingest_functions)
+    if spectrum_records is None:
+        spectrum_records = ing.read_spectrum_files(batch1_dir, jobs=jobs, manifest=manifest)
+    env_records = ing.read_env_files(batch1_env_dir, jobs=jobs, manifest=manifest)
+    # join the environmental variables onto each spectrum by sample ID
+    env_columns = ['date', 'timedate', 'end_time', 'duration', 'pressure', 'altitude', 'temperature', 'rh', 'windspeed', 'windspeed_min', 'windspeed_max']
+    records, no_env, no_spectrum = ing.join_records(spectrum_records, env_records, env_columns)
+    records = rebin_spectra(records, registry=registry)
+    if no_env:
+        print('Batch 1 samples without an sli_env file: ' + ', '.join(no_env))
+    if no_spectrum:
+        print('Batch 1 sli_env files without a sea_salt_spectrum file: ' + ', '.join(no_spectrum))
+    # now create the data frame with the same columns as retrieve_info plus the environmental
+    # # variables
+    infoDF = ing.records_to_df(records)
+    for column in ['pressure', 'altitude', 'temperature', 'rh', 'windspeed', 'windspeed_min', 'windspeed_max']:
+        infoDF[column] = pd.Series([record[column] for record in records])
     return infoDF
 
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: rebin_spectra
+# Parameters: records, registry, target_id
+# Description: This rebins the size distribution of every record onto grid target_id of registry
+# # (by default a new registry and its canonical grid, 0.8 to 19.8 um) and returns new records.
+# # The bin concentrations keep their number and the salt their mass (see ssa_bin_grids), instead
+# # of bins outside 0.8 to 19.8 um being dropped. The cumulative concentration is the one in the
+# # file, interpolated linearly between the lower edges of the file's bins, so a bin that lines up
+# # with a bin of the file keeps the file's value. The totals are added up again on the new grid.
+# # All the records on the same grid are rebinned together.
+# =================================================================================================
+def rebin_spectra(records, registry=None, target_id=None):
+    if registry is None:
+        registry = grd.make_grid_registry()
+    if target_id is None:
+        target_id = registry['canonical_id']
+    if not records:
+        return records
+    grid_ids = [grd.intern_grid(registry, *[record[column] for column in grd.grid_columns]) for record in records]
+    target = grd.get_grid(registry, target_id)
+    bin_conc = grd.rebin_rows(registry, [record['bin_conc'] for record in records], grid_ids, target_id, 'number')
+    bin_salt = grd.rebin_rows(registry, [record['bin_salt'] for record in records], grid_ids, target_id, 'mass')
+    rebinned_records = []
+    for i, record in enumerate(records):
+        # copied so the records kept in a manifest are not changed
+        record = dict(record)
+        record['cumu_conc'] = np.interp(target['bin_lower'], record['bin_lower'], record['cumu_conc']).tolist()
+        for column in grd.grid_columns:
+            record[column] = target[column].tolist()
+        record['bin_conc'] = bin_conc[i].tolist()
+        record['bin_salt'] = bin_salt[i].tolist()
+        record['total_conc'] = sum(record['bin_conc'])
+        record['total_salt'] = sum(record['bin_salt'])
+        rebinned_records.append(record)
+    return rebinned_records
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: rebin_samples
+# Parameters: df, registry, target_id
+# Description: This rebins the samples of df whose grid is not grid target_id of registry (by
+# # default a new registry and its canonical grid) onto that grid, e.g. a mini-GNI sample whose
+# # histogram file stops at 19.6 um, so that every sample can be processed together. It is meant
+# # for a data frame from retrieve_info: the bin concentrations keep their number and the salt its
+# # mass (see ssa_bin_grids), the cumulative concentration is rebinned from the bin concentrations
+# # so it still counts the particles above the grid, and the totals are added up again. Samples
+# # already on the grid are not changed.
+# =================================================================================================
+def rebin_samples(df, registry=None, target_id=None):
+    if registry is None:
+        registry = grd.make_grid_registry()
+    if target_id is None:
+        target_id = registry['canonical_id']
+    grid_ids = grd.intern_df_grids(registry, df)
+    positions = np.flatnonzero(grid_ids != target_id)
+    if len(positions) == 0:
+        return df
+    target = grd.get_grid(registry, target_id)
+    rebinned = {}
+    for column, source_column, kind in [('bin_conc', 'bin_conc', 'number'), ('bin_salt', 'bin_salt', 'mass'), ('cumu_conc', 'bin_conc', 'cumulative')]:
+        if column in df:
+            rebinned[column] = grd.rebin_rows(registry, [df[source_column].iloc[i] for i in positions], grid_ids[positions], target_id, kind)
+    for column in grd.grid_columns:
+        rebinned[column] = np.tile(target[column], (len(positions), 1))
+    df = df.copy()
+    for column, matrix in rebinned.items():
+        values = df[column].tolist()
+        for i, row in zip(positions, matrix.tolist()):
+            values[i] = row
+        df[column] = pd.Series(values, index=df.index, dtype=object)
+    for column, bin_column in [('total_conc', 'bin_conc'), ('total_salt', 'bin_salt')]:
+        if column in df and bin_column in rebinned:
+            df.iloc[positions, df.columns.get_loc(column)] = rebinned[bin_column].sum(axis=1)
+    return df
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: retrieve_dialect_info
+# Parameters: data_directory, names, jobs, manifest, registry
+# Description: This reads every histogram file in data_directory in one pass, whatever its dialect
+# # (miniGNI sli_histo_, VOCALS sli_his_, or Batch 1 sea_salt_spectrum; see
+# # ing.register_dialect), and returns a dictionary of dialect name -> data frame. Each data frame
+# # is the same as retrieve_info gives with that dialect's header fields, except that the Batch 1
+# # data frame is joined with the sli_env files the same way as in retrieve_Batch1_info. names
+# # limits the dialects read (all registered dialects if None). registry is passed on to
+# # retrieve_Batch1_info.
+# =================================================================================================
+def retrieve_dialect_info(data_directory, names=None, jobs=1, manifest=None, registry=None):
+    dialect_records = ing.read_dialect_files(data_directory, names=names, jobs=jobs, manifest=manifest)
+    frames = {}
+    for name, records in dialect_records.items():
+        if name == 'Batch1':
+            frames[name] = retrieve_Batch1_info(jobs=jobs, manifest=manifest, spectrum_records=records, registry=registry)
+        else:
+            frames[name] = ing.records_to_df(records, ing.dialects[name]['header_fields'])
+    return frames
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: add_env_wind_range
+# Parameters: df, env_dir, jobs, manifest
+# Description: This adds the minimum and maximum wind speed over each exposure (windspeed_min and
+# # windspeed_max) from the sli_env files in env_dir (searched through all its subdirectories,
+# # e.g. flight_dir) to the samples in df, joined by sample ID number. Samples without an sli_env
+# # file keep the values they already have (e.g. Batch 1 samples), or NaN. jobs and manifest are
+# # the same as in retrieve_info.
+# =================================================================================================
+def add_env_wind_range(df, env_dir, jobs=1, manifest=None):
+    env_index = ing.index_records(ing.read_env_files(env_dir, jobs=jobs, manifest=manifest))
+    for column in ['windspeed_min', 'windspeed_max']:
+        env_values = pd.Series([env_index[id_str][column] if id_str in env_index else np.nan for id_str in df['id_number']], index=df.index, dtype=float)
+        if column in df:
+            env_values = env_values.fillna(df[column].astype(float))
+        df[column] = env_values
+    return df
+
 # =================================================================================================
 # =================================================================================================
 # =================================================================================================
@@ -522,16 +392,107 @@ def drop_samples(df, drop_list):
         df = df[df.id_number != dropID]
     return df
 
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: calculate_bin_ce
+# Parameters: pressure, temperature, wind, rh, bin_middle, ce_cache, ce_model
+# Description: This calculates the collision efficiency of each bin of one sample and returns it
+# # as a list. Pressure is in Pascals, temperature in Kelvin, rh as a fraction, and bin_middle is
+# # the list of bin dry radii in microns. ce_model is the name of a model in impaction_models
+# # (None for the default Ranz-Wong ribbon). If ce_cache (made with rwc.make_ce_cache) is given,
+# # the collision efficiencies are looked up in the cache before being calculated; the cache only
+# # holds the default model.
+# =================================================================================================
+def calculate_bin_ce(pressure, temperature, wind, rh, bin_middle, ce_cache=None, ce_model=None):
+    dry_radius = np.asarray(bin_middle)/1000000
+    if ce_cache is not None:
+        if ce_model not in (None, imp.default_model):
+            raise ValueError('ce_cache can only be used with the ' + imp.default_model + ' model')
+        ce_vector = rwc.get_collision_efficiency_cached(ce_cache, pressure=pressure, temperature=temperature, air_speed=wind, rh=rh, dry_radius=dry_radius)
+    else:
+        model = imp.get_model(ce_model)
+        ce_vector = model(pressure, temperature, wind, rh, dry_radius)
+    return ce_vector.tolist()
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: calculate_df_ce
+# Parameters: df, wind_column, ce_cache, ce_model, ce_store, ce_quadrature
+# Description: This returns the collision efficiency matrix (samples x bins) of df using the wind
+# # speed in wind_column when it can be calculated for all samples at once: from ce_store if it is
+# # given, or in one array call if ce_quadrature is used. ce_quadrature is the number of
+# # Gauss-Legendre points used to average collision efficiency from bin_lower to bin_upper (0 to
+# # take it at bin_middle). It returns None when each sample should use calculate_bin_ce instead.
+# =================================================================================================
+def calculate_df_ce(df, wind_column, ce_cache=None, ce_model=None, ce_store=None, ce_quadrature=0):
+    if ce_store is not None:
+        return cst.get_ce_matrix(ce_store, df, wind_column=wind_column, ce_model=ce_model, ce_quadrature=ce_quadrature)
+    if ce_quadrature:
+        if ce_cache is not None:
+            raise ValueError('ce_cache can not be used with ce_quadrature')
+        return cst.calculate_ce_matrix(df, wind_column=wind_column, ce_model=ce_model, ce_quadrature=ce_quadrature)
+    return None
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: calculate_set_ce
+# Parameters: sample_set, wind_column, ce_cache, ce_model, ce_store, ce_quadrature
+# Description: This returns the collision efficiency matrix (samples x bins) of a sample set (see
+# # ssa_sample_set) using the wind speed in wind_column. It is read from ce_store or averaged over
+# # the bins the same way as calculate_df_ce; otherwise it is calculated for all samples at once
+# # at the bin grid's bin_middle, with ce_cache and ce_model the same as in calculate_bin_ce.
+# =================================================================================================
+def calculate_set_ce(sample_set, wind_column, ce_cache=None, ce_model=None, ce_store=None, ce_quadrature=0):
+    if ce_store is not None or ce_quadrature:
+        return calculate_df_ce(sss.ce_frame(sample_set, wind_column), wind_column, ce_cache=ce_cache, ce_model=ce_model, ce_store=ce_store, ce_quadrature=ce_quadrature)
+    meta = sample_set['meta']
+    # convert to Pascals, Kelvin, and fraction like remove_low_ce does
+    pres = meta['pressure'].to_numpy(dtype=float)[:, None]*100
+    temp = meta['temperature'].to_numpy(dtype=float)[:, None]+273.15
+    rh = meta['rh'].to_numpy(dtype=float)[:, None]/100
+    wind = meta[wind_column].to_numpy(dtype=float)[:, None]
+    dry_radius = np.asarray(sample_set['grid']['bin_middle'], dtype=float)/1000000
+    if ce_cache is not None:
+        if ce_model not in (None, imp.default_model):
+            raise ValueError('ce_cache can only be used with the ' + imp.default_model + ' model')
+        return rwc.get_collision_efficiency_cached(ce_cache, pressure=pres, temperature=temp, air_speed=wind, rh=rh, dry_radius=dry_radius)
+    model = imp.get_model(ce_model)
+    return model(pres, temp, wind, rh, dry_radius)
+
 # =================================================================================================
 # =================================================================================================
 # =================================================================================================
 # Function Title: remove_low_ce
-# Parameters: df
+# Parameters: df, ce_cache, ce_model, ce_store, ce_quadrature
 # Description: This function removes data below 40% collision efficiency. It also adds the
 # collision efficiency for each bin. It recalculates into "real" concentration data the bins,
-# concentration in each bin, cumulative concentration, total concentration, and salt mass.
-# =================================================================================================
-def remove_low_ce(df):
+# concentration in each bin, cumulative concentration, total concentration, and salt mass. The
+# optional ce_cache and ce_model are passed on to calculate_bin_ce. If ce_store (made with
+# cst.make_ce_store) is given, collision efficiency is read from the store instead. If
+# ce_quadrature is not 0, the collision efficiency of each bin is averaged over the bin width (see
+# calculate_df_ce). df can also be a sample set (see ssa_sample_set), which is processed for all
+# samples at once and gets the same columns.
+# =================================================================================================
+def remove_low_ce(df, ce_cache=None, ce_model=None, ce_store=None, ce_quadrature=0):
+    if sss.is_sample_set(df):
+        ce_matrix = calculate_set_ce(df, 'windspeed', ce_cache=ce_cache, ce_model=ce_model, ce_store=ce_store, ce_quadrature=ce_quadrature)
+        conc = df['bins']['bin_conc']
+        salt = df['bins']['bin_salt']
+        # cut off data below 40% collision efficiency, and remove data where it is 0
+        real_conc = np.where(ce_matrix < 0.4, 0, conc)
+        real_salt = np.where(ce_matrix < 0.4, 0, salt)
+        sss.set_column(df, 'bin_fixed_conc', np.where(ce_matrix == 0, 0, conc))
+        sss.set_column(df, 'bin_ce', ce_matrix)
+        sss.set_column(df, 'bin_real_conc', real_conc)
+        # cumulative concentration from the largest bin down
+        sss.set_column(df, 'real_cumu_conc', real_conc[:, ::-1].cumsum(axis=1)[:, ::-1])
+        sss.set_column(df, 'real_total_conc', real_conc.sum(axis=1))
+        sss.set_column(df, 'bin_real_salt', real_salt)
+        sss.set_column(df, 'real_total_salt', real_salt.sum(axis=1))
+        return df
     # Lists are created that will eventually become columns in a data frame
     ce_list = []
     bin_conc_list = []
@@ -540,7 +501,8 @@ def remove_low_ce(df):
     bin_fixed_list = []
     real_salt_list = []
     total_real_salt_list = []
-    for row in df.itertuples(): # walking through the sample data frame
+    ce_matrix = calculate_df_ce(df, 'windspeed', ce_cache=ce_cache, ce_model=ce_model, ce_store=ce_store, ce_quadrature=ce_quadrature)
+    for i, row in enumerate(df.itertuples()): # walking through the sample data frame
         # these vectors are created to represent values for each bin of the size distribution
         ce_vector = [] 
         bin_conc_vector = []
@@ -562,14 +524,17 @@ def remove_low_ce(df):
         rh = rh/100
         # pulling wind speed
         wind = getattr(row, 'windspeed')
-        # calculate collision efficiency
-        ce_vector = [rw.get_collision_efficiency(pressure=pres, temperature=temp, air_speed=wind, rh=rh, dry_radius=x/1000000) for x in bin_size_list]
+        # calculate collision efficiency for all bins at once
+        if ce_matrix is not None:
+            ce_vector = ce_matrix[i].tolist()
+        else:
+            ce_vector = calculate_bin_ce(pres, temp, wind, rh, bin_size_list, ce_cache=ce_cache, ce_model=ce_model)
         # cut off data below 40% collision efficiency
         bin_conc_vector = [0 if c < 0.4 and n is not 0 else n for c,n in zip(ce_vector, conc_list)]
         # salt data cut off below 40% collision efficiency
         real_salt_vector = [0 if c < 0.4 and m is not 0 else m for c,m in zip(ce_vector, salt_vector)]
         # remove data where collision efficiency is 0
-        bin_fixed_vector = [0 if c is 0 and n is not 0 else n for c,n in zip(ce_vector, conc_list)]
+        bin_fixed_vector = [0 if c == 0 and n is not 0 else n for c,n in zip(ce_vector, conc_list)]
         # total concentration
         total_conc_list.append(sum(bin_conc_vector))
         # total salt
@@ -597,11 +562,29 @@ def remove_low_ce(df):
 # =================================================================================================
 # =================================================================================================
 # Function Title: add_wind_sensitivity
-# Parameters: df, fractional_change
+# Parameters: df, fractional_change, ce_cache, ce_model, ce_store, ce_quadrature
 # Description: This function adds hypothetical concentration data calculated by altering the wind
-# by fractional_change.
-# =================================================================================================
-def add_wind_sensitivity(df, fractional_change):
+# by fractional_change. The optional ce_cache and ce_model are passed on to calculate_bin_ce. If
+# ce_store is given, collision efficiency is read from the store instead. ce_quadrature is the
+# same as in remove_low_ce. df can also be a sample set (see remove_low_ce).
+# =================================================================================================
+def add_wind_sensitivity(df, fractional_change, ce_cache=None, ce_model=None, ce_store=None, ce_quadrature=0):
+    if sss.is_sample_set(df):
+        wind = df['meta']['windspeed'].to_numpy(dtype=float)
+        sss.set_column(df, 'high_wind', wind*(1+fractional_change))
+        sss.set_column(df, 'low_wind', wind*(1-fractional_change))
+        conc = df['bins']['bin_conc']
+        ce = df['bins']['bin_ce']
+        for name, wind_column in [('highwind', 'high_wind'), ('lowwind', 'low_wind')]:
+            new_ce = calculate_set_ce(df, wind_column, ce_cache=ce_cache, ce_model=ce_model, ce_store=ce_store, ce_quadrature=ce_quadrature)
+            new_wind = df['meta'][wind_column].to_numpy(dtype=float)
+            # same as below: New Concentration = Old Concentration * Old Sample Volume * Old
+            # # Collision Efficiency divided by New Sample Volume * New Collision Efficiency
+            with np.errstate(divide='ignore', invalid='ignore'):
+                new_conc = np.where(new_ce >= 0.4, conc*ce*wind[:, None]/(new_ce*new_wind[:, None]), 0)
+            sss.set_column(df, name + '_ce', new_ce)
+            sss.set_column(df, name + '_conc', new_conc)
+        return df
     # defining upper and lower bounds for wind
     df['high_wind'] = df['windspeed']*(1+fractional_change)
     df['low_wind'] = df['windspeed']*(1-fractional_change)
@@ -611,7 +594,9 @@ def add_wind_sensitivity(df, fractional_change):
     lowwind_ce_list = []
     highwind_conc_list = []
     lowwind_conc_list = []
-    for row in df.itertuples(): # walk through the sample data frame
+    highwind_ce_matrix = calculate_df_ce(df, 'high_wind', ce_cache=ce_cache, ce_model=ce_model, ce_store=ce_store, ce_quadrature=ce_quadrature)
+    lowwind_ce_matrix = calculate_df_ce(df, 'low_wind', ce_cache=ce_cache, ce_model=ce_model, ce_store=ce_store, ce_quadrature=ce_quadrature)
+    for i, row in enumerate(df.itertuples()): # walk through the sample data frame
         # creating vectors which is the distribution for each sample
         highwind_ce_vector = []
         lowwind_ce_vector = []
@@ -638,10 +623,16 @@ def add_wind_sensitivity(df, fractional_change):
         ce_vector = getattr(row, 'bin_ce')
         # calculating collision efficiency for high and low wind
         # high
-        highwind_ce_vector = [rw.get_collision_efficiency(pressure=pres, temperature=temp, air_speed=highwind, rh=rh, dry_radius=x/1000000) for x in bin_size_list]
+        if highwind_ce_matrix is not None:
+            highwind_ce_vector = highwind_ce_matrix[i].tolist()
+        else:
+            highwind_ce_vector = calculate_bin_ce(pres, temp, highwind, rh, bin_size_list, ce_cache=ce_cache, ce_model=ce_model)
         highwind_ce_list.append(highwind_ce_vector)
         # low
-        lowwind_ce_vector = [rw.get_collision_efficiency(pressure=pres, temperature=temp, air_speed=lowwind, rh=rh, dry_radius=x/1000000) for x in bin_size_list]
+        if lowwind_ce_matrix is not None:
+            lowwind_ce_vector = lowwind_ce_matrix[i].tolist()
+        else:
+            lowwind_ce_vector = calculate_bin_ce(pres, temp, lowwind, rh, bin_size_list, ce_cache=ce_cache, ce_model=ce_model)
         lowwind_ce_list.append(lowwind_ce_vector)
         # calculating concentrations for upper bound and lower bound cases of wind
         # # Concentration = Count / (Sample Volume * Collision Efficiency)
@@ -660,15 +651,99 @@ def add_wind_sensitivity(df, fractional_change):
     df['lowwind_conc'] = lowwind_conc_list
     return df
 
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: add_conc_uncertainty
+# Parameters: df, wind_fraction, rh_error, temperature_error, pressure_error
+# Description: This function adds the uncertainty of the real bin concentrations caused by
+# uncertainty in the sample wind speed (as a fraction of the wind speed), relative humidity (in
+# percent), temperature (in degrees), and pressure (in hPa). The errors are propagated linearly
+# with the partial derivatives of collision efficiency, and the inputs are treated as independent.
+# It must be run after remove_low_ce. It adds the uncertainty of each bin and of the total.
+# =================================================================================================
+def add_conc_uncertainty(df, wind_fraction, rh_error, temperature_error, pressure_error):
+    bin_error_list = []
+    total_error_list = []
+    for row in df.itertuples(): # walk through the sample data frame
+        conc = np.asarray(getattr(row, 'bin_real_conc'), dtype=float)
+        dry_radius = np.asarray(getattr(row, 'bin_middle'))/1000000
+        # convert to Pascals, Kelvin, and fraction like remove_low_ce does
+        pres = getattr(row, 'pressure')*100
+        temp = getattr(row, 'temperature')+273.15
+        rh = getattr(row, 'rh')/100
+        wind = getattr(row, 'windspeed')
+        ce, gradient = rw.get_collision_efficiency_gradient(pres, temp, wind, rh, dry_radius)
+        # # Concentration = Count / (Sample Volume * Collision Efficiency), and sample volume is
+        # # proportional to wind speed, so the fractional change in concentration is
+        # # -(change in CE)/CE for every input, plus -(change in wind)/wind for wind speed.
+        # # Each input error is converted to the units ranzwong uses.
+        safe_ce = np.where(ce > 0, ce, 1.0)
+        conc_changes = [
+            -conc*(gradient['air_speed']/safe_ce + 1/wind)*wind_fraction*wind,
+            -conc*(gradient['rh']/safe_ce)*rh_error/100,
+            -conc*(gradient['temperature']/safe_ce)*temperature_error,
+            -conc*(gradient['pressure']/safe_ce)*pressure_error*100]
+        # bins add up in quadrature across independent inputs
+        bin_error = np.sqrt(sum(change**2 for change in conc_changes))
+        # all bins of one sample share the same inputs, so the total is summed over bins first
+        total_error = math.sqrt(sum(change.sum()**2 for change in conc_changes))
+        bin_error_list.append(bin_error.tolist())
+        total_error_list.append(total_error)
+    df['bin_real_conc_error'] = bin_error_list
+    df['real_total_conc_error'] = total_error_list
+    return df
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: add_ce_cutoff
+# Parameters: df, efficiency, wind_column
+# Description: This function adds the dry radius (in microns) at which the collision efficiency of
+# each sample reaches efficiency, calculated from the sample pressure, temperature, relative
+# humidity, and the wind speed in wind_column. The column is named after the efficiency, e.g.
+# 'ce40_radius' for efficiency=0.4. The column name can be passed as the cutoff of
+# add_cutoff_conc to cut each sample at its own radius. df can also be a sample set.
+# =================================================================================================
+def add_ce_cutoff(df, efficiency, wind_column='windspeed'):
+    table = df['meta'] if sss.is_sample_set(df) else df
+    # convert to Pascals, Kelvin, and fraction like remove_low_ce does
+    pres = table['pressure'].values*100
+    temp = table['temperature'].values+273.15
+    rh = table['rh'].values/100
+    wind = table[wind_column].values
+    # solve for all samples at once and convert from meters to microns
+    cutoff_radius = rw.get_cutoff_radius(pres, temp, wind, rh, efficiency=efficiency)*1000000
+    if sss.is_sample_set(df):
+        sss.set_column(df, 'ce' + str(int(round(efficiency*100))) + '_radius', cutoff_radius)
+    else:
+        df['ce' + str(int(round(efficiency*100))) + '_radius'] = cutoff_radius
+    return df
+
 # =================================================================================================
 # =================================================================================================
 # =================================================================================================
 # Function Title: add_cutoff_conc
 # Parameters: df, cutoff
 # Description: This function adds a cutoff to all bin concentrations so that total concentrations
-# can be compared with the same cutoff. Cutoff so far is 3.9 um.
+# can be compared with the same cutoff. Cutoff so far is 3.9 um. The cutoff can also be the name
+# of a column (such as one added by add_ce_cutoff) to use a different cutoff for each sample. df
+# can also be a sample set, which is cut for all samples at once.
 # =================================================================================================
 def add_cutoff_conc(df, cutoff):
+    if sss.is_sample_set(df):
+        if isinstance(cutoff, str):
+            cutoff = df['meta'][cutoff].to_numpy(dtype=float)[:, None]
+        # bins whose lower edge is at or above the cutoff of their sample
+        kept = df['grid']['bin_lower'][None, :] >= cutoff
+        cutoff_conc = np.where(kept, df['bins']['bin_real_conc'], 0)
+        cutoff_salt = np.where(kept, df['bins']['bin_salt'], 0)
+        sss.set_column(df, 'bin_cutoff_conc', cutoff_conc)
+        sss.set_column(df, 'bin_cutoff_salt', cutoff_salt)
+        sss.set_column(df, 'cutoff_cumu_conc', cutoff_conc[:, ::-1].cumsum(axis=1)[:, ::-1])
+        sss.set_column(df, 'cutoff_total_conc', cutoff_conc.sum(axis=1))
+        sss.set_column(df, 'cutoff_total_mass', cutoff_salt.sum(axis=1))
+        return df
     # these lists will eventually become columns in a data frame
     bin_cutoff_conc_list = []
     bin_cutoff_salt_list = []
@@ -680,11 +755,16 @@ def add_cutoff_conc(df, cutoff):
         concentrations = getattr(row, 'bin_real_conc')
         salts = getattr(row, 'bin_salt')
         dry_sizes = getattr(row, 'bin_lower')
+        # the cutoff of this sample
+        if isinstance(cutoff, str):
+            sample_cutoff = getattr(row, cutoff)
+        else:
+            sample_cutoff = cutoff
         # bin concentrations with cutoff
-        bin_cutoff_conc = [c if r>=cutoff else 0 for c,r in zip(concentrations, dry_sizes)]
+        bin_cutoff_conc = [c if r>=sample_cutoff else 0 for c,r in zip(concentrations, dry_sizes)]
         bin_cutoff_conc_list.append(bin_cutoff_conc)
         # bin salt with cutoff
-        bin_cutoff_salt = [m if r>=cutoff else 0 for m,r in zip(salts, dry_sizes)]
+        bin_cutoff_salt = [m if r>=sample_cutoff else 0 for m,r in zip(salts, dry_sizes)]
         bin_cutoff_salt_list.append(bin_cutoff_salt)
         # cumulative concentrations with cutoff
         conc_series = pd.Series(bin_cutoff_conc)
@@ -692,10 +772,10 @@ def add_cutoff_conc(df, cutoff):
         cumu_conc_vector = cumu_conc_series.tolist()
         cutoff_cumu_conc_list.append(cumu_conc_vector)
         # total concentrations with cutoff
-        conc_cutoff = sum(c for c in concentrations if dry_sizes[concentrations.index(c)] >= cutoff)
+        conc_cutoff = sum(c for c in concentrations if dry_sizes[concentrations.index(c)] >= sample_cutoff)
         conc_cutoff_list.append(conc_cutoff)
         # cutoff salt mass concentration
-        salt_cutoff = sum(s for s in salts if dry_sizes[salts.index(s)] >= cutoff)
+        salt_cutoff = sum(s for s in salts if dry_sizes[salts.index(s)] >= sample_cutoff)
         salt_cutoff_list.append(salt_cutoff)
     df['bin_cutoff_conc'] = pd.Series(bin_cutoff_conc_list)
     df['bin_cutoff_salt'] = pd.Series(bin_cutoff_salt_list)
@@ -713,6 +793,10 @@ def add_cutoff_conc(df, cutoff):
 # that were calculated by add_wind_sensitivity. Cutoff so far is 4.9 um
 # =================================================================================================
 def add_low_wind_cutoff_conc(df, cutoff):
+    if sss.is_sample_set(df):
+        kept = df['grid']['bin_lower'][None, :] >= cutoff
+        sss.set_column(df, 'lowwind_total_conc', np.where(kept, df['bins']['lowwind_conc'], 0).sum(axis=1))
+        return df
     conc_cutoff_list = []
     for row in df.itertuples(): # walk through the sample data frame
         concentrations = getattr(row, 'lowwind_conc')
@@ -727,11 +811,13 @@ def add_low_wind_cutoff_conc(df, cutoff):
 # =================================================================================================
 # =================================================================================================
 # Function Title: fit_lognormal
-# Parameters: df
+# Parameters: df, ce_store, ce_model, ce_quadrature
 # Description: This function tries to fit the real bin concentrations to a lognormal distribution.
 # It then saves lognormal parameters to the data frame.
+# The collision efficiency used for the fit weights is read from ce_store (with ce_model and
+# ce_quadrature) if it is given, instead of from the bin_ce column. df can also be a sample set.
 # =================================================================================================
-def fit_lognormal(df):
+def fit_lognormal(df, ce_store=None, ce_model=None, ce_quadrature=0):
     # these are the lognormal parameters that we want for each sample
     area_list = []
     muG_list = []
@@ -739,10 +825,15 @@ def fit_lognormal(df):
     chi2_list = []
     p_value_list = []
     nonempty_list = []
-    for row in df.itertuples(): # walk through the sample data frame
-        x = getattr(row, 'bin_middle') # pull dry radius
-        y = getattr(row, 'bin_cutoff_conc') # pull concentration
-        w = getattr(row, 'bin_ce') # pull collision efficiency
+    # pull collision efficiency
+    if ce_store is not None and sss.is_sample_set(df):
+        ce_rows = calculate_set_ce(df, 'windspeed', ce_model=ce_model, ce_store=ce_store, ce_quadrature=ce_quadrature)
+    elif ce_store is not None:
+        ce_rows = cst.get_ce_matrix(ce_store, df, wind_column='windspeed', ce_model=ce_model, ce_quadrature=ce_quadrature)
+    else:
+        ce_rows = sss.get_rows(df, 'bin_ce')
+    # walk through the samples: dry radius, concentration, and collision efficiency
+    for x, y, w in zip(sss.get_rows(df, 'bin_middle'), sss.get_rows(df, 'bin_cutoff_conc'), ce_rows):
         # we want the lognormal fit to be only for non-zero bins
         x_nonempty = [item for item,count in zip(x,y) if count>0.0]
         y_nonempty = [count for count in y if count>0.0]
@@ -784,54 +875,58 @@ def fit_lognormal(df):
         p_value_list.append(p_value)
         nonempty_list.append(len(y_nonempty))
     # append the data to the data frame
-    df['lognorm_area'] = pd.Series(area_list)
-    df['muG'] = pd.Series(muG_list)
-    df['sigmaG'] = pd.Series(sigmaG_list)
-    df['chi2'] = pd.Series(chi2_list)
-    df['p_value'] = pd.Series(p_value_list)
-    df['dof'] = pd.Series(nonempty_list)
+    fit_columns = {'lognorm_area': area_list, 'muG': muG_list, 'sigmaG': sigmaG_list, 'chi2': chi2_list, 'p_value': p_value_list, 'dof': nonempty_list}
+    for column, values in fit_columns.items():
+        if sss.is_sample_set(df):
+            sss.set_column(df, column, np.array(values))
+        else:
+            df[column] = pd.Series(values)
     return df
 
 # =================================================================================================
 # =================================================================================================
 # =================================================================================================
 # Function Title: add_vocals
-# Parameters: vdf, sdf
-# Description: 
-# =================================================================================================
-def add_vocals(vdf, sdf):
+# Parameters: vdf, sdf, registry
+# Description: This adds synthetic distributions to sdf that combine each sample with the average
+# VOCALS distribution: the bins of a sample where collision efficiency is below 40% take the
+# VOCALS concentration and collision efficiency instead. Only VOCALS samples from 0-650 meters
+# altitude are averaged. The VOCALS samples do not have the same bins as the mini-GNI samples, so
+# before averaging they are rebinned onto each grid of sdf (see ssa_bin_grids): the
+# concentrations keep their number, and collision efficiency is averaged over each bin. Each bin
+# is averaged over the VOCALS samples that cover it, and a bin that none of them covers keeps the
+# sample's own values. registry is the grid registry to use (a new one if None).
+# =================================================================================================
+def add_vocals(vdf, sdf, registry=None):
+    if registry is None:
+        registry = grd.make_grid_registry()
     # get only the VOCALS samples between 0-650 meters altitude
     tempdf = vdf[vdf.altitude<=650]
-    # get the average distribution of the selected samples
-    temp_ce_list = []
-    temp_conc_list = []
-    for row in tempdf.itertuples():
-        temp_conc = getattr(row, 'bin_real_conc')
-        temp_ce = getattr(row, 'bin_ce')
-        temp_size = getattr(row, 'bin_lower')
-        # appending
-        temp_conc_list.append(temp_conc)
-        temp_ce_list.append(temp_ce)
-    # convert to numpy array
-    temp_conc_arrays = [np.array(item) for item in temp_conc_list]
-    temp_ce_arrays = [np.array(item) for item in temp_ce_list]
-    # get average
-    vocals_ce = [np.mean(item) for item in zip(*temp_ce_arrays)]
-    vocals_conc = [np.mean(item) for item in zip(*temp_conc_arrays)]
+    vocals_grid_ids = grd.intern_df_grids(registry, tempdf)
+    sample_grid_ids = grd.intern_df_grids(registry, sdf)
+    # get the average distribution of the selected samples on each grid of sdf
+    vocals_ce = {}
+    vocals_conc = {}
+    for grid_id in set(sample_grid_ids.tolist()):
+        ce_rows = grd.rebin_rows(registry, tempdf['bin_ce'].tolist(), vocals_grid_ids, grid_id, 'mean')
+        conc_rows = grd.rebin_rows(registry, tempdf['bin_real_conc'].tolist(), vocals_grid_ids, grid_id, 'number')
+        # bins a VOCALS sample does not cover are NaN and left out of the average
+        conc_rows[np.isnan(ce_rows)] = np.nan
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning) # bins no VOCALS sample covers
+            vocals_ce[grid_id] = np.nanmean(ce_rows, axis=0)
+            vocals_conc[grid_id] = np.nanmean(conc_rows, axis=0)
     # add average_ce and average_conc to ssaData
     synth_ce_list = []
     synth_conc_list = []
-    for row in sdf.itertuples():
-        # get sample CE and concentration and size
-        sample_ce = getattr(row, 'bin_ce')
-        sample_conc = getattr(row, 'bin_real_conc')
-        sample_size = getattr(row, 'bin_lower')
-        # replace sample data with VOCALS data if CE < 0.4
-        synth_ce = [synth if item<0.4 else item for synth,item in zip(vocals_ce, sample_ce)]
-        synth_conc = [synth if prob<0.4 else item for synth,prob,item in zip(vocals_conc, sample_ce, sample_conc)]
+    for grid_id, sample_ce, sample_conc in zip(sample_grid_ids.tolist(), sdf['bin_ce'], sdf['bin_real_conc']):
+        # replace sample data with VOCALS data if CE < 0.4 (and the VOCALS samples cover the bin)
+        low_ce = (np.asarray(sample_ce) < 0.4) & np.isfinite(vocals_ce[grid_id])
+        synth_ce = np.where(low_ce, vocals_ce[grid_id], sample_ce)
+        synth_conc = np.where(low_ce, vocals_conc[grid_id], sample_conc)
         # append to the lists
-        synth_ce_list.append(synth_ce)
-        synth_conc_list.append(synth_conc)
+        synth_ce_list.append(synth_ce.tolist())
+        synth_conc_list.append(synth_conc.tolist())
     sdf['synth_ce'] = pd.Series(synth_ce_list)
     sdf['synth_conc'] = pd.Series(synth_conc_list)
     return sdf
@@ -840,11 +935,13 @@ def add_vocals(vdf, sdf):
 # =================================================================================================
 # =================================================================================================
 # Function Title: fit_synth_lognormal
-# Parameters: df
+# Parameters: df, ce_store, ce_model, ce_quadrature
 # Description: This function tries to fit the synthetic bin concentrations to a lognormal 
 # # distribution. It then saves lognormal parameters to the data frame.
+# # The collision efficiency used for the fit weights is read from ce_store (with ce_model and
+# # ce_quadrature) if it is given, instead of from the bin_ce column. df can also be a sample set.
 # =================================================================================================
-def fit_synth_lognormal(df):
+def fit_synth_lognormal(df, ce_store=None, ce_model=None, ce_quadrature=0):
     # these are the lognormal parameters that we want for each sample
     area_list = []
     muG_list = []
@@ -852,10 +949,15 @@ def fit_synth_lognormal(df):
     chi2_list = []
     p_value_list = []
     nonempty_list = []
-    for row in df.itertuples(): # walk through the sample data frame
-        x = getattr(row, 'bin_middle') # pull dry radius
-        y = getattr(row, 'synth_conc') # pull concentration
-        w = getattr(row, 'bin_ce') # pull collision efficiency
+    # pull collision efficiency
+    if ce_store is not None and sss.is_sample_set(df):
+        ce_rows = calculate_set_ce(df, 'windspeed', ce_model=ce_model, ce_store=ce_store, ce_quadrature=ce_quadrature)
+    elif ce_store is not None:
+        ce_rows = cst.get_ce_matrix(ce_store, df, wind_column='windspeed', ce_model=ce_model, ce_quadrature=ce_quadrature)
+    else:
+        ce_rows = sss.get_rows(df, 'bin_ce')
+    # walk through the samples: dry radius, concentration, and collision efficiency
+    for x, y, w in zip(sss.get_rows(df, 'bin_middle'), sss.get_rows(df, 'synth_conc'), ce_rows):
         # we want the lognormal fit to be only for non-zero bins
         x_nonempty = [item for item,count in zip(x,y) if count>0.0]
         y_nonempty = [count for count in y if count>0.0]
@@ -893,10 +995,10 @@ def fit_synth_lognormal(df):
         p_value_list.append(p_value)
         nonempty_list.append(len(y_nonempty))
     # append the data to the data frame
-    df['lognorm_area'] = pd.Series(area_list)
-    df['muG'] = pd.Series(muG_list)
-    df['sigmaG'] = pd.Series(sigmaG_list)
-    df['chi2'] = pd.Series(chi2_list)
-    df['p_value'] = pd.Series(p_value_list)
-    df['dof'] = pd.Series(nonempty_list)
+    fit_columns = {'lognorm_area': area_list, 'muG': muG_list, 'sigmaG': sigmaG_list, 'chi2': chi2_list, 'p_value': p_value_list, 'dof': nonempty_list}
+    for column, values in fit_columns.items():
+        if sss.is_sample_set(df):
+            sss.set_column(df, column, np.array(values))
+        else:
+            df[column] = pd.Series(values)
     return df
@@ -0,0 +1,148 @@
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Title: Sea Salt Aerosol Sample Set
+# Author: agent
+# Date Updated: 17 October 2026
+# Description: This script keeps processed slides as a sample set instead of a data frame of lists.
+# # A sample set is a dictionary of three parts: 'meta', a data frame of the single values of each
+# # sample (id_number, times, pressure, temperature, rh, wind speed, altitude, ...), 'grid', the bin
+# # grid (bin_number, bin_lower, bin_middle, bin_upper) shared by all samples and kept once in a
+# # grid registry (see ssa_bin_grids), and 'bins', a samples x bins array for every other bin
+# # column (bin_conc, bin_salt, bin_ce, ...). The
+# # processing stages in ssa_reader_functions (remove_low_ce, add_cutoff_conc,
+# # add_wind_sensitivity, the lognormal fits, ...) take a sample set as well as a data frame and
+# # add their columns to it in place, working on all samples at once. Arrays take a fraction of
+# # the memory of lists of floats (less again with float32).
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+
+# import packages
+import numpy as np
+import pandas as pd
+
+import ssa_bin_grids as grd
+import ssa_table_store as tbl
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: is_sample_set
+# Parameters: data
+# Description: This returns True if data is a sample set (and not a data frame).
+# =================================================================================================
+def is_sample_set(data):
+    return isinstance(data, dict) and 'bins' in data and 'meta' in data
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: make_sample_set
+# Parameters: df, dtype, registry
+# Description: This turns df, a data frame with one row per sample and the bin columns as lists,
+# # into a sample set. The bin columns (other than the grid) become arrays of dtype (float64 or
+# # float32). The grid is interned in registry (see ssa_bin_grids; a new registry if None) and the
+# # sample set keeps the registry's grid and its ID. Every sample must have the same bin grid; a
+# # ValueError naming the samples that are not on the most common grid is raised otherwise.
+# =================================================================================================
+def make_sample_set(df, dtype=np.float64, registry=None):
+    missing = [column for column in grd.grid_columns if column not in df]
+    if missing:
+        raise KeyError('missing bin grid columns: ' + ', '.join(missing))
+    if registry is None:
+        registry = grd.make_grid_registry()
+    grid_ids = grd.intern_df_grids(registry, df)
+    if len(set(grid_ids.tolist())) > 1:
+        differs = grid_ids != np.bincount(grid_ids).argmax()
+        ids = df['id_number'].to_numpy()[differs] if 'id_number' in df else np.flatnonzero(differs)
+        raise ValueError('samples with a different bin grid: ' + ', '.join(str(item) for item in ids))
+    grid_id = int(grid_ids[0]) if len(grid_ids) > 0 else registry['canonical_id']
+    sample_set = {'meta': None, 'grid': dict(grd.get_grid(registry, grid_id)), 'grid_id': grid_id, 'registry': registry,
+                  'bins': {}, 'columns': list(df.columns), 'dtype': np.dtype(dtype)}
+    meta_columns = []
+    for column in df.columns:
+        if column in grd.grid_columns:
+            continue
+        if tbl.column_kind(df[column]) != 'matrix':
+            meta_columns.append(column)
+            continue
+        matrix, lengths = tbl.stack_column(df[column])
+        if len(lengths) > 0 and (lengths != matrix.shape[1]).any():
+            raise ValueError('samples have different numbers of bins in ' + column + ': ' + str(sorted(set(lengths.tolist()))))
+        sample_set['bins'][column] = matrix.astype(dtype)
+    sample_set['meta'] = df[meta_columns].reset_index(drop=True)
+    return sample_set
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: sample_set_to_df
+# Parameters: sample_set
+# Description: This turns a sample set back into a data frame with the bin columns as lists (e.g.
+# # to save it with tbl.save_table), with the columns in the order they were added.
+# =================================================================================================
+def sample_set_to_df(sample_set):
+    n_samples = len(sample_set['meta'])
+    data = {}
+    for column in sample_set['columns']:
+        if column in sample_set['grid']:
+            grid = sample_set['grid'][column]
+            data[column] = pd.Series([grid.tolist() for i in range(n_samples)], dtype=object)
+        elif column in sample_set['bins']:
+            data[column] = pd.Series(sample_set['bins'][column].tolist(), dtype=object)
+        else:
+            data[column] = sample_set['meta'][column]
+    return pd.DataFrame(data)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: set_column
+# Parameters: sample_set, column, values
+# Description: This adds (or replaces) column in sample_set: a samples x bins array goes to the
+# # bins (as the dtype of the sample set) and one value per sample goes to meta.
+# =================================================================================================
+def set_column(sample_set, column, values):
+    values = np.asarray(values)
+    if values.ndim == 2:
+        sample_set['bins'][column] = values.astype(sample_set['dtype'])
+    else:
+        sample_set['meta'][column] = values
+    if column not in sample_set['columns']:
+        sample_set['columns'].append(column)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: get_rows
+# Parameters: data, column
+# Description: This returns the values of column for each sample of data, a sample set or a data
+# # frame, in order. For a sample set the rows of a bin column are rows of its array, and the grid
+# # is the same array for every sample.
+# =================================================================================================
+def get_rows(data, column):
+    if not is_sample_set(data):
+        return data[column]
+    if column in data['grid']:
+        return [data['grid'][column]]*len(data['meta'])
+    if column in data['bins']:
+        return data['bins'][column]
+    return data['meta'][column].to_numpy()
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: ce_frame
+# Parameters: sample_set, wind_column
+# Description: This returns a data frame with the columns ssa_ce_store needs to calculate collision
+# # efficiency (pressure, temperature, rh, wind_column, and the bin grid) for every sample of
+# # sample_set. The grid columns all hold the same array, so nothing is copied.
+# =================================================================================================
+def ce_frame(sample_set, wind_column):
+    meta = sample_set['meta']
+    data = {column: meta[column].to_numpy() for column in ['pressure', 'temperature', 'rh', wind_column]}
+    for column in ['bin_lower', 'bin_middle', 'bin_upper']:
+        if column in sample_set['grid']:
+            data[column] = pd.Series(get_rows(sample_set, column), dtype=object)
+    return pd.DataFrame(data)
@@ -0,0 +1,343 @@
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Title: Sea Salt Aerosol Table Store
+# Author: agent
+# Date Updated: 17 October 2026
+# Description: This script saves and loads the processed sample data frames (e.g. ssaDF) without
+# # writing every list of bin values out as text. A table is a directory holding metadata.csv, with
+# # one row per sample for the columns that hold a single value (ID number, times, wind speed,
+# # totals, ...), and one .npy file per column that holds a list of bin values (bin_conc, bin_ce,
+# # cumu_conc, ...) as a dense samples x bins array. layout.json records the column order and the
+# # kind of each column so the data frame comes back with the same types. The arrays are memory
+# # mapped when loaded, so reading them costs almost nothing until they are used, and values are
+# # stored exactly. The bin grid columns (bin_number, bin_lower, bin_middle, bin_upper) are not
+# # saved per sample: each distinct grid is saved once in layout.json and each sample gets its grid
+# # ID in bin_grid_ids.npy (see ssa_bin_grids). The old CSV with lists as text can still be
+# # written alongside. A loader (see
+# # make_loader) reads only the columns a plot asks for, from a table or an old CSV, and keeps them
+# # for later calls.
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+
+# import packages
+import datetime as dt
+import json
+import numpy as np
+import os
+import pandas as pd
+from ast import literal_eval
+
+import ssa_bin_grids as grd
+
+# columns of the old CSVs that hold times (csv_to_table and make_loader read them as such)
+csv_datetime_columns = ['timedate', 'end_time', 'tide_time', 'phng_time']
+# number of rows of an old CSV make_loader reads to tell list columns from single-value columns
+sniff_rows = 5
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: column_kind
+# Parameters: series
+# Description: This returns the kind of a data frame column: 'matrix' for lists (or arrays) of bin
+# # values, 'datetime', 'date' (datetime.date values), 'string', or 'value' for anything else
+# # that pandas writes to and reads from CSV by itself (numbers and booleans).
+# =================================================================================================
+def column_kind(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    values = series.dropna()
+    if len(values) == 0:
+        return 'value'
+    first = values.iloc[0]
+    if isinstance(first, (list, tuple, np.ndarray)):
+        return 'matrix'
+    if isinstance(first, dt.datetime) or isinstance(first, pd.Timestamp):
+        return 'datetime'
+    if isinstance(first, dt.date):
+        return 'date'
+    if isinstance(first, str):
+        return 'string'
+    return 'value'
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: stack_column
+# Parameters: series
+# Description: This turns a column of lists into a samples x bins array and returns it with the
+# # number of bins of each sample. Samples with fewer bins than the longest one are padded with
+# # NaN (the array is then float even if the lists held integers). A cell that is not a list (e.g.
+# # NaN for a sample without the column) counts as a sample with no bins.
+# =================================================================================================
+def stack_column(series):
+    rows = [np.asarray(item) if isinstance(item, (list, tuple, np.ndarray)) else np.empty(0) for item in series]
+    lengths = np.array([len(row) for row in rows], dtype=np.int64)
+    width = int(lengths.max()) if len(rows) > 0 else 0
+    if len(rows) > 0 and (lengths == width).all():
+        return np.array(rows).reshape(len(rows), width), lengths
+    matrix = np.full((len(rows), width), np.nan)
+    for i, row in enumerate(rows):
+        matrix[i, :len(row)] = row
+    return matrix, lengths
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: save_table
+# Parameters: df, table_dir, csv_path
+# Description: This saves df as a table in table_dir (made if needed). If df has all the bin grid
+# # columns, the grids are interned (see ssa_bin_grids) and saved once instead of per sample.
+# # Each file is written to a temporary file first and then moved into place. If csv_path is
+# # given, df is also written there as a CSV the old way (lists as text).
+# =================================================================================================
+def save_table(df, table_dir, csv_path=None):
+    os.makedirs(table_dir, exist_ok=True)
+    layout = {'columns': [], 'kinds': {}, 'ragged': [], 'grid_columns': [], 'grids': []}
+    if len(df) > 0 and all(column in df for column in grd.grid_columns):
+        registry = grd.make_grid_registry()
+        grid_ids = grd.intern_df_grids(registry, df)
+        layout['grid_columns'] = grd.grid_columns
+        layout['grids'] = grd.grids_to_lists(registry)
+        np.save(table_dir + '/bin_grid_ids.tmp.npy', grid_ids)
+        os.replace(table_dir + '/bin_grid_ids.tmp.npy', table_dir + '/bin_grid_ids.npy')
+    scalar_columns = []
+    for column in df.columns:
+        kind = column_kind(df[column])
+        layout['columns'].append(column)
+        layout['kinds'][column] = kind
+        if column in layout['grid_columns']:
+            continue
+        if kind == 'matrix':
+            matrix, lengths = stack_column(df[column])
+            np.save(table_dir + '/' + column + '.tmp.npy', matrix)
+            os.replace(table_dir + '/' + column + '.tmp.npy', table_dir + '/' + column + '.npy')
+            if len(lengths) > 0 and (lengths != matrix.shape[1]).any():
+                layout['ragged'].append(column)
+                np.save(table_dir + '/' + column + '.lengths.tmp.npy', lengths)
+                os.replace(table_dir + '/' + column + '.lengths.tmp.npy', table_dir + '/' + column + '.lengths.npy')
+        else:
+            scalar_columns.append(column)
+    df[scalar_columns].to_csv(table_dir + '/metadata.tmp.csv', index=False)
+    os.replace(table_dir + '/metadata.tmp.csv', table_dir + '/metadata.csv')
+    with open(table_dir + '/layout.tmp.json', 'w') as layout_file:
+        json.dump(layout, layout_file, indent=1)
+    os.replace(table_dir + '/layout.tmp.json', table_dir + '/layout.json')
+    if csv_path is not None:
+        df.to_csv(csv_path, index=False)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: load_layout
+# Parameters: table_dir
+# Description: This returns the layout of the table in table_dir (see save_table).
+# =================================================================================================
+def load_layout(table_dir):
+    with open(table_dir + '/layout.json', 'r') as layout_file:
+        return json.load(layout_file)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: load_grids
+# Parameters: table_dir
+# Description: This returns the bin grids of the table in table_dir as a grid registry (see
+# # ssa_bin_grids) and the grid ID of each sample. The registry is None if the grids were not
+# # saved separately.
+# =================================================================================================
+def load_grids(table_dir):
+    layout = load_layout(table_dir)
+    if not layout.get('grid_columns'):
+        return None, None
+    registry = grd.make_grid_registry(layout['grids'][0])
+    for grid in layout['grids'][1:]:
+        grd.intern_grid(registry, *[grid[column] for column in grd.grid_columns])
+    return registry, np.load(table_dir + '/bin_grid_ids.npy')
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: load_matrix
+# Parameters: table_dir, column, mmap
+# Description: This returns the samples x bins array of a list column of the table in table_dir.
+# # With mmap the array is memory mapped (read-only) instead of read into memory. Samples of a
+# # ragged column are padded with NaN. A grid column is put together from the saved grids.
+# =================================================================================================
+def load_matrix(table_dir, column, mmap=True):
+    if column in load_layout(table_dir).get('grid_columns', []):
+        registry, grid_ids = load_grids(table_dir)
+        return stack_column([registry['grids'][grid_id][column] for grid_id in grid_ids.tolist()])[0]
+    return np.load(table_dir + '/' + column + '.npy', mmap_mode='r' if mmap else None)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: load_metadata
+# Parameters: table_dir, columns
+# Description: This returns the single-value columns of the table in table_dir as a data frame,
+# # with the types they were saved with. columns limits the columns read (all if None).
+# =================================================================================================
+def load_metadata(table_dir, columns=None):
+    layout = load_layout(table_dir)
+    kinds = layout['kinds']
+    names = [column for column in layout['columns'] if kinds[column] != 'matrix' and (columns is None or column in columns)]
+    strings = {column: str for column in names if kinds[column] == 'string'}
+    metadata = pd.read_csv(table_dir + '/metadata.csv', usecols=names, dtype=strings, float_precision='round_trip')
+    for column in names:
+        if kinds[column] == 'datetime':
+            metadata[column] = pd.to_datetime(metadata[column])
+        elif kinds[column] == 'date':
+            metadata[column] = [None if pd.isna(value) else value.date() for value in pd.to_datetime(metadata[column])]
+    return metadata[names]
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: load_table
+# Parameters: table_dir, columns, as_lists
+# Description: This loads the table in table_dir as a data frame in the original column order.
+# # columns limits the columns loaded (all if None). With as_lists the list columns hold Python
+# # lists like the data frame that was saved. Without it they hold the rows of the memory mapped
+# # arrays, which costs nothing to load (use load_matrix to get a whole array at once).
+# =================================================================================================
+def load_table(table_dir, columns=None, as_lists=True):
+    layout = load_layout(table_dir)
+    names = [column for column in layout['columns'] if columns is None or column in columns]
+    if any(layout['kinds'][column] != 'matrix' for column in names):
+        metadata = load_metadata(table_dir, names)
+    registry = None
+    data = {}
+    for column in names:
+        if layout['kinds'][column] != 'matrix':
+            data[column] = metadata[column]
+            continue
+        if column in layout.get('grid_columns', []):
+            # every sample shares the array of its grid
+            if registry is None:
+                registry, grid_ids = load_grids(table_dir)
+            if as_lists:
+                grid_lists = [grid[column].tolist() for grid in registry['grids']]
+                rows = [list(grid_lists[grid_id]) for grid_id in grid_ids.tolist()]
+            else:
+                rows = [registry['grids'][grid_id][column] for grid_id in grid_ids.tolist()]
+            data[column] = pd.Series(rows, dtype=object)
+            continue
+        matrix = load_matrix(table_dir, column)
+        if column in layout['ragged']:
+            lengths = np.load(table_dir + '/' + column + '.lengths.npy')
+            rows = [row[:n] for row, n in zip(matrix, lengths)]
+        else:
+            rows = list(matrix)
+        if as_lists:
+            rows = [row.tolist() for row in rows]
+        data[column] = pd.Series(rows, dtype=object)
+    return pd.DataFrame(data)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: csv_to_table
+# Parameters: csv_path, table_dir, matrix_columns
+# Description: This converts a CSV written the old way (lists as text, e.g. a hand-edited
+# # ssaDF_final.csv) into a table in table_dir, so its lists only have to be parsed once.
+# # matrix_columns are the list columns to parse; if None, every column whose first value looks
+# # like a list is parsed. id_number is kept as text.
+# =================================================================================================
+def csv_to_table(csv_path, table_dir, matrix_columns=None):
+    df = pd.read_csv(csv_path, dtype={'id_number': str}, float_precision='round_trip')
+    if matrix_columns is None:
+        matrix_columns = [column for column in df.columns
+                          if not pd.api.types.is_numeric_dtype(df[column]) and df[column].dropna().astype(str).str.startswith('[').any()]
+    for column in matrix_columns:
+        df[column] = df[column].apply(literal_eval)
+    for column in csv_datetime_columns:
+        if column in df:
+            df[column] = pd.to_datetime(df[column])
+    if 'date' in df:
+        df['date'] = [None if pd.isna(value) else value.date() for value in pd.to_datetime(df['date'])]
+    save_table(df, table_dir)
+    return df
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: make_loader
+# Parameters: source
+# Description: This creates a loader for source, a table directory or an old CSV (lists as text),
+# # as a dictionary. Only the column names and kinds are read now (for a CSV, from its first
+# # sniff_rows rows); the columns themselves are read by load_columns when they are first asked
+# # for and then kept in the loader.
+# =================================================================================================
+def make_loader(source):
+    loader = {'source': source, 'is_table': os.path.isdir(source), 'cache': {}}
+    if loader['is_table']:
+        layout = load_layout(source)
+        loader['columns'] = layout['columns']
+        loader['kinds'] = layout['kinds']
+        loader['ragged'] = layout['ragged']
+    else:
+        first = pd.read_csv(source, nrows=sniff_rows, dtype=str, keep_default_na=False)
+        loader['columns'] = list(first.columns)
+        loader['kinds'] = {}
+        loader['ragged'] = []
+        for column in first.columns:
+            if first[column].str.startswith('[').any():
+                loader['kinds'][column] = 'matrix'
+            elif column in csv_datetime_columns:
+                loader['kinds'][column] = 'datetime'
+            elif column == 'date':
+                loader['kinds'][column] = 'date'
+            elif column == 'id_number':
+                loader['kinds'][column] = 'string'
+            else:
+                loader['kinds'][column] = 'value'
+    return loader
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: load_columns
+# Parameters: loader, columns, scalars
+# Description: This returns a data frame with the columns of loader's source named in columns
+# # plus, with scalars, every single-value column (these are read together, once, and are cheap).
+# # List columns are only read the first time they are asked for: from a table they are read
+# # from their memory mapped array, and from a CSV only that column is read and parsed with
+# # literal_eval. Every column read is kept in the loader, so later calls cost almost nothing.
+# # The columns come in the order of the source.
+# =================================================================================================
+def load_columns(loader, columns=(), scalars=True):
+    kinds = loader['kinds']
+    unknown = [column for column in columns if column not in kinds]
+    if unknown:
+        raise KeyError('columns not in ' + loader['source'] + ': ' + ', '.join(unknown))
+    names = [column for column in loader['columns'] if column in columns or (scalars and kinds[column] != 'matrix')]
+    cache = loader['cache']
+    # read the single-value columns that are not kept yet all at once
+    new_scalars = [column for column in names if kinds[column] != 'matrix' and column not in cache]
+    if new_scalars:
+        if loader['is_table']:
+            metadata = load_metadata(loader['source'], new_scalars)
+        else:
+            strings = {column: str for column in new_scalars if kinds[column] == 'string'}
+            metadata = pd.read_csv(loader['source'], usecols=new_scalars, dtype=strings, float_precision='round_trip')
+            for column in new_scalars:
+                if kinds[column] == 'datetime':
+                    metadata[column] = pd.to_datetime(metadata[column])
+                elif kinds[column] == 'date':
+                    metadata[column] = [None if pd.isna(value) else value.date() for value in pd.to_datetime(metadata[column])]
+        for column in new_scalars:
+            cache[column] = metadata[column]
+    # read each list column that is not kept yet
+    for column in names:
+        if kinds[column] != 'matrix' or column in cache:
+            continue
+        if loader['is_table']:
+            cache[column] = load_table(loader['source'], [column])[column]
+        else:
+            rows = pd.read_csv(loader['source'], usecols=[column])[column].apply(literal_eval).tolist()
+            cache[column] = pd.Series(rows, dtype=object)
+    return pd.DataFrame({column: cache[column] for column in names})
+
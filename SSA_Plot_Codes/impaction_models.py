@@ -0,0 +1,145 @@
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Title: Impaction Models
+# Author: agent
+# Date Updated: 17 October 2026
+# Description: This script keeps a registry of collection efficiency models so that different slide
+# # geometries and impaction formulations can be compared. Every model is a function with the same
+# # call signature as ranzwong.get_collision_efficiency_array:
+# # # model(pressure, temperature, air_speed, rh, dry_radius, **parameters)
+# # with pressure in pascals, temperature in Kelvin, air_speed in m/s, rh as a fraction, and
+# # dry_radius in meters, all broadcast against each other. Models are chosen by name. The default
+# # is the Ranz-Wong infinite ribbon used everywhere else in the processing.
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+
+# import packages
+import numpy as np
+import time
+
+import ranzwong as rw
+
+# registry of models: name -> {'function': model function, 'description': text}
+models = {}
+default_model = 'ranz_wong_ribbon'
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: register_model
+# Parameters: name, function, description
+# Description: This adds a model to the registry under name. A model registered under a name that
+# # is already taken replaces the old one.
+# =================================================================================================
+def register_model(name, function, description=''):
+    models[name] = {'function': function, 'description': description}
+    return function
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: get_model
+# Parameters: name
+# Description: This returns the model function registered under name (the default model if name
+# # is None).
+# =================================================================================================
+def get_model(name=None):
+    if name is None:
+        name = default_model
+    if name not in models:
+        raise KeyError('unknown impaction model ' + repr(name) + '; registered models: ' + ', '.join(sorted(models)))
+    return models[name]['function']
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# MODELS
+# =================================================================================================
+
+# Ranz and Wong (1952) collision efficiency for an infinite ribbon (see ranzwong.py). width is the
+# # ribbon width in meters and density the dry particle density in kg per meter cubed, so other
+# # slide geometries can be used.
+def ranz_wong_ribbon(pressure, temperature, air_speed, rh, dry_radius, width=rw.slide_width, density=rw.salt_density):
+    return rw.get_collision_efficiency_array(pressure, temperature, air_speed, rh, dry_radius, width=width, density=density)
+
+# Israel, R. and Rosner, D.E. (1983) fit to the collection efficiency of a cylinder in potential flow
+# # E = 1/(1 + 1.25/x - 0.014/x^2 + 0.508e-4/x^3) where x = Stk - 1/8 (E = 0 for Stk <= 1/8)
+# # The Stokes number Stk = C*rho*U*d^2/(9*mu*D) for a cylinder of diameter D is 2*psi of
+# # ranzwong with width = D, so psi from ranzwong is reused. diameter in meters, density in kg per
+# # meter cubed.
+def israel_rosner_cylinder(pressure, temperature, air_speed, rh, dry_radius, diameter=rw.slide_width, density=rw.salt_density):
+    stokes = 2*rw.get_psi_array(pressure, temperature, air_speed, rh, dry_radius, width=diameter, density=density)
+    collision_efficiency = np.zeros(stokes.shape)
+    # written this way so NaN inputs give NaN
+    impacting = ~(stokes <= 0.125)
+    x = stokes[impacting] - 0.125
+    collision_efficiency[impacting] = 1/(1 + 1.25/x - 0.014/x**2 + 0.508e-4/x**3)
+    return collision_efficiency
+
+register_model('ranz_wong_ribbon', ranz_wong_ribbon, 'Ranz and Wong (1952) infinite ribbon')
+register_model('israel_rosner_cylinder', israel_rosner_cylinder, 'Israel and Rosner (1983) cylinder in potential flow')
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: get_bin_average
+# Parameters: pressure, temperature, air_speed, rh, lower_radius, upper_radius, order, name,
+# # **parameters
+# Description: This returns the collection efficiency of model name averaged over dry radius from
+# # lower_radius to upper_radius (in meters), instead of at a single radius. The average is taken
+# # with order-point Gauss-Legendre quadrature: the model is called once with an extra last axis
+# # holding the quadrature radii of every bin. The other arguments are the same as the model's and
+# # are broadcast against the bin edges. Other keyword arguments are passed on to the model.
+# =================================================================================================
+def get_bin_average(pressure, temperature, air_speed, rh, lower_radius, upper_radius, order=5, name=None, **parameters):
+    model = get_model(name)
+    nodes, weights = np.polynomial.legendre.leggauss(order)
+    lower_radius = np.asarray(lower_radius, dtype=float)[..., None]
+    upper_radius = np.asarray(upper_radius, dtype=float)[..., None]
+    # map the quadrature nodes from [-1, 1] onto each bin
+    dry_radius = (upper_radius + lower_radius)/2 + (upper_radius - lower_radius)/2*nodes
+    collection_efficiency = model(np.asarray(pressure, dtype=float)[..., None],
+                                  np.asarray(temperature, dtype=float)[..., None],
+                                  np.asarray(air_speed, dtype=float)[..., None],
+                                  np.asarray(rh, dtype=float)[..., None],
+                                  dry_radius, **parameters)
+    # the weights add up to 2 (the length of [-1, 1])
+    return (collection_efficiency*weights).sum(axis=-1)/2
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: benchmark_model
+# Parameters: name, n_evaluations, repeats, seed, **parameters
+# Description: This times a model on n_evaluations random conditions typical of mini-GNI sampling
+# # (950-1030 hPa, 285-305 K, 0.5-20 m/s, 50-100% RH, 0.8-19.8 um dry radius) and returns the
+# # throughput in evaluations per second, using the fastest of repeats runs. Other keyword
+# # arguments are passed on to the model.
+# =================================================================================================
+def benchmark_model(name=None, n_evaluations=1000000, repeats=5, seed=0, **parameters):
+    model = get_model(name)
+    rng = np.random.default_rng(seed)
+    pressure = rng.uniform(95000, 103000, n_evaluations)
+    temperature = rng.uniform(285, 305, n_evaluations)
+    air_speed = rng.uniform(0.5, 20, n_evaluations)
+    rh = rng.uniform(0.5, 1.0, n_evaluations)
+    dry_radius = rng.uniform(0.8e-6, 19.8e-6, n_evaluations)
+    best_time = float('inf')
+    for i in range(repeats):
+        start = time.perf_counter()
+        model(pressure, temperature, air_speed, rh, dry_radius, **parameters)
+        best_time = min(best_time, time.perf_counter() - start)
+    return n_evaluations/best_time
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: benchmark_models
+# Parameters: n_evaluations, repeats
+# Description: This runs benchmark_model for every registered model and returns a dictionary of
+# # model name -> evaluations per second.
+# =================================================================================================
+def benchmark_models(n_evaluations=1000000, repeats=5):
+    return {name: benchmark_model(name, n_evaluations=n_evaluations, repeats=repeats) for name in models}
@@ -12,6 +12,7 @@
 
 # import packages
 import math
+import numpy as np
 
 # from Pruppacher, H.R. and Klett, J.D. (1997) Microphysics of Clouds and Precipitation 2nd edition
 # see equations 10-139 and 10-140
@@ -90,3 +91,151 @@ def get_collision_efficiency(pressure, temperature, air_speed, rh, dry_radius):
         s2 = -0.25/psi - math.sqrt(1/(16*psi**2) + 0.5/psi)
         collision_efficiency = (s2 - s1)/(s2*math.exp(s1*t) - s1*math.exp(s2*t))
     return collision_efficiency
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# ARRAY VERSIONS
+# The functions below are numpy versions of the functions above. They take scalars or arrays for
+# # every argument and broadcast them against each other, so a whole samples-by-bins collision
+# # efficiency matrix can be calculated in one call, e.g. with pressure of shape (samples, 1) and
+# # dry_radius of shape (samples, bins). The branches of the scalar functions (below freezing
+# # viscosity, psi < 0.125) are handled with masks. They use the same equations in the same order
+# # as the scalar functions, so the results agree with them to within floating point rounding.
+# # They also accept complex arrays, which get_collision_efficiency_gradient uses.
+# =================================================================================================
+
+# converts x to a float array, leaving complex arrays complex
+def as_float_array(x):
+    x = np.asarray(x)
+    if np.iscomplexobj(x):
+        return x
+    return np.asarray(x, dtype=float)
+
+# array version of get_dyn_visc
+def get_dyn_visc_array(t_kelvin):
+    t_kelvin = as_float_array(t_kelvin)
+    dyn_visc = 1.718e-5 + (4.9e-8)*(t_kelvin-273.16)
+    # the extra quadratic term is only used below freezing
+    below_freezing = t_kelvin.real < 273.16
+    dyn_visc = np.where(below_freezing, dyn_visc - (1.2e-10)*(t_kelvin-273.16)**2, dyn_visc)
+    return dyn_visc
+
+# array version of get_wet_radius
+# dry_radius in meters, rh as a fraction
+def get_wet_radius_array(dry_radius, rh):
+    dry_radius = as_float_array(dry_radius)
+    rh = as_float_array(rh)
+    e_pure = 1.1e-9/dry_radius
+    wet_radius = dry_radius*1.08*(1.1 + 1/(1 - rh + (e_pure/1.08)**(3/2)))**(1/3)
+    return wet_radius
+
+# array version of get_cunningham_factor
+# ssa_radius in meters, pressure in pascals, temperature in Kelvin
+def get_cunningham_factor_array(ssa_radius, pressure, temperature):
+    ssa_radius = as_float_array(ssa_radius)
+    pressure = as_float_array(pressure)
+    temperature = as_float_array(temperature)
+    mean_free_path = std_mean_free_path*(std_pressure/pressure)*(temperature/std_temperature)
+    alpha = 1.257 + 0.4*np.exp(-1.1*ssa_radius/mean_free_path)
+    c_factor = 1 + alpha*mean_free_path/ssa_radius
+    return c_factor
+
+# psi, the inertia parameter of get_collision_efficiency, as an array
+# # width is the width of the ribbon in meters and density the dry particle density in kg per
+# # meter cubed; they default to the slide width and NaCl density defined above
+def get_psi_array(pressure, temperature, air_speed, rh, dry_radius, width=slide_width, density=salt_density):
+    pressure, temperature, air_speed, rh, dry_radius = np.broadcast_arrays(
+        *[as_float_array(item) for item in (pressure, temperature, air_speed, rh, dry_radius)])
+    ssa_radius = get_wet_radius_array(dry_radius, rh)
+    salt_volume = (4/3)*math.pi*dry_radius**3
+    salt_mass = salt_volume*density
+    ssa_volume = (4/3)*math.pi*ssa_radius**3
+    water_volume = ssa_volume - salt_volume
+    water_mass = water_volume*1000 # 1000 is the density of water in kg permeter cubed
+    ssa_density = (salt_mass + water_mass)/ssa_volume
+    c_factor = get_cunningham_factor_array(ssa_radius, pressure, temperature)
+    dyn_visc = get_dyn_visc_array(temperature)
+    psi = (c_factor*ssa_density*air_speed*((2*ssa_radius)**2))/(18*dyn_visc*width)
+    return psi
+
+# array version of get_collision_efficiency
+# pressure in pascals, temperature in Kelvin, air_speed in meter per second, rh in fraction,
+# # dry_radius in meters; all of them are broadcast against each other
+# width and density are passed on to get_psi_array
+def get_collision_efficiency_array(pressure, temperature, air_speed, rh, dry_radius, width=slide_width, density=salt_density):
+    psi = get_psi_array(pressure, temperature, air_speed, rh, dry_radius, width=width, density=density)
+    # collision efficiency stays 0 where psi < 0.125 (written this way so NaN inputs give NaN
+    # # like the scalar function does)
+    collision_efficiency = np.zeros(psi.shape, dtype=psi.dtype)
+    impacting = ~(psi.real < 0.125)
+    psi = psi[impacting]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q = np.sqrt(0.5/psi - 1/(16*psi**2))
+        t = (1/q)*np.arctan(4*psi*q/(4*psi - 1))
+        s1 = -0.25/psi + np.sqrt(1/(16*psi**2) + 0.5/psi)
+        s2 = -0.25/psi - np.sqrt(1/(16*psi**2) + 0.5/psi)
+        collision_efficiency[impacting] = (s2 - s1)/(s2*np.exp(s1*t) - s1*np.exp(s2*t))
+    return collision_efficiency
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# INVERSE
+# get_cutoff_radius returns the dry radius (in meters) at which collision efficiency reaches the
+# # given efficiency (e.g. 0.5 for the Ranz-Wong 50% cut-off radius). The conditions are arrays that
+# # are broadcast against each other like in get_collision_efficiency_array, and efficiency can be
+# # an array too. Collision efficiency only goes up with dry radius, but the formula has jumps (at
+# # psi = 0.125 and psi = 0.25), so this uses bisection on log(radius), which keeps a bracket around
+# # the answer for every point at once. It returns the smallest radius with collision efficiency of
+# # at least efficiency, to within a relative tolerance rtol. Where efficiency is not reached
+# # between min_radius and max_radius (or is already reached at min_radius) it returns NaN.
+# =================================================================================================
+def get_cutoff_radius(pressure, temperature, air_speed, rh, efficiency=0.5, min_radius=1e-8, max_radius=1e-4, rtol=1e-6):
+    pressure, temperature, air_speed, rh, efficiency = np.broadcast_arrays(
+        *[np.asarray(item, dtype=float) for item in (pressure, temperature, air_speed, rh, efficiency)])
+    log_lower = np.full(pressure.shape, math.log(min_radius))
+    log_upper = np.full(pressure.shape, math.log(max_radius))
+    # check that the answer is bracketed by min_radius and max_radius
+    ce_lower = get_collision_efficiency_array(pressure, temperature, air_speed, rh, min_radius)
+    ce_upper = get_collision_efficiency_array(pressure, temperature, air_speed, rh, max_radius)
+    bracketed = (ce_lower < efficiency) & (ce_upper >= efficiency)
+    # number of halvings needed to shrink the bracket to rtol
+    n_steps = int(math.ceil(math.log2((math.log(max_radius) - math.log(min_radius))/rtol)))
+    for i in range(n_steps):
+        log_middle = 0.5*(log_lower + log_upper)
+        ce_middle = get_collision_efficiency_array(pressure, temperature, air_speed, rh, np.exp(log_middle))
+        reached = ce_middle >= efficiency
+        log_upper = np.where(reached, log_middle, log_upper)
+        log_lower = np.where(reached, log_lower, log_middle)
+    cutoff_radius = np.where(bracketed, np.exp(log_upper), np.nan)
+    return cutoff_radius
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# GRADIENT
+# get_collision_efficiency_gradient returns collision efficiency and its partial derivatives with
+# # respect to each condition, with the same arguments as get_collision_efficiency_array. The
+# # derivatives are calculated with the complex step method: each condition in turn is given a tiny
+# # imaginary part h, and the derivative is the imaginary part of the collision efficiency divided
+# # by h. This is the same as forward-mode automatic differentiation for first derivatives, so the
+# # derivatives are exact to floating point precision (there is no subtraction like in a finite
+# # difference). The derivatives are returned in a dictionary keyed by the argument names, in units
+# # of collision efficiency per unit of each argument (per pascal, per Kelvin, per m/s, per unit
+# # rh fraction, per meter). Where psi < 0.125 the collision efficiency is flat at 0 and so are the
+# # derivatives; at the jumps of the formula the derivative is that of the side the point is on.
+# =================================================================================================
+def get_collision_efficiency_gradient(pressure, temperature, air_speed, rh, dry_radius):
+    conditions = np.broadcast_arrays(
+        *[np.asarray(item, dtype=float) for item in (pressure, temperature, air_speed, rh, dry_radius)])
+    names = ('pressure', 'temperature', 'air_speed', 'rh', 'dry_radius')
+    gradient = {}
+    for i, name in enumerate(names):
+        # the step is relative to the size of the condition so it works for any units
+        h = 1e-20*np.where(conditions[i] != 0, np.abs(conditions[i]), 1.0)
+        stepped = list(conditions)
+        stepped[i] = conditions[i] + 1j*h
+        collision_efficiency = get_collision_efficiency_array(*stepped)
+        gradient[name] = collision_efficiency.imag/h
+    return collision_efficiency.real, gradient
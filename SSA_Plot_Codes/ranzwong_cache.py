@@ -0,0 +1,137 @@
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Title: Ranz Wong Cache
+# Author: agent
+# Date Updated: 17 October 2026
+# Description: This script provides a cache for Ranz-Wong collision efficiency. Conditions are
+# # rounded to a set resolution, and the collision efficiency of each rounded set of conditions is
+# # only calculated once. The cache holds a limited number of entries and throws out the least
+# # recently used ones first. It can be saved to disk so later runs can start from it.
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+
+# import packages
+import numpy as np
+import os
+import pickle
+from collections import OrderedDict
+
+import ranzwong as rw
+
+# default resolution that each condition is rounded to
+# pressure in pascals, temperature in Kelvin, air speed in m/s, rh in fraction, radius in meters
+default_resolution = {'pressure': 10.0,
+                      'temperature': 0.01,
+                      'air_speed': 0.01,
+                      'rh': 1e-4,
+                      'dry_radius': 1e-9}
+resolution_order = ('pressure', 'temperature', 'air_speed', 'rh', 'dry_radius')
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: make_ce_cache
+# Parameters: max_entries, resolution, cache_path
+# Description: This creates an empty cache as a dictionary. resolution is a dictionary that
+# # overrides any of the default resolutions above. If cache_path is given and a cache was saved
+# # there with the same resolution, its entries are loaded into the new cache.
+# =================================================================================================
+def make_ce_cache(max_entries=1000000, resolution=None, cache_path=None):
+    step = dict(default_resolution)
+    if resolution is not None:
+        step.update(resolution)
+    cache = {'entries': OrderedDict(),
+             'max_entries': max_entries,
+             'resolution': tuple(float(step[name]) for name in resolution_order),
+             'hits': 0,
+             'misses': 0,
+             'cache_path': cache_path}
+    if cache_path is not None and os.path.exists(cache_path):
+        with open(cache_path, 'rb') as cache_file:
+            saved = pickle.load(cache_file)
+        # entries rounded to a different resolution can not be reused
+        if saved['resolution'] == cache['resolution']:
+            cache['entries'].update(saved['entries'])
+            while len(cache['entries']) > max_entries:
+                cache['entries'].popitem(last=False)
+    return cache
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: get_collision_efficiency_cached
+# Parameters: cache, pressure, temperature, air_speed, rh, dry_radius
+# Description: This returns collision efficiency like rw.get_collision_efficiency_array, but
+# # looks each point up in the cache first. The collision efficiency is always calculated at the
+# # rounded conditions, so the answer does not depend on what is already in the cache. All the
+# # points that are not in the cache are calculated together in one array call. Points with a NaN
+# # or infinite condition give NaN and are neither looked up nor stored.
+# =================================================================================================
+def get_collision_efficiency_cached(cache, pressure, temperature, air_speed, rh, dry_radius):
+    conditions = np.broadcast_arrays(
+        *[np.asarray(item, dtype=float) for item in (pressure, temperature, air_speed, rh, dry_radius)])
+    shape = conditions[0].shape
+    conditions = [c.ravel() for c in conditions]
+    # only the points whose conditions are all finite are rounded (NaN would become a bogus key)
+    finite = np.logical_and.reduce([np.isfinite(c) for c in conditions])
+    positions = np.flatnonzero(finite)
+    # round every condition to an integer number of resolution steps
+    steps = [np.rint(c[finite]/r).astype(np.int64) for c, r in zip(conditions, cache['resolution'])]
+    keys = list(zip(*[s.tolist() for s in steps]))
+    entries = cache['entries']
+    collision_efficiency = np.full(len(finite), np.nan)
+    missing = {}
+    for i, key in zip(positions.tolist(), keys):
+        value = entries.get(key)
+        if value is None:
+            missing.setdefault(key, []).append(i)
+        else:
+            entries.move_to_end(key)
+            collision_efficiency[i] = value
+    cache['hits'] += len(keys) - len(missing)
+    cache['misses'] += len(missing)
+    if missing:
+        missing_keys = np.array(list(missing.keys()), dtype=float)
+        values = rw.get_collision_efficiency_array(*[missing_keys[:, j]*r for j, r in enumerate(cache['resolution'])])
+        for key, value, index in zip(missing.keys(), values.tolist(), missing.values()):
+            entries[key] = value
+            collision_efficiency[index] = value
+        # throw out the least recently used entries
+        while len(entries) > cache['max_entries']:
+            entries.popitem(last=False)
+    return collision_efficiency.reshape(shape)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: ce_cache_info
+# Parameters: cache
+# Description: This returns the hit and miss counts, the hit rate, and the number of entries in
+# # the cache as a dictionary. Repeated points within one call count as hits.
+# =================================================================================================
+def ce_cache_info(cache):
+    lookups = cache['hits'] + cache['misses']
+    return {'hits': cache['hits'],
+            'misses': cache['misses'],
+            'hit_rate': cache['hits']/lookups if lookups > 0 else 0.0,
+            'entries': len(cache['entries']),
+            'max_entries': cache['max_entries']}
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: save_ce_cache
+# Parameters: cache, cache_path
+# Description: This saves the cache entries to cache_path (defaults to the path the cache was
+# # made with). The file is written to a temporary file first and then moved into place, so a
+# # crash while saving does not leave behind a broken cache.
+# =================================================================================================
+def save_ce_cache(cache, cache_path=None):
+    if cache_path is None:
+        cache_path = cache['cache_path']
+    temporary_path = cache_path + '.tmp'
+    with open(temporary_path, 'wb') as cache_file:
+        pickle.dump({'resolution': cache['resolution'], 'entries': cache['entries']}, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, cache_path)
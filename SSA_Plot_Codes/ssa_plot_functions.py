@@ -17,7 +17,6 @@ import math
 import matplotlib.colors
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
-import matplotlib.tri as tri
 import numpy as np
 import os
 import pandas as pd
@@ -531,43 +530,87 @@ def plot_mass_distribution_tenpercent(df):
     plt.savefig(plot_dir + '/mean_mass_distribution_tenpercent.png', format='png')
     plt.close('all')
 
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: get_ce_surface
+# Parameters: dry_radius, air_speed, levels, adaptive, refine_factor
+# Description: This calculates collision efficiency on the structured mesh of dry_radius (in
+# # microns) by air_speed (in m/s) for the conditions used in plot_ranz_wong, and returns it as a
+# # 2D array with one row per air speed. Without adaptive, every mesh point is calculated in one
+# # vectorized call. With adaptive, collision efficiency is first calculated on a coarse mesh that
+# # keeps every refine_factor-th point. Collision efficiency only goes up with dry radius and wind
+# # speed, so a coarse cell can only contain a contour level if its corners are on both sides of
+# # that level. Only the fine points in those cells are calculated exactly; the rest are filled in
+# # by bilinear interpolation of the coarse mesh, which does not change where the contours are.
+# =================================================================================================
+def get_ce_surface(dry_radius, air_speed, levels, adaptive=False, refine_factor=4):
+    dry_radius = np.asarray(dry_radius, dtype=float)
+    air_speed = np.asarray(air_speed, dtype=float)
+    def collision_efficiency(radius, speed):
+        return rw.get_collision_efficiency_array(pressure=99053.14, temperature=297.55, air_speed=speed, rh=0.7492, dry_radius=radius/1000000)
+    if not adaptive:
+        return collision_efficiency(dry_radius[None, :], air_speed[:, None])
+    # coarse mesh: every refine_factor-th point, always keeping the last point
+    coarse_r = np.unique(np.r_[0:len(dry_radius):refine_factor, len(dry_radius)-1])
+    coarse_u = np.unique(np.r_[0:len(air_speed):refine_factor, len(air_speed)-1])
+    coarse_ce = collision_efficiency(dry_radius[coarse_r][None, :], air_speed[coarse_u][:, None])
+    # coarse cells whose corners are on both sides of any level
+    corners = np.stack([coarse_ce[:-1, :-1], coarse_ce[:-1, 1:], coarse_ce[1:, :-1], coarse_ce[1:, 1:]])
+    cell_min = corners.min(axis=0)
+    cell_max = corners.max(axis=0)
+    refine = np.zeros(cell_min.shape, dtype=bool)
+    for level in levels:
+        refine |= (cell_min < level) & (cell_max >= level)
+    # for each fine point, the coarse cell it is in, and the cell before it for points on a cell
+    # # edge (which belong to both cells)
+    def cells(n_fine, coarse_index):
+        cell = np.clip(np.searchsorted(coarse_index, np.arange(n_fine), side='right') - 1, 0, len(coarse_index) - 2)
+        on_edge = np.isin(np.arange(n_fine), coarse_index)
+        previous_cell = np.where(on_edge, np.maximum(cell - 1, 0), cell)
+        return previous_cell, cell
+    r_previous, r_cell = cells(len(dry_radius), coarse_r)
+    u_previous, u_cell = cells(len(air_speed), coarse_u)
+    exact = (refine[np.ix_(u_previous, r_previous)] | refine[np.ix_(u_previous, r_cell)]
+             | refine[np.ix_(u_cell, r_previous)] | refine[np.ix_(u_cell, r_cell)])
+    # bilinear interpolation of the coarse mesh onto the fine mesh
+    wr = (dry_radius - dry_radius[coarse_r][r_cell])/(dry_radius[coarse_r][r_cell+1] - dry_radius[coarse_r][r_cell])
+    wu = (air_speed - air_speed[coarse_u][u_cell])/(air_speed[coarse_u][u_cell+1] - air_speed[coarse_u][u_cell])
+    wr = wr[None, :]
+    wu = wu[:, None]
+    ce = ((1 - wu)*(1 - wr)*coarse_ce[np.ix_(u_cell, r_cell)] + (1 - wu)*wr*coarse_ce[np.ix_(u_cell, r_cell+1)]
+          + wu*(1 - wr)*coarse_ce[np.ix_(u_cell+1, r_cell)] + wu*wr*coarse_ce[np.ix_(u_cell+1, r_cell+1)])
+    # exact values for the fine points in refined cells
+    radius_mesh, speed_mesh = np.meshgrid(dry_radius, air_speed)
+    ce[exact] = collision_efficiency(radius_mesh[exact], speed_mesh[exact])
+    return ce
+
 # =================================================================================================
 # =================================================================================================
 # =================================================================================================
 # Function Title: plot_ranz_wong
-# Parameters: df, plot_resolution, max_radius, max_wind_speed
+# Parameters: plot_resolution, max_radius, max_wind_speed, adaptive, refine_factor
 # Description: This creates a contour plot of collision efficiency's relationship with
 # # SSA dry radius and wind speed. The plot can be altered to show a range of dry radius and
-# # wind speeds. The resolution can be changed as well. The default is 100. Warning: having a high
-# # resolution will lead to longer computation times.
+# # wind speeds. The resolution can be changed as well. The default is 100. The collision
+# # efficiency surface is calculated by get_ce_surface; adaptive=True only calculates the fine
+# # mesh exactly near the contour lines, which is faster at high resolution.
 # =================================================================================================
-def plot_ranz_wong(plot_resolution, max_radius, max_wind_speed):
-    # setting variables for tricontour plot
+def plot_ranz_wong(plot_resolution, max_radius, max_wind_speed, adaptive=False, refine_factor=4):
+    # setting the structured mesh for the contour plot
     res = plot_resolution # just shortening the variable name
-    dry_radius_list = [(x/1000000)/res for x in range(1*res, max_radius*res + 1)]
-    air_speed_list = [y/res for y in range(1*res, max_wind_speed*res + 1)]
-    # I want to calculate the collision efficiency for each pair of dry_radius and air_speed
-    # # values. So I will repeat each item in dry_radius a number of time equal to the number of 
-    # # objects in air_speed. Then, I will repeat the air_speed list a number of times equal to
-    # # the length of the dry_radius list. By doing this, I can iterate over both lists to 
-    # # calculcate collision efficiency for each pairing of dry radius and wind speed.
-    ssa_dry_radius = [item for item in dry_radius_list for i in range(len(air_speed_list))]
-    wind_speed = air_speed_list*len(dry_radius_list)
-    ce_list = []
-    for x, y in zip(ssa_dry_radius, wind_speed):
-        ce_list.append(rw.get_collision_efficiency(pressure=99053.14, temperature=297.55, air_speed=y, rh=0.7492, dry_radius=x))
-    # set size of plot
-    plt.rcParams['figure.figsize'] = (12.0, 8.0)
-    # defining x, y, z for tricontour style
-    x = [1000000*item for item in ssa_dry_radius]
-    y = wind_speed
-    z = ce_list
+    dry_radius = np.arange(1*res, max_radius*res + 1)/res # in microns
+    air_speed = np.arange(1*res, max_wind_speed*res + 1)/res
     # defining levels for color and line contours
     color_levels = np.arange(0, 1.01, 0.01)
     line_levels = [0.01, 0.05, 0.1, 0.3, 0.5, 0.7, 0.9, 0.95, 0.99]
-    triang = tri.Triangulation(x, y)
-    cs = plt.tricontour(triang, z, linewidths=1, levels=line_levels, colors='k')
-    tcf = plt.tricontourf(triang, z, levels=color_levels, cmap=cmap)
+    # calculate collision efficiency on the whole mesh (rows are wind speed, columns dry radius)
+    ce = get_ce_surface(dry_radius, air_speed, levels=line_levels, adaptive=adaptive, refine_factor=refine_factor)
+    # set size of plot
+    plt.rcParams['figure.figsize'] = (12.0, 8.0)
+    # grid-based contouring on the structured mesh
+    cs = plt.contour(dry_radius, air_speed, ce, linewidths=1, levels=line_levels, colors='k')
+    tcf = plt.contourf(dry_radius, air_speed, ce, levels=color_levels, cmap=cmap)
     plt.clabel(cs, inline=1, fontsize=24) # labeling the line contours
     # creating colorbar
     cb = plt.colorbar(tcf)
@@ -21,7 +21,6 @@ import numpy as np
 import os
 import pandas as pd
 
-from ast import literal_eval
 from matplotlib.dates import DateFormatter
 from scipy import stats
 from scipy.optimize import curve_fit
@@ -29,6 +28,7 @@ from lmfit.models import ExpressionModel
 
 import ranzwong as rw
 import ssa_plot_functions as spf
+import ssa_table_store as tbl
 
 plt.close('all') # closing any residual plot data before continuing
 
@@ -43,55 +43,30 @@ miniGNI_dir = 'C:/Users/ntril/Dropbox/mini-GNI'
 data_dir = miniGNI_dir + '/python_scripts/data'
 plot_dir = miniGNI_dir + '/python_scripts/plots'
 
-# loading data
-ssaData = pd.read_csv(data_dir + '/ssaDF_final.csv')
-vocalsData = pd.read_csv(data_dir + '/vocalsDF.csv')
-synthData = pd.read_csv(data_dir + '/synthDF.csv')
-
-def apply_literal_eval(df):
-    # changing id_number to string
-    df['id_number'] = df['id_number'].astype(str)
-    # changing datetime columns that read as objects to datetime
+# Each data set is read through a loader (see ssa_table_store), from its table if there is one,
+# # e.g. the directory ssaDF_final made by tbl.csv_to_table from the hand-edited ssaDF_final.csv,
+# # and otherwise from its CSV. Only the single-value columns are read here. The bin columns a
+# # plot needs are asked for at the top of its section with get_data and are only read (and
+# # parsed, for a CSV) the first time; after that they are kept by the loader.
+def make_data_loader(name):
+    if os.path.isdir(data_dir + '/' + name):
+        return tbl.make_loader(data_dir + '/' + name)
+    return tbl.make_loader(data_dir + '/' + name + '.csv')
+
+def get_data(loader, columns=()):
+    df = tbl.load_columns(loader, columns)
     df['date'] = pd.to_datetime(df['date'])
-    df['timedate'] = pd.to_datetime(df['timedate'])
-    df['end_time'] = pd.to_datetime(df['end_time'])
-    # changing list columns that read as objects to lists
-    df['bin_number'] = df['bin_number'].apply(literal_eval)
-    df['bin_lower'] = df['bin_lower'].apply(literal_eval)
-    df['bin_middle'] = df['bin_middle'].apply(literal_eval)
-    df['bin_upper'] = df['bin_upper'].apply(literal_eval)
-    df['bin_conc'] = df['bin_conc'].apply(literal_eval)
-    df['cumu_conc'] = df['cumu_conc'].apply(literal_eval)
-    df['bin_salt'] = df['bin_salt'].apply(literal_eval)
-    df['bin_fixed_conc'] = df['bin_fixed_conc'].apply(literal_eval)
-    df['bin_ce'] = df['bin_ce'].apply(literal_eval)
-    df['bin_real_conc'] = df['bin_real_conc'].apply(literal_eval)
-    df['real_cumu_conc'] = df['real_cumu_conc'].apply(literal_eval)
-    df['bin_real_salt'] = df['bin_real_salt'].apply(literal_eval)
-    # some data sets don't have this data
-    try: 
-        df['tide_time'] = pd.to_datetime(df['tide_time'])
-        df['phng_time'] = pd.to_datetime(df['phng_time'])
-        df['bin_cutoff_salt'] = df['bin_cutoff_salt'].apply(literal_eval)
-        df['bin_cutoff_conc'] = df['bin_cutoff_conc'].apply(literal_eval)
-        df['cutoff_cumu_conc'] = df['cutoff_cumu_conc'].apply(literal_eval)
-        df['highwind_ce'] = df['highwind_ce'].apply(literal_eval)
-        df['highwind_conc'] = df['highwind_conc'].apply(literal_eval)
-        df['lowwind_ce'] = df['lowwind_ce'].apply(literal_eval)
-        df['lowwind_conc'] = df['lowwind_conc'].apply(literal_eval)
-    finally:
-        return df
-
-ssaData = apply_literal_eval(df=ssaData)
-vocalsData = apply_literal_eval(df=vocalsData)
-synthData = apply_literal_eval(df=synthData)
-synthData['synth_ce'] = synthData['synth_ce'].apply(literal_eval)
-synthData['synth_conc'] = synthData['synth_conc'].apply(literal_eval)
-
-# setting index to be datetime
-ssaData.set_index('timedate', drop=True, inplace=True)
-vocalsData.set_index('timedate', drop=True, inplace=True)
-synthData.set_index('timedate', drop=True, inplace=True)
+    # setting index to be datetime
+    df.set_index('timedate', drop=True, inplace=True)
+    return df
+
+ssaLoader = make_data_loader('ssaDF_final')
+vocalsLoader = make_data_loader('vocalsDF')
+synthLoader = make_data_loader('synthDF')
+
+ssaData = get_data(ssaLoader)
+vocalsData = get_data(vocalsLoader)
+synthData = get_data(synthLoader)
 
 # =================================================================================================
 # =================================================================================================
@@ -130,6 +105,8 @@ w_22_12 = process_woodcock_data(woodcock_22_12)
 # =================================================================================================
 # Publication Plots
 if False:
+    ssaData = get_data(ssaLoader, ['bin_middle', 'bin_real_conc', 'cutoff_cumu_conc', 'lowwind_conc'])
+    vocalsData = get_data(vocalsLoader, ['bin_middle', 'bin_real_conc'])
     # Figure 4
     spf.plot_ranz_wong(plot_resolution=50, max_radius=15, max_wind_speed=15)
     spf.plot_ranz_wong(plot_resolution=100, max_radius=5, max_wind_speed=5)
@@ -159,6 +136,7 @@ if False:
 # =================================================================================================
 
 if False:
+    ssaData = get_data(ssaLoader, ['bin_middle', 'bin_cutoff_salt'])
     spf.plot_all_samples(df=ssaData, color_variable='surface_wind', color_label='Surface Wind Speed (m/s)')
     spf.plot_all_samples(df=ssaData, color_variable='duration', color_label='Duration (min)')
     spf.plot_all_samples(df=ssaData, color_variable='wave_height', color_label='Sig. Wave Height (m)')
@@ -174,6 +152,7 @@ if False:
 #spf.plot_compare_woodcock_average(df=ssaData, wdf1=w_49_1, wdf2=w_42_3, wdf3=w_39_5, wdf4=w_35_7, wdf5=w_22_12, cutoff_winds=[3.0,3.5,4.0,4.5,5.0,5.5,6.0], y_variable = 'cutoff_cumu_conc')
 
 if False:
+    ssaData = get_data(ssaLoader, ['bin_middle', 'cutoff_cumu_conc'])
     spf.plot_cumulative_concentration(df=ssaData, color_variable='surface_wind', color_label='Surface Wind Speed (m $s^{-1}$)')
     spf.plot_cumulative_concentration(df=ssaData, color_variable='altitude', color_label='Altitude (m)')
     spf.plot_cumulative_concentration(df=ssaData, color_variable='wave_height', color_label='Significant Wave Height (m)')
@@ -260,6 +239,7 @@ if False:
 # =================================================================================================
 
 if False:
+    ssaData = get_data(ssaLoader, ['bin_middle', 'cutoff_cumu_conc'])
     spf.plot_sample_day_concentration(df=ssaData, sample_date='181205')
     spf.plot_sample_day_concentration(df=ssaData, sample_date='190101')
     spf.plot_sample_day_concentration(df=ssaData, sample_date='190413')
@@ -273,6 +253,7 @@ if False:
     spf.plot_sample_day_concentration(df=ssaData, sample_date='190910')
 
 if False:
+    ssaData = get_data(ssaLoader, ['bin_middle', 'cutoff_cumu_conc'])
     spf.plot_sample_day_concentration_average(df=ssaData, sample_date='181205')
     spf.plot_sample_day_concentration_average(df=ssaData, sample_date='190101')
     spf.plot_sample_day_concentration_average(df=ssaData, sample_date='190413')
@@ -288,6 +269,7 @@ if False:
 # =================================================================================================
 
 if False:
+    ssaData = get_data(ssaLoader, ['bin_middle', 'bin_real_conc'])
     spf.plot_size_distribution(df=ssaData, id_num='181205a1')
     spf.plot_size_distribution(df=ssaData, id_num='181205a2')
     spf.plot_size_distribution(df=ssaData, id_num='181205a4')
@@ -399,6 +381,7 @@ if False:
 # SIZE DISTRIBUTION HISTOGRAMS SHOWING WIND SENSITIVITY TEST ======================================
 # =================================================================================================
 if False:
+    ssaData = get_data(ssaLoader, ['bin_middle', 'bin_real_conc', 'lowwind_conc'])
     spf.plot_wind_sensitivity(df=ssaData, id_num='181205a1')
     spf.plot_wind_sensitivity(df=ssaData, id_num='181205a2')
     spf.plot_wind_sensitivity(df=ssaData, id_num='181205a4')
@@ -510,6 +493,7 @@ if False:
 # =================================================================================================
 
 if False:
+    synthData = get_data(synthLoader, ['bin_middle', 'synth_conc'])
     spf.plot_synth_distribution(df=synthData, id_num='181205a1')
     spf.plot_synth_distribution(df=synthData, id_num='181205a2')
     spf.plot_synth_distribution(df=synthData, id_num='181205a4')
@@ -19,6 +19,8 @@ import numpy as np
 import os
 import pandas as pd
 
+import sli_env_codec as sec
+
 # define directories
 miniGNI_dir = 'C:/Users/ntril/Dropbox/mini-GNI'
 flight_dir = miniGNI_dir + '/miniGNI_data'
@@ -222,24 +224,23 @@ def retrieve_xqSample(xqdf, gnidf):
 def rename_environment_files(sample_year, sample_month, sample_day):
     date_label = sample_year[2:] + sample_month + sample_day
     environment_dir = flight_dir + '/' + sample_year + '_' + sample_month + '_' + sample_day + '/slides'
-    # slide number counter
-    counter = 1
+    # find the files in the order os.walk finds them
+    filepaths = []
     for subdir, dirs, files in os.walk(environment_dir):
         for file in files:
             if file.startswith(date_label + 'gni'):
-                filepath = environment_dir + '/' + file
-                new_filepath = environment_dir + '/' + 'sli_env_' + date_label + 'a' + str(counter)
-                myfile = open(filepath, 'r')
-                filelines = myfile.readlines()
-                myfile.close()
-                if counter < 10:
-                    filelines[3] = '            {}.    slide_number \n'.format(counter)
-                else:
-                    filelines[3] = '           {}.    slide_number \n'.format(counter)
-                new_file = open(new_filepath, 'w')
-                new_file.writelines(filelines)
-                new_file.close()
-                counter += 1
+                filepaths.append(environment_dir + '/' + file)
+    # number the slides 1, 2, 3, ... and copy each file under its new name. Only the slide_number
+    # # line is replaced, so the other lines are kept exactly as they are (even values the codec
+    # # could not write, e.g. missing ones).
+    slide_lines = sec.format_env_column(range(1, len(filepaths)+1), 'slide_number')
+    for counter, (filepath, slide_line) in enumerate(zip(filepaths, slide_lines), start=1):
+        with open(filepath, 'r') as myfile:
+            filelines = myfile.readlines()
+        filelines[sec.env_index['slide_number']] = slide_line
+        new_filepath = environment_dir + '/' + 'sli_env_' + date_label + 'a' + str(counter)
+        with open(new_filepath, 'w') as new_file:
+            new_file.writelines(filelines)
 
 # =================================================================================================
 # =================================================================================================
@@ -297,28 +298,18 @@ def generate_environment_files(gni_number, sample_year, sample_month, sample_day
     # # a -1 value, then that sample period is considered invalid, and the environment file
     # # is not generated for that sample. e.g. if windspeed_bar = [4.5, -1, 3.0], then the second
     # # data frame in all_samples is not analyzed for sampling data.
-    # What this does is pull relevant data from the mini-GNI sampling period data set and then
-    # # puts them all into strings. These strings will all become lines in a text file.
+    # What this does is pull relevant data from the mini-GNI sampling period data set into one
+    # # row per sample (one value per slide environment field). The rows are then written to
+    # # files all at once by sec.write_env_files, which takes care of the fixed-width layout.
+    env_rows = []
+    env_file_names = []
     for i in range(len(windspeed_bar)):
         if windspeed_bar[i] > 0:
             # pulls the ith sampling data from the list of data frames
             gni_sample = all_samples[i]
-            # creates the year month day string
-            yymmdd_str = '       {}.    yymmdd'.format(date_label)
             # get the beginning and end of the sampling period
-            hhmmss_begin = gni_sample.index[0].strftime('%H%M%S')
-            hhmmss_end = gni_sample.index[-1].strftime('%H%M%S')
-            # creates strings marking the begining and ending time of the sampling period
-            hhmmss_begin_str = '      {}.0    hhmmss_begin'.format(hhmmss_begin)
-            hhmmss_end_str = '      {}.0    hhmmss_end'.format(hhmmss_end)
-            # This creates the slide number string. Note that the function rename_environment_files
-            # # edits these lines later as they will be incorrect right now since we are generating
-            # # environment files for each mini-GNI instrument individually whereas the slide
-            # # number depends on how many instruments were used and how many samples were taken
-            # # per instrument.
-            slide_number_str = '            {}.    slide_number'.format(i+1)
-            # field project number string, which defaults to 0 and doesn't need to be worried about
-            project_str = '            0.    field_project'
+            hhmmss_begin = int(gni_sample.index[0].strftime('%H%M%S'))
+            hhmmss_end = int(gni_sample.index[-1].strftime('%H%M%S'))
             # =====================================================================================
             # This calculates the wind speed average, min, and max aloft. It uses the power law
             # # to convert average, min, and max surface wind to aloft wind. The power law is
@@ -330,35 +321,6 @@ def generate_environment_files(gni_number, sample_year, sample_month, sample_day
             wind_aloft_min = round(wind_aloft_min, 2)
             wind_aloft_max = windspeed_max[i]*((gni_sample['altitude'].mean())/surface_height)**0.143
             wind_aloft_max = round(wind_aloft_max, 2)
-            # This creates the strings for wind speed aloft average, min, and max. Note that it
-            # # creates both tas string and windspeed string. This is because the mini-GNI sampling
-            # # was done on a kite platform rather than a moving platform (such as an aircraft,
-            # # drone, or UAS). Thus, the air speed and the wind speed are the same. Note that the
-            # # string lengths change based on the value of the wind speed due to the number of
-            # # digits. This does not account for wind speed over 99.99 m/s because this is not
-            # # possible for the kite platform to observe. If this method were to be adapted for
-            # # a moving platform, this section of the code would have to be changed.
-            # wind average
-            if wind_aloft_bar < 10:
-                tas_bar_str = '          {:.2f}    tas_bar'.format(wind_aloft_bar)
-                windspeed_bar_str = '          {:.2f}    wind_speed_bar'.format(wind_aloft_bar)
-            else:
-                tas_bar_str = '         {:.2f}    tas_bar'.format(wind_aloft_bar)
-                windspeed_bar_str = '         {:.2f}    wind_speed_bar'.format(wind_aloft_bar)
-            # wind minimum
-            if wind_aloft_min < 10:
-                tas_min_str = '          {:.2f}    tas_min'.format(wind_aloft_min)
-                windspeed_min_str = '          {:.2f}    wind_speed_min'.format(wind_aloft_min)
-            else:
-                tas_min_str = '         {:.2f}    tas_min'.format(wind_aloft_min)
-                windspeed_min_str = '         {:.2f}    wind_speed_min'.format(wind_aloft_min)
-            # wind maximum
-            if wind_aloft_max < 10:
-                tas_max_str = '          {:.2f}    tas_max'.format(wind_aloft_max)
-                windspeed_max_str = '          {:.2f}    wind_speed_max'.format(wind_aloft_max)
-            else:
-                tas_max_str = '         {:.2f}    tas_max'.format(wind_aloft_max)
-                windspeed_max_str = '         {:.2f}    wind_speed_max'.format(wind_aloft_max)
             # =====================================================================================
             # Check if miniGNI has humidity data. If not, then the iMet-XQ2 data surfaceXQ will
             # # be used to help calculate relative humidity, dew point, and air density aloft.
@@ -436,175 +398,79 @@ def generate_environment_files(gni_number, sample_year, sample_month, sample_day
                 rho_bar = round(rho_bar, 3)
                 rho_min = round(rho_min, 3)
                 rho_max = round(rho_max, 3)
-            # creates string lines for relative humidity
-            rh_bar_str = '        {:.4f}    rel_hum_bar'.format(rh_bar)
-            rh_min_str = '        {:.4f}    rel_hum_min'.format(rh_min)
-            rh_max_str = '        {:.4f}    rel_hum_max'.format(rh_max)
-            # creats string lines for air density
-            rho_bar_str = '         {:.3f}    rho_air_bar'.format(rho_bar)
-            rho_min_str = '         {:.3f}    rho_air_min'.format(rho_min)
-            rho_max_str = '         {:.3f}    rho_air_max'.format(rho_max)
             # get the mini-GNI temperature data
             temp_bar = round(gni_sample['t_kelvin'].mean(), 2)
             temp_min = round(gni_sample['t_kelvin'].min(), 2)
             temp_max = round(gni_sample['t_kelvin'].max(), 2)
-            # creates string lines for temperature
-            temp_bar_str = '        {:.2f}    t_bar'.format(temp_bar)
-            temp_min_str = '        {:.2f}    t_min'.format(temp_min)
-            temp_max_str = '        {:.2f}    t_max'.format(temp_max)
-            # create string lines for dew point temperature
-            td_bar_str = '        {:.2f}    td_bar'.format(td_bar)
-            td_min_str = '        {:.2f}    td_min'.format(td_min)
-            td_max_str = '        {:.2f}    td_max'.format(td_max)
-            # =====================================================================================
-            # get the mini-GNI pressure data
+            # get the mini-GNI pressure and altitude data
             pres_bar = int(gni_sample['pressure'].mean())
             pres_min = int(gni_sample['pressure'].min())
             pres_max = int(gni_sample['pressure'].max())
-            # This create string lines for pressure. Note that the number of digits for pressure
-            # # can change, so the string length changes.
-            # pressure average
-            if pres_bar < 100000:
-                pres_bar_str = '        {}.    p_bar'.format(pres_bar)
-            else:
-                pres_bar_str = '       {}.    p_bar'.format(pres_bar)
-            # pressure minimum
-            if pres_min < 100000:
-                pres_min_str = '        {}.    p_min'.format(pres_min)
-            else:
-                pres_min_str = '       {}.    p_min'.format(pres_min)
-            # pressure maximum
-            if pres_max < 100000:
-                pres_max_str = '        {}.    p_max'.format(pres_max)
-            else:
-                pres_max_str = '       {}.    p_max'.format(pres_max)
-            # =====================================================================================
-            # get the mini-GNI altitude data
             z_bar = int(gni_sample['altitude'].mean())
             z_min = int(gni_sample['altitude'].min())
             z_max = int(gni_sample['altitude'].max())
             z_begin = int(gni_sample['altitude'].iloc[0])
             z_end = int(gni_sample['altitude'].iloc[-1])
-            # This creates string lines for altitude. Note that the number of digits for altitude
-            # # can change, so the string length changes. Currently, this section accounts for
-            # # altitudes from 1-9999 meters.
-            # altitude average
-            if z_bar >= 1000:
-                z_bar_str = '         {}.    z_bar'.format(z_bar)
-            elif z_bar >= 100:
-                z_bar_str = '          {}.    z_bar'.format(z_bar)
-            elif z_bar >= 10:
-                z_bar_str = '           {}.    z_bar'.format(z_bar)
-            else:
-                z_bar_str = '            {}.    z_bar'.format(z_bar)
-            # altitude minimum
-            if z_min >= 1000:
-                z_min_str = '         {}.    z_min'.format(z_min)
-            elif z_min >= 100:
-                z_min_str = '          {}.    z_min'.format(z_min)
-            elif z_min >= 10:
-                z_min_str = '           {}.    z_min'.format(z_min)
-            else:
-                z_min_str = '            {}.    z_min'.format(z_min)
-            # altitude maximum
-            if z_max >= 1000:
-                z_max_str = '         {}.    z_max'.format(z_max)
-            elif z_max >= 100:
-                z_max_str = '          {}.    z_max'.format(z_max)
-            elif z_max >= 10:
-                z_max_str = '           {}.    z_max'.format(z_max)
-            else:
-                z_max_str = '            {}.    z_max'.format(z_max)
-            # altitude at beginning of sample period
-            if z_begin >= 1000:
-                z_begin_str = '         {}.    z_begin'.format(z_begin)
-            elif z_begin >= 100:
-                z_begin_str = '          {}.    z_begin'.format(z_begin)
-            elif z_begin >= 10:
-                z_begin_str = '           {}.    z_begin'.format(z_begin)
-            else:
-                z_begin_str = '            {}.    z_begin'.format(z_begin)
-            # altitude at end of sampling period
-            if z_end >= 1000:
-                z_end_str = '         {}.    z_end'.format(z_end)
-            elif z_end >= 100:
-                z_end_str = '          {}.    z_end'.format(z_end)
-            elif z_end >= 10:
-                z_end_str = '           {}.    z_end'.format(z_end)
-            else:
-                z_end_str = '            {}.    z_end'.format(z_end)
-            # =====================================================================================
-            # This creates the wind direction string. Note that the number of digits in wind
-            # # direction changes as the value changes. The string length therefore needs to be
-            # # varied. This accounts for all wind directions from 0-360 degrees.
-            if wind_dir >= 100:
-                wind_dir_str = '        {:.2f}    wind_direction_bar'.format(wind_dir)
-            elif wind_dir >= 10:
-                wind_dir_str = '         {:.2f}    wind_direction_bar'.format(wind_dir)
-            else:
-                wind_dir_str = '          {:.2f}    wind_direction_bar'.format(wind_dir)
-            # =====================================================================================
-            # This creates the longitude and latitude strings. Note that the average longitude
-            # # and latitude is currently being used for all of the average, minimum, and maximum
-            # # longitude and latitude strings. This accounts for all longitudes from -180 to 180
-            # # degrees and all latitudes from -90 to 90 degrees.
-            # longitude
-            if lon >= 100:
-                lon_bar_str = '        {:.2f}    longitude_bar'.format(lon)
-                lon_min_str = '        {:.2f}    longitude_min'.format(lon)
-                lon_max_str = '        {:.2f}    longitude_max'.format(lon)
-            elif lon >= 10:
-                lon_bar_str = '         {:.2f}    longitude_bar'.format(lon)
-                lon_min_str = '         {:.2f}    longitude_min'.format(lon)
-                lon_max_str = '         {:.2f}    longitude_max'.format(lon)
-            elif lon >= 0:
-                lon_bar_str = '          {:.2f}    longitude_bar'.format(lon)
-                lon_min_str = '          {:.2f}    longitude_min'.format(lon)
-                lon_max_str = '          {:.2f}    longitude_max'.format(lon)
-            elif lon > -10:
-                lon_bar_str = '         {:+.2f}    longitude_bar'.format(lon)
-                lon_min_str = '         {:+.2f}    longitude_min'.format(lon)
-                lon_max_str = '         {:+.2f}    longitude_max'.format(lon)
-            elif lon > -100:
-                lon_bar_str = '        {:+.2f}    longitude_bar'.format(lon)
-                lon_min_str = '        {:+.2f}    longitude_min'.format(lon)
-                lon_max_str = '        {:+.2f}    longitude_max'.format(lon)
-            else:
-                lon_bar_str = '       {:+.2f}    longitude_bar'.format(lon)
-                lon_min_str = '       {:+.2f}    longitude_min'.format(lon)
-                lon_max_str = '       {:+.2f}    longitude_max'.format(lon)
-            # latitude
-            if lat >= 10:
-                lat_bar_str = '         {:.2f}    latitude_bar'.format(lat)
-                lat_min_str = '         {:.2f}    latitude_min'.format(lat)
-                lat_max_str = '         {:.2f}    latitude_max'.format(lat)
-            elif lat >= 0:
-                lat_bar_str = '          {:.2f}    latitude_bar'.format(lat)
-                lat_min_str = '          {:.2f}    latitude_min'.format(lat)
-                lat_max_str = '          {:.2f}    latitude_max'.format(lat)
-            elif lat > -10:
-                lat_bar_str = '         {:+.2f}    latitude_bar'.format(lat)
-                lat_min_str = '         {:+.2f}    latitude_min'.format(lat)
-                lat_max_str = '         {:+.2f}    latitude_max'.format(lat)
-            else:
-                lat_bar_str = '        {:+.2f}    latitude_bar'.format(lat)
-                lat_min_str = '        {:+.2f}    latitude_min'.format(lat)
-                lat_max_str = '        {:+.2f}    latitude_max'.format(lat)
             # =====================================================================================
-            # Now, all the strings created can be written to an environment file. First, the file
-            # # name is generated using the date_label and the mini-GNI number. The naming system
-            # # used here is essential for the function rename_environment_files to work. The
-            # # reason that the files have to later be renamed is that this function only generates
-            # # environment files for one particular mini-GNI, defined by gni_number. The files
-            # # to be named taking into account the number of mini-GNIs used, so they have to be
-            # # renamed at a later time. The naming system used here results in the text files
+            # This collects all the values of the sample. Note that the slide number is incorrect
+            # # right now since we are generating environment files for each mini-GNI instrument
+            # # individually whereas the slide number depends on how many instruments were used
+            # # and how many samples were taken per instrument, so rename_environment_files
+            # # corrects it later. The field project number defaults to 0 and doesn't need to be
+            # # worried about. Note that the wind speed aloft is used for both the true air speed
+            # # (tas) and the wind speed. This is because the mini-GNI sampling was done on a kite
+            # # platform rather than a moving platform (such as an aircraft, drone, or UAS). Thus,
+            # # the air speed and the wind speed are the same. If this method were to be adapted for
+            # # a moving platform, this would have to be changed. The average longitude and
+            # # latitude is used for all of the average, minimum, and maximum longitude and latitude.
+            env_rows.append({'yymmdd': int(date_label),
+                             'hhmmss_begin': hhmmss_begin,
+                             'hhmmss_end': hhmmss_end,
+                             'slide_number': i+1,
+                             'field_project': 0,
+                             'tas_bar': wind_aloft_bar,
+                             'tas_min': wind_aloft_min,
+                             'tas_max': wind_aloft_max,
+                             'rel_hum_bar': rh_bar,
+                             'rel_hum_min': rh_min,
+                             'rel_hum_max': rh_max,
+                             'rho_air_bar': rho_bar,
+                             'rho_air_min': rho_min,
+                             'rho_air_max': rho_max,
+                             't_bar': temp_bar,
+                             't_min': temp_min,
+                             't_max': temp_max,
+                             'td_bar': td_bar,
+                             'td_min': td_min,
+                             'td_max': td_max,
+                             'p_bar': pres_bar,
+                             'p_min': pres_min,
+                             'p_max': pres_max,
+                             'z_bar': z_bar,
+                             'z_min': z_min,
+                             'z_max': z_max,
+                             'z_begin': z_begin,
+                             'z_end': z_end,
+                             'wind_speed_bar': wind_aloft_bar,
+                             'wind_speed_min': wind_aloft_min,
+                             'wind_speed_max': wind_aloft_max,
+                             'wind_direction_bar': wind_dir,
+                             'longitude_bar': lon,
+                             'longitude_min': lon,
+                             'longitude_max': lon,
+                             'latitude_bar': lat,
+                             'latitude_min': lat,
+                             'latitude_max': lat})
+            # The file name is generated using the date_label and the mini-GNI number. The naming
+            # # system used here is essential for the function rename_environment_files to work.
+            # # The reason that the files have to later be renamed is that this function only
+            # # generates environment files for one particular mini-GNI, defined by gni_number. The
+            # # files to be named taking into account the number of mini-GNIs used, so they have to
+            # # be renamed at a later time. The naming system used here results in the text files
             # # being ordered in the directory like so (with X being used to substitude date
             # # values): X_gni1s1, X_gni1s2, X_gni1s3, X_gni2s1, X_gni2s2, etc. This later allows
             # # them to be renamed in order to Xa1, Xa2, Xa3, Xa4, Xa5, etc.
-            environment_file_name = sample_dir + '/slides/' + date_label + 'gni' + gni_number + 's' + str(i+1) + '.txt'
-            # putting all the strings into lines of a text file in a specific order
-            environment_file_lines = [yymmdd_str, hhmmss_begin_str, hhmmss_end_str, slide_number_str, project_str, tas_bar_str, tas_min_str, tas_max_str, rh_bar_str, rh_min_str, rh_max_str, rho_bar_str, rho_min_str, rho_max_str, temp_bar_str, temp_min_str, temp_max_str, td_bar_str, td_min_str, td_max_str, pres_bar_str, pres_min_str, pres_max_str, z_bar_str, z_min_str, z_max_str, z_begin_str, z_end_str, windspeed_bar_str, windspeed_min_str, windspeed_max_str, wind_dir_str, lon_bar_str, lon_min_str, lon_max_str, lat_bar_str, lat_min_str, lat_max_str]
-            environment_file_lines = [s + ' \n' for s in environment_file_lines]
-            f = open(environment_file_name, 'w')
-            f.writelines(environment_file_lines)
-            f.close()
+            env_file_names.append(sample_dir + '/slides/' + date_label + 'gni' + gni_number + 's' + str(i+1) + '.txt')
+    # write all the environment files at once
+    if env_rows:
+        sec.write_env_files(pd.DataFrame(env_rows), env_file_names)
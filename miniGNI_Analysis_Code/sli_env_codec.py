@@ -0,0 +1,182 @@
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Title: Slide Environment File Codec
+# Author: agent
+# Date Updated: 17 October 2026
+# Description: This script reads and writes slide environment (sli_env) files, the fixed-width text
+# # files the GNI microscope software uses to turn slide counts into concentrations. Every line
+# # of a file is a value right-aligned in 14 characters, 4 spaces, and a label, and the 38 fields
+# # always come in the same order (see env_fields). A table of samples (one row per file, one
+# # column per label) is written to files in bulk, and any number of files are read back into
+# # such a table at once. Each field is written with a fixed number of decimals, so reading a
+# # written file gives back every value rounded to those decimals, exactly.
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+
+# import packages
+import numpy as np
+import pandas as pd
+
+# the fields of a slide environment file in order: label, number of decimals, and whether the
+# # field is an integer. Integer fields are written with a trailing decimal point (e.g. '101325.'),
+# # except the times, which are written as hhmmss with one decimal (e.g. '083015.0').
+env_fields = [('yymmdd', 0, True),
+              ('hhmmss_begin', 1, True),
+              ('hhmmss_end', 1, True),
+              ('slide_number', 0, True),
+              ('field_project', 0, True),
+              ('tas_bar', 2, False),
+              ('tas_min', 2, False),
+              ('tas_max', 2, False),
+              ('rel_hum_bar', 4, False),
+              ('rel_hum_min', 4, False),
+              ('rel_hum_max', 4, False),
+              ('rho_air_bar', 3, False),
+              ('rho_air_min', 3, False),
+              ('rho_air_max', 3, False),
+              ('t_bar', 2, False),
+              ('t_min', 2, False),
+              ('t_max', 2, False),
+              ('td_bar', 2, False),
+              ('td_min', 2, False),
+              ('td_max', 2, False),
+              ('p_bar', 0, True),
+              ('p_min', 0, True),
+              ('p_max', 0, True),
+              ('z_bar', 0, True),
+              ('z_min', 0, True),
+              ('z_max', 0, True),
+              ('z_begin', 0, True),
+              ('z_end', 0, True),
+              ('wind_speed_bar', 2, False),
+              ('wind_speed_min', 2, False),
+              ('wind_speed_max', 2, False),
+              ('wind_direction_bar', 2, False),
+              ('longitude_bar', 2, False),
+              ('longitude_min', 2, False),
+              ('longitude_max', 2, False),
+              ('latitude_bar', 2, False),
+              ('latitude_min', 2, False),
+              ('latitude_max', 2, False)]
+env_labels = [field[0] for field in env_fields]
+env_index = {label: i for i, label in enumerate(env_labels)}
+# width of the value and of the gap before the label
+value_width = 14
+label_gap = 4
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: format_env_column
+# Parameters: values, label
+# Description: This returns the lines of field label for every value in values, e.g.
+# # '          4.25    wind_speed_bar \n'. Integer fields are rounded to the nearest integer. A
+# # ValueError is raised if a value does not fit in the field width.
+# =================================================================================================
+def format_env_column(values, label):
+    decimals, is_integer = env_fields[env_index[label]][1:]
+    values = np.asarray(values, dtype=float)
+    if np.isnan(values).any():
+        raise ValueError('missing value in field ' + label)
+    if label.startswith('hhmmss') or label == 'yymmdd':
+        texts = ['{:06d}.'.format(int(value)) for value in np.rint(values)]
+    elif is_integer:
+        texts = ['{:d}.'.format(int(value)) for value in np.rint(values)]
+    else:
+        texts = ['{:.{}f}'.format(value, decimals) for value in values.tolist()]
+    if label.startswith('hhmmss'):
+        texts = [text + '0' for text in texts]
+    too_wide = [text for text in texts if len(text) > value_width]
+    if too_wide:
+        raise ValueError('value ' + too_wide[0] + ' does not fit in field ' + label)
+    suffix = ' '*label_gap + label + ' \n'
+    return [text.rjust(value_width) + suffix for text in texts]
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: format_env_table
+# Parameters: table
+# Description: This returns the lines of the slide environment file of every row of table, a data
+# # frame (or dictionary of equal-length lists) with one column per label in env_labels. Each
+# # column is formatted at once with format_env_column.
+# =================================================================================================
+def format_env_table(table):
+    missing = [label for label in env_labels if label not in table]
+    if missing:
+        raise KeyError('missing sli_env fields: ' + ', '.join(missing))
+    columns = [format_env_column(table[label], label) for label in env_labels]
+    return [list(file_lines) for file_lines in zip(*columns)]
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: write_env_files
+# Parameters: table, filepaths
+# Description: This writes row i of table (see format_env_table) to filepaths[i].
+# =================================================================================================
+def write_env_files(table, filepaths):
+    all_lines = format_env_table(table)
+    if len(all_lines) != len(filepaths):
+        raise ValueError('table has ' + str(len(all_lines)) + ' rows but ' + str(len(filepaths)) + ' file paths were given')
+    for filepath, file_lines in zip(filepaths, all_lines):
+        with open(filepath, 'w') as myfile:
+            myfile.writelines(file_lines)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: decode_env_lines
+# Parameters: all_lines
+# Description: This reads the lines of many slide environment files (a list with one list of lines
+# # per file) and returns a dictionary of label -> array with one value per file. Files laid out
+# # exactly as format_env_table writes them are read together in one np.loadtxt call. Any other
+# # file is read line by line, matching each value to its label wherever it is, so files from
+# # other software still work. Values that are not found are NaN.
+# =================================================================================================
+def decode_env_lines(all_lines):
+    n_fields = len(env_labels)
+    values = np.full((len(all_lines), n_fields), np.nan)
+    standard = [i for i, file_lines in enumerate(all_lines) if len(file_lines) == n_fields]
+    other = [i for i, file_lines in enumerate(all_lines) if len(file_lines) != n_fields]
+    if standard:
+        try:
+            table = np.loadtxt([line for i in standard for line in all_lines[i]], dtype=[('value', float), ('label', 'U32')], ndmin=1)
+            labels = table['label'].reshape(len(standard), n_fields)
+            in_order = (labels == np.array(env_labels)).all(axis=1)
+            values[np.array(standard)[in_order]] = table['value'].reshape(len(standard), n_fields)[in_order]
+            other += [i for i, ok in zip(standard, in_order) if not ok]
+        except ValueError: # a line that is not "value label"
+            other += standard
+    for i in other:
+        for line in all_lines[i]:
+            parts = line.split()
+            if len(parts) == 2 and parts[1] in env_index:
+                try:
+                    values[i, env_index[parts[1]]] = float(parts[0])
+                except ValueError:
+                    pass
+    return {label: values[:, j] for j, label in enumerate(env_labels)}
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: read_env_table
+# Parameters: filepaths
+# Description: This reads every file in filepaths and returns a data frame with one row per file and
+# # one column per label (see decode_env_lines). Integer fields are given the nullable Int64 type
+# # so that missing values stay missing.
+# =================================================================================================
+def read_env_table(filepaths):
+    all_lines = []
+    for filepath in filepaths:
+        with open(filepath, 'rt') as myfile:
+            all_lines.append(myfile.readlines())
+    columns = decode_env_lines(all_lines)
+    envDF = pd.DataFrame(columns)
+    for label, decimals, is_integer in env_fields:
+        if is_integer:
+            envDF[label] = envDF[label].round().astype('Int64')
+    return envDF
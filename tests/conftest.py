@@ -0,0 +1,19 @@
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Title: Test Configuration
+# Author: agent
+# Date Updated: 17 October 2026
+# Description: The analysis scripts import each other by module name from their own folders, so
+# # the three code folders are put on the path before the tests import them.
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+
+# import packages
+import os
+import sys
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for code_dir in ['miniGNI_Analysis_Code', 'SSA_Analysis', 'SSA_Plot_Codes']:
+    sys.path.insert(0, os.path.join(repo_dir, code_dir))
@@ -0,0 +1,79 @@
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Title: Slide Environment File Codec Tests
+# Author: agent
+# Date Updated: 17 October 2026
+# Description: Round trips of sli_env tables through the codec: a written file must read back as
+# # every value rounded to the decimals of its field.
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+
+# import packages
+import numpy as np
+import pytest
+
+import sli_env_codec as sec
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: make_env_table
+# Parameters: n_files, seed
+# Description: This returns a dictionary of label -> values for n_files random sli_env files.
+# =================================================================================================
+def make_env_table(n_files=5, seed=0):
+    rng = np.random.default_rng(seed)
+    table = {}
+    for label, decimals, is_integer in sec.env_fields:
+        if label == 'yymmdd':
+            table[label] = [190307 + i for i in range(n_files)]
+        elif label.startswith('hhmmss'):
+            table[label] = [83015 + 100*i for i in range(n_files)]
+        elif is_integer:
+            table[label] = rng.integers(0, 102000, n_files).tolist()
+        else:
+            table[label] = rng.uniform(-180, 300, n_files).tolist()
+    return table
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# TESTS
+# =================================================================================================
+
+def test_encode_decode_round_trip():
+    table = make_env_table()
+    decoded = sec.decode_env_lines(sec.format_env_table(table))
+    for label, decimals, is_integer in sec.env_fields:
+        np.testing.assert_array_equal(decoded[label], np.round(table[label], decimals))
+
+def test_decode_lines_out_of_order():
+    table = make_env_table(n_files=1)
+    file_lines = sec.format_env_table(table)[0]
+    decoded = sec.decode_env_lines([file_lines[::-1] + ['not a field line\n']])
+    for label, decimals, is_integer in sec.env_fields:
+        assert decoded[label][0] == np.round(table[label][0], decimals)
+
+def test_decode_missing_field_is_nan():
+    table = make_env_table(n_files=1)
+    file_lines = sec.format_env_table(table)[0]
+    del file_lines[sec.env_index['wind_speed_max']]
+    decoded = sec.decode_env_lines([file_lines])
+    assert np.isnan(decoded['wind_speed_max'][0])
+    assert decoded['wind_speed_min'][0] == np.round(table['wind_speed_min'][0], 2)
+
+def test_write_read_files_round_trip(tmp_path):
+    table = make_env_table()
+    filepaths = [str(tmp_path / ('sli_env_190307a' + str(i))) for i in range(1, 6)]
+    sec.write_env_files(table, filepaths)
+    envDF = sec.read_env_table(filepaths)
+    for label, decimals, is_integer in sec.env_fields:
+        np.testing.assert_array_equal(envDF[label].to_numpy(dtype=float), np.round(table[label], decimals))
+
+def test_format_rejects_missing_and_wide_values():
+    with pytest.raises(ValueError):
+        sec.format_env_column([1.0, np.nan], 'wind_speed_bar')
+    with pytest.raises(ValueError):
+        sec.format_env_column([1e20], 'p_bar')
@@ -0,0 +1,80 @@
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Title: Sea Salt Aerosol Bin Grid Tests
+# Author: agent
+# Date Updated: 17 October 2026
+# Description: Conservation checks of the rebinning in ssa_bin_grids: number and mass must keep
+# # their totals over the range two grids share, and split by the exact weights within a bin.
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+
+# import packages
+import numpy as np
+
+import ssa_bin_grids as grd
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: make_grid
+# Parameters: edges
+# Description: This returns a grid (dictionary of column -> array) with the given bin edges.
+# =================================================================================================
+def make_grid(edges):
+    edges = np.asarray(edges, dtype=float)
+    return {'bin_number': np.arange(1, len(edges)),
+            'bin_lower': edges[:-1],
+            'bin_middle': (edges[:-1] + edges[1:])/2,
+            'bin_upper': edges[1:]}
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: rebin
+# Parameters: values, source, target, kind
+# Description: This rebins the rows of values from grid source onto grid target.
+# =================================================================================================
+def rebin(values, source, target, kind):
+    registry = grd.make_grid_registry(target)
+    source_id = grd.intern_grid(registry, *[source[column] for column in grd.grid_columns])
+    return grd.rebin_rows(registry, values, [source_id]*len(values), registry['canonical_id'], kind)
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# TESTS
+# =================================================================================================
+
+def test_number_and_mass_conserved():
+    # an uneven source grid inside a target grid with edges that do not line up with it
+    source = make_grid([0.9, 1.3, 2.0, 2.1, 4.7, 9.5, 19.7])
+    target = grd.make_canonical_grid()
+    values = np.random.default_rng(0).uniform(0, 1e5, (4, 6))
+    for kind in ['number', 'mass']:
+        rebinned = rebin(values, source, target, kind)
+        np.testing.assert_allclose(rebinned.sum(axis=1), values.sum(axis=1), rtol=1e-12)
+        assert (rebinned >= 0).all()
+
+def test_split_weights_within_a_bin():
+    source = make_grid([1.0, 2.0])
+    target = make_grid([1.0, 1.5, 2.0])
+    number = rebin([[1.0]], source, target, 'number')[0]
+    mass = rebin([[1.0]], source, target, 'mass')[0]
+    np.testing.assert_allclose(number, [0.5, 0.5])
+    # the mass of particles spread evenly in radius goes as the integral of r^3 dr
+    np.testing.assert_allclose(mass, [(1.5**4 - 1)/(2**4 - 1), (2**4 - 1.5**4)/(2**4 - 1)])
+
+def test_same_grid_unchanged():
+    grid = grd.make_canonical_grid()
+    values = np.random.default_rng(1).uniform(0, 1e5, (3, len(grid['bin_middle'])))
+    for kind in ['number', 'mass', 'mean']:
+        np.testing.assert_allclose(rebin(values, grid, grid, kind), values, rtol=1e-12)
+
+def test_mass_outside_target_dropped():
+    # only the part of the source bin the target grid covers is kept
+    source = make_grid([1.0, 3.0])
+    target = make_grid([1.0, 2.0])
+    mass = rebin([[1.0]], source, target, 'mass')[0]
+    np.testing.assert_allclose(mass, [(2**4 - 1)/(3**4 - 1)])
@@ -0,0 +1,94 @@
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Title: Sea Salt Aerosol Ingestion Tests
+# Author: agent
+# Date Updated: 17 October 2026
+# Description: Checks of the ingestion manifest: unchanged files are reused from it, new, changed,
+# # and deleted files are picked up, and the manifest lasts across runs when it is saved.
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+
+# import packages
+import os
+
+import sli_env_codec as sec
+import ssa_ingest_functions as ing
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: write_env_files
+# Parameters: env_dir, id_numbers, wind_speed
+# Description: This writes one sli_env file per sample ID in id_numbers into env_dir, with every
+# # field 1 except the wind speed, and returns the file paths.
+# =================================================================================================
+def write_env_files(env_dir, id_numbers, wind_speed=4.25):
+    table = {label: [1]*len(id_numbers) for label in sec.env_labels}
+    table['yymmdd'] = [int(id_str[:6]) for id_str in id_numbers]
+    table['hhmmss_begin'] = [83015]*len(id_numbers)
+    table['hhmmss_end'] = [83515]*len(id_numbers)
+    table['wind_speed_bar'] = [wind_speed]*len(id_numbers)
+    filepaths = [os.path.join(env_dir, 'sli_env_' + id_str) for id_str in id_numbers]
+    sec.write_env_files(table, filepaths)
+    return filepaths
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# TESTS
+# =================================================================================================
+
+def test_manifest_hit_and_miss(tmp_path):
+    env_dir = str(tmp_path / 'env')
+    os.makedirs(env_dir)
+    manifest_path = str(tmp_path / 'manifest.pkl')
+    write_env_files(env_dir, ['190307a1', '190307a2', '190308a1'])
+    # first run: every file is parsed
+    manifest = ing.make_manifest(manifest_path)
+    first = ing.read_env_files(env_dir, manifest=manifest)
+    assert (manifest['parsed'], manifest['reused']) == (3, 0)
+    ing.save_manifest(manifest)
+    # second run: nothing changed, so nothing is parsed and the records are the same
+    manifest = ing.make_manifest(manifest_path)
+    second = ing.read_env_files(env_dir, manifest=manifest)
+    assert (manifest['parsed'], manifest['reused']) == (0, 3)
+    assert second == first
+    # a changed file and a new file are parsed, the others are reused
+    filepath = write_env_files(env_dir, ['190307a2'], wind_speed=9.5)[0]
+    os.utime(filepath, ns=(os.stat(filepath).st_atime_ns, os.stat(filepath).st_mtime_ns + 10**9))
+    write_env_files(env_dir, ['190309a1'])
+    manifest = ing.make_manifest(manifest_path)
+    third = ing.read_env_files(env_dir, manifest=manifest)
+    assert (manifest['parsed'], manifest['reused']) == (2, 2)
+    assert ing.index_records(third)['190307a2']['windspeed'] == 9.5
+    assert [record['id_number'] for record in third] == ['190307a1', '190307a2', '190308a1', '190309a1']
+
+def test_manifest_touched_and_deleted_files(tmp_path):
+    env_dir = str(tmp_path / 'env')
+    os.makedirs(env_dir)
+    filepaths = write_env_files(env_dir, ['190307a1', '190307a2'])
+    manifest = ing.make_manifest()
+    ing.read_env_files(env_dir, manifest=manifest)
+    # touched but not changed: hashed again, but not parsed
+    os.utime(filepaths[0], ns=(os.stat(filepaths[0]).st_atime_ns, os.stat(filepaths[0]).st_mtime_ns + 10**9))
+    # deleted: dropped from the manifest
+    os.remove(filepaths[1])
+    records = ing.read_env_files(env_dir, manifest=manifest)
+    assert (manifest['parsed'], manifest['reused']) == (2, 1)
+    assert [record['id_number'] for record in records] == ['190307a1']
+    assert all(len(section) == 1 for section in manifest['sections'].values())
+
+def test_manifest_keeps_other_directories(tmp_path):
+    first_dir = str(tmp_path / 'first')
+    second_dir = str(tmp_path / 'second')
+    os.makedirs(first_dir)
+    os.makedirs(second_dir)
+    write_env_files(first_dir, ['190307a1'])
+    write_env_files(second_dir, ['190308a1'])
+    manifest = ing.make_manifest()
+    ing.read_env_files(first_dir, manifest=manifest)
+    ing.read_env_files(second_dir, manifest=manifest)
+    ing.read_env_files(first_dir, manifest=manifest)
+    assert (manifest['parsed'], manifest['reused']) == (2, 1)
@@ -0,0 +1,84 @@
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Title: Sea Salt Aerosol Table Store Tests
+# Author: agent
+# Date Updated: 17 October 2026
+# Description: Round trips of data frames through save_table and load_table, with the bin grids
+# # interned, a ragged list column, and the kinds of single-value columns the data saver writes.
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+
+# import packages
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+import ssa_bin_grids as grd
+import ssa_table_store as tbl
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# Function Title: make_samples
+# Parameters: none
+# Description: This returns a small data frame like ssaDF: two samples on the canonical grid and
+# # one on a shorter grid, so that the grids and bin_conc are not all the same.
+# =================================================================================================
+def make_samples():
+    canonical = grd.make_canonical_grid()
+    short = grd.make_canonical_grid(last_bin=97)
+    grids = [canonical, canonical, short]
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'id_number': ['190307a1', '190307a2', '190308a1'],
+                       'date': [dt.date(2019, 3, 7), dt.date(2019, 3, 7), dt.date(2019, 3, 8)],
+                       'timedate': pd.to_datetime(['2019-03-07 08:30:15', '2019-03-07 09:30:15', '2019-03-08 08:00:00']),
+                       'windspeed': [4.25, np.nan, 7.1],
+                       'bin_number': [grid['bin_number'].tolist() for grid in grids]})
+    for column in ['bin_lower', 'bin_middle', 'bin_upper']:
+        df[column] = [grid[column].tolist() for grid in grids]
+    df['bin_conc'] = [rng.uniform(0, 1e5, len(grid['bin_middle'])).tolist() for grid in grids]
+    return df
+
+# =================================================================================================
+# =================================================================================================
+# =================================================================================================
+# TESTS
+# =================================================================================================
+
+def test_save_load_round_trip(tmp_path):
+    df = make_samples()
+    tbl.save_table(df, str(tmp_path / 'table'))
+    loaded = tbl.load_table(str(tmp_path / 'table'))
+    assert list(loaded.columns) == list(df.columns)
+    for column in df.columns:
+        if column in ['timedate', 'windspeed']:
+            pd.testing.assert_series_equal(loaded[column], df[column], check_names=False)
+        else:
+            assert loaded[column].tolist() == df[column].tolist(), column
+
+def test_grids_saved_once(tmp_path):
+    df = make_samples()
+    tbl.save_table(df, str(tmp_path / 'table'))
+    registry, grid_ids = tbl.load_grids(str(tmp_path / 'table'))
+    assert len(registry['grids']) == 2
+    assert grid_ids.tolist() == [0, 0, 1]
+    assert not (tmp_path / 'table' / 'bin_middle.npy').exists()
+
+def test_ragged_column_padded_with_nan(tmp_path):
+    df = make_samples()
+    tbl.save_table(df, str(tmp_path / 'table'))
+    matrix = tbl.load_matrix(str(tmp_path / 'table'), 'bin_conc')
+    assert matrix.shape == (3, 96)
+    assert np.isnan(matrix[2, 94:]).all()
+    assert 'bin_conc' in tbl.load_layout(str(tmp_path / 'table'))['ragged']
+
+def test_nan_cell_in_list_column(tmp_path):
+    df = make_samples()
+    df['bin_salt'] = [[1.0, 2.0], np.nan, [3.0]]
+    matrix, lengths = tbl.stack_column(df['bin_salt'])
+    assert lengths.tolist() == [2, 0, 1]
+    tbl.save_table(df, str(tmp_path / 'table'))
+    loaded = tbl.load_table(str(tmp_path / 'table'), columns=['bin_salt'])
+    assert loaded['bin_salt'].tolist() == [[1.0, 2.0], [], [3.0]]